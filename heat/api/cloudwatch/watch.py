@@ -35,6 +35,8 @@ class WatchController(object):
     Implements the API actions
     """
 
+    METRICS_PAGE_SIZE = 500
+
     def __init__(self, options):
         self.options = options
         self.engine_rpcapi = rpc_client.EngineClient()
@@ -154,63 +156,51 @@ class WatchController(object):
     def list_metrics(self, req):
         """
         Implements ListMetrics API action
-        Lists metric datapoints associated with a particular alarm,
-        or all alarms if none specified
+        Lists the metrics for which alarms have received data, optionally
+        filtered by MetricName and Namespace, in pages of at most
+        METRICS_PAGE_SIZE metrics
         """
-        def format_metric_data(d, fil={}):
+        def format_metric(m):
             """
             Reformat engine output into the AWS "Metric" format
-            Takes an optional filter dict, which is traversed
-            so a metric dict is only returned if all keys match
-            the filter dict
             """
-            dimensions = [
-                {'AlarmName': d[engine_api.WATCH_DATA_ALARM]},
-                {'Timestamp': d[engine_api.WATCH_DATA_TIME]}
-            ]
-            for key in d[engine_api.WATCH_DATA]:
-                dimensions.append({key: d[engine_api.WATCH_DATA][key]})
-
-            newdims = self._reformat_dimensions(dimensions)
-
-            result = {
-                'MetricName': d[engine_api.WATCH_DATA_METRIC],
-                'Dimensions': newdims,
-                'Namespace': d[engine_api.WATCH_DATA_NAMESPACE],
-            }
+            dimensions = [{'AlarmName': m[engine_api.WATCH_METRIC_ALARM]}]
+            dimensions.extend(m[engine_api.WATCH_METRIC_DIMENSIONS])
 
-            for f in fil:
-                try:
-                    value = result[f]
-                    if value != fil[f]:
-                        # Filter criteria not met, return None
-                        return
-                except KeyError:
-                    logger.warning("Invalid filter key %s, ignoring" % f)
-
-            return result
+            return {
+                'MetricName': m[engine_api.WATCH_METRIC_NAME],
+                'Dimensions': self._reformat_dimensions(dimensions),
+                'Namespace': m[engine_api.WATCH_METRIC_NAMESPACE],
+            }
 
         con = req.context
         parms = dict(req.params)
         # FIXME : Don't yet handle filtering by Dimensions
-        filter_result = dict((k, v) for (k, v) in parms.iteritems() if k in
-                             ("MetricName", "Namespace"))
-        logger.debug("filter parameters : %s" % filter_result)
+        logger.debug("filter parameters : %s" %
+                     dict((k, v) for (k, v) in parms.iteritems() if k in
+                          ("MetricName", "Namespace")))
+
+        marker = None
+        if 'NextToken' in parms:
+            try:
+                marker = int(parms['NextToken'])
+            except ValueError:
+                msg = 'Invalid NextToken %s' % parms['NextToken']
+                return exception.HeatInvalidParameterValueError(detail=msg)
 
         try:
-            # Engine does not currently support query by namespace/metric
-            # so we pass None/None and do any filtering locally
-            watch_data = self.engine_rpcapi.show_watch_metric(con,
-                                                              namespace=None,
-                                                              metric_name=None)
+            metrics = self.engine_rpcapi.list_watch_metrics(
+                con,
+                namespace=parms.get('Namespace'),
+                metric_name=parms.get('MetricName'),
+                limit=self.METRICS_PAGE_SIZE,
+                marker=marker)
         except rpc_common.RemoteError as ex:
             return exception.map_remote_error(ex)
 
-        res = {'Metrics': []}
-        for d in watch_data:
-            metric = format_metric_data(d, filter_result)
-            if metric:
-                res['Metrics'].append(metric)
+        res = {'Metrics': [format_metric(m) for m in metrics]}
+        if len(metrics) == self.METRICS_PAGE_SIZE:
+            res['NextToken'] = str(metrics[-1][engine_api.WATCH_METRIC_ID])
 
         result = api_utils.format_response("ListMetrics", res)
         return result
@@ -241,38 +231,55 @@ class WatchController(object):
             logger.error("Request does not contain required MetricData")
             return exception.HeatMissingParameterError("MetricData list")
 
-        watch_name = None
-        dimensions = []
+        # We expect an AlarmName dimension as currently the engine
+        # implementation requires metric data to be associated
+        # with an alarm.  When this is fixed, we can simply
+        # parse the user-defined dimensions and add the list to
+        # the metric data.  A datum without an AlarmName dimension
+        # is associated with the alarm named in another datum for the
+        # same metric, and is skipped if there is none.
+        alarms = {}
+        data = []
         for p in metric_data:
             dimension = api_utils.extract_param_pairs(p,
                                                       prefix='Dimensions',
                                                       keyname='Name',
                                                       valuename='Value')
+            metric_name = api_utils.get_param_value(p, 'MetricName')
             if 'AlarmName' in dimension:
-                watch_name = dimension['AlarmName']
+                datum_watch = dimension['AlarmName']
+                alarms.setdefault(metric_name, datum_watch)
+                dimensions = []
             else:
-                dimensions.append(dimension)
-
-        # We expect an AlarmName dimension as currently the engine
-        # implementation requires metric data to be associated
-        # with an alarm.  When this is fixed, we can simply
-        # parse the user-defined dimensions and add the list to
-        # the metric data
-        if not watch_name:
+                datum_watch = None
+                dimensions = [dimension]
+
+            # Extract the required data from the metric_data
+            # and format dict to pass to engine
+            stats_data = {'Namespace': namespace,
+                          metric_name: {
+                              'Unit': api_utils.get_param_value(p, 'Unit'),
+                              'Value': api_utils.get_param_value(p, 'Value'),
+                              'Dimensions': dimensions}}
+            data.append((metric_name, {'watch_name': datum_watch,
+                                       'stats_data': stats_data}))
+
+        if not alarms:
             logger.error("Request does not contain AlarmName dimension!")
             return exception.HeatMissingParameterError("AlarmName dimension")
 
-        # Extract the required data from the metric_data
-        # and format dict to pass to engine
-        data = {'Namespace': namespace,
-                api_utils.get_param_value(metric_data[0], 'MetricName'): {
-                    'Unit': api_utils.get_param_value(metric_data[0], 'Unit'),
-                    'Value': api_utils.get_param_value(metric_data[0],
-                                                       'Value'),
-                    'Dimensions': dimensions}}
+        watch_data = []
+        for metric_name, datum in data:
+            if datum['watch_name'] is None:
+                datum['watch_name'] = alarms.get(metric_name)
+            if datum['watch_name'] is None:
+                logger.warning("Skipping %s datum without an alarm" %
+                               metric_name)
+            else:
+                watch_data.append(datum)
 
         try:
-            self.engine_rpcapi.create_watch_data(con, watch_name, data)
+            self.engine_rpcapi.create_watch_data_batch(con, watch_data)
         except rpc_common.RemoteError as ex:
             return exception.map_remote_error(ex)
 
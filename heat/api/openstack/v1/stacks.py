@@ -150,8 +150,11 @@ class StackController(object):
         Lists summary information for all stacks
         """
 
+        page = dict((k, req.params[k]) for k in ('limit', 'marker')
+                    if k in req.params)
+
         try:
-            stacks = self.engine.list_stacks(req.context)
+            stacks = self.engine.list_stacks(req.context, **page)
         except rpc_common.RemoteError as ex:
             return util.remote_error(ex)
 
@@ -0,0 +1,68 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+import itertools
+
+from heat.openstack.common import timeutils
+
+
+class ExpiringCache(object):
+    '''
+    A process-wide cache whose entries expire a given number of seconds
+    after they are stored, and which evicts the least recently used entries
+    when it holds more than a given number of them.
+    '''
+
+    def __init__(self):
+        self._entries = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        '''Return the unexpired value stored for a key, or the default.'''
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= timeutils.utcnow():
+            del self._entries[key]
+            return default
+        self._entries[key] = (entry[0], next(self._counter), entry[2])
+        return entry[2]
+
+    def set(self, key, value, ttl, size):
+        '''
+        Store a value for ttl seconds, evicting the least recently used
+        entries beyond size. Nothing is stored if either is not positive.
+        '''
+        if ttl <= 0 or size <= 0:
+            self._entries.pop(key, None)
+            return
+
+        expiry = timeutils.utcnow() + datetime.timedelta(seconds=ttl)
+        self._entries[key] = (expiry, next(self._counter), value)
+
+        while len(self._entries) > size:
+            lru = min(self._entries, key=lambda k: self._entries[k][1])
+            del self._entries[lru]
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[2]
+
+    def clear(self):
+        self._entries.clear()
@@ -14,12 +14,36 @@
 #    under the License.
 
 import eventlet
+from keystoneclient import exceptions as kc_exception
 from keystoneclient.v2_0 import client as kc
+from heat.common import cache
 from heat.openstack.common import cfg
 from heat.openstack.common import log as logging
 
 logger = logging.getLogger('heat.common.keystoneclient')
 
+keystone_cache_opts = [
+    cfg.IntOpt('keystone_cache_ttl',
+               default=300,
+               help='Seconds for which role IDs and EC2 credentials looked '
+                    'up in Keystone are cached (0 to disable)'),
+    cfg.IntOpt('keystone_cache_size',
+               default=1000,
+               help='Maximum number of role IDs and EC2 credentials cached')
+]
+cfg.CONF.register_opts(keystone_cache_opts)
+
+# Role IDs, indexed by Keystone URL and role name, and EC2 credentials,
+# indexed by Keystone URL and user ID. Both are shared by all clients.
+_role_ids = cache.ExpiringCache()
+_ec2_credentials = cache.ExpiringCache()
+
+
+def _cache_set(cached, key, value):
+    cached.set(key, value, cfg.CONF.keystone_cache_ttl,
+               cfg.CONF.keystone_cache_size)
+    return value
+
 
 class KeystoneClient(object):
     """
@@ -71,14 +95,19 @@ class KeystoneClient(object):
         # This role is designed to allow easier differentiation of the
         # heat-generated "stack users" which will generally have credentials
         # deployed on an instance (hence are implicitly untrusted)
-        roles = self.client.roles.list()
-        stack_user_role = [r.id for r in roles
-                           if r.name == cfg.CONF.heat_stack_user_role]
-        if len(stack_user_role) == 1:
-            role_id = stack_user_role[0]
+        role_id = self._stack_user_role_id()
+        if role_id is not None:
             logger.debug("Adding user %s to role %s" % (user.id, role_id))
-            self.client.roles.add_user_role(user.id, role_id,
-                                            self.context.tenant_id)
+            try:
+                self.client.roles.add_user_role(user.id, role_id,
+                                                self.context.tenant_id)
+            except kc_exception.NotFound:
+                # The role may have been re-created since it was cached
+                role_id = self._stack_user_role_id(refresh=True)
+                if role_id is None:
+                    raise
+                self.client.roles.add_user_role(user.id, role_id,
+                                                self.context.tenant_id)
         else:
             logger.error("Failed to add user %s to role %s, check role exists!"
                          % (username,
@@ -86,8 +115,29 @@ class KeystoneClient(object):
 
         return user.id
 
+    def _stack_user_role_id(self, refresh=False):
+        '''
+        Return the ID of the heat_stack_user_role, or None if there is not
+        exactly one role of that name. The ID is cached unless refresh is set.
+        '''
+        key = (self.context.auth_url, cfg.CONF.heat_stack_user_role)
+        if refresh:
+            _role_ids.pop(key)
+        else:
+            role_id = _role_ids.get(key)
+            if role_id is not None:
+                return role_id
+
+        roles = self.client.roles.list()
+        stack_user_role = [r.id for r in roles
+                           if r.name == cfg.CONF.heat_stack_user_role]
+        if len(stack_user_role) != 1:
+            return None
+        return _cache_set(_role_ids, key, stack_user_role[0])
+
     def delete_stack_user(self, user_id):
 
+        _ec2_credentials.pop((self.context.auth_url, user_id))
         user = self.client.users.get(user_id)
 
         # FIXME (shardy) : need to test, do we still need this retry logic?
@@ -122,18 +172,25 @@ class KeystoneClient(object):
             raise exception.Error(reason)
 
     def delete_ec2_keypair(self, user_id, accesskey):
+        _ec2_credentials.pop((self.context.auth_url, user_id))
         self.client.ec2.delete(user_id, accesskey)
 
     def get_ec2_keypair(self, user_id):
+        key = (self.context.auth_url, user_id)
+        cred = _ec2_credentials.get(key)
+        if cred is not None:
+            return cred
+
         # We make the assumption that each user will only have one
         # ec2 keypair, it's not clear if AWS allow multiple AccessKey resources
         # to be associated with a single User resource, but for simplicity
         # we assume that here for now
         cred = self.client.ec2.list(user_id)
         if len(cred) == 0:
-            return self.client.ec2.create(user_id, self.context.tenant_id)
+            return _cache_set(_ec2_credentials, key, self.client.ec2.create(
+                user_id, self.context.tenant_id))
         if len(cred) == 1:
-            return cred[0]
+            return _cache_set(_ec2_credentials, key, cred[0])
         else:
             logger.error("Unexpected number of ec2 credentials %s for %s" %
                          (len(cred), user_id))
@@ -101,8 +101,8 @@ def stack_get_all(context):
     return IMPL.stack_get_all(context)
 
 
-def stack_get_all_by_tenant(context):
-    return IMPL.stack_get_all_by_tenant(context)
+def stack_get_all_by_tenant(context, limit=None, marker=None):
+    return IMPL.stack_get_all_by_tenant(context, limit, marker)
 
 
 def stack_create(context, values):
@@ -113,6 +113,12 @@ def stack_update(context, stack_id, values):
     return IMPL.stack_update(context, stack_id, values)
 
 
+def stack_changes_save(context, stack_id, resources, events,
+                       updated_at=None):
+    return IMPL.stack_changes_save(context, stack_id, resources, events,
+                                   updated_at)
+
+
 def stack_delete(context, stack_id):
     return IMPL.stack_delete(context, stack_id)
 
@@ -133,18 +139,26 @@ def event_get_all(context):
     return IMPL.event_get_all(context)
 
 
-def event_get_all_by_tenant(context):
-    return IMPL.event_get_all_by_tenant(context)
+def event_get_all_by_tenant(context, limit=None, marker=None,
+                            resource_name=None):
+    return IMPL.event_get_all_by_tenant(context, limit, marker,
+                                        resource_name)
 
 
-def event_get_all_by_stack(context, stack_id):
-    return IMPL.event_get_all_by_stack(context, stack_id)
+def event_get_all_by_stack(context, stack_id, limit=None, marker=None,
+                           resource_name=None):
+    return IMPL.event_get_all_by_stack(context, stack_id, limit, marker,
+                                       resource_name)
 
 
 def event_create(context, values):
     return IMPL.event_create(context, values)
 
 
+def event_prune(context, max_events, limit=None):
+    return IMPL.event_prune(context, max_events, limit)
+
+
 def watch_rule_get(context, watch_rule_id):
     return IMPL.watch_rule_get(context, watch_rule_id)
 
@@ -161,6 +175,14 @@ def watch_rule_get_all_by_stack(context, stack_id):
     return IMPL.watch_rule_get_all_by_stack(context, stack_id)
 
 
+def watch_rule_get_all_by_id(context, watch_rule_ids):
+    return IMPL.watch_rule_get_all_by_id(context, watch_rule_ids)
+
+
+def watch_rule_get_all_newer(context, watch_rule_id):
+    return IMPL.watch_rule_get_all_newer(context, watch_rule_id)
+
+
 def watch_rule_create(context, values):
     return IMPL.watch_rule_create(context, values)
 
@@ -177,9 +199,61 @@ def watch_data_create(context, values):
     return IMPL.watch_data_create(context, values)
 
 
+def watch_data_create_all(context, values):
+    return IMPL.watch_data_create_all(context, values)
+
+
 def watch_data_get_all(context):
     return IMPL.watch_data_get_all(context)
 
 
+def watch_data_get_all_by_watch_rule_id(context, watch_rule_id,
+                                        start=None, end=None):
+    return IMPL.watch_data_get_all_by_watch_rule_id(context, watch_rule_id,
+                                                    start, end)
+
+
+def watch_data_get_all_by_metric(context, namespace=None, metric_name=None):
+    return IMPL.watch_data_get_all_by_metric(context, namespace, metric_name)
+
+
+def watch_data_get_statistics(context, watch_rule_id, metric_name,
+                              start=None, end=None):
+    return IMPL.watch_data_get_statistics(context, watch_rule_id,
+                                          metric_name, start, end)
+
+
+def watch_data_get_series(context, watch_rule_id, metric_name,
+                          start=None, end=None):
+    return IMPL.watch_data_get_series(context, watch_rule_id, metric_name,
+                                      start, end)
+
+
+def watch_data_get_earliest(context, watch_rule_id, start=None, end=None):
+    return IMPL.watch_data_get_earliest(context, watch_rule_id, start, end)
+
+
+def watch_data_delete_range(context, watch_rule_id=None, start=None,
+                            end=None, aggregated=False):
+    return IMPL.watch_data_delete_range(context, watch_rule_id, start, end,
+                                        aggregated)
+
+
+def watch_data_rollup(context, watch_rule_id, metric_name, start, end,
+                      namespace=None, unit=None):
+    return IMPL.watch_data_rollup(context, watch_rule_id, metric_name,
+                                  start, end, namespace, unit)
+
+
+def watch_metric_register(context, values):
+    return IMPL.watch_metric_register(context, values)
+
+
+def watch_metric_get_all(context, namespace=None, metric_name=None,
+                         limit=None, marker=None):
+    return IMPL.watch_metric_get_all(context, namespace, metric_name,
+                                     limit, marker)
+
+
 def watch_data_delete(context, watch_name):
     return IMPL.watch_data_delete(context, watch_name)
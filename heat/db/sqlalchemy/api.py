@@ -14,6 +14,8 @@
 #    under the License.
 
 '''Implementation of SQLAlchemy backend.'''
+import sqlalchemy
+from sqlalchemy import orm
 from sqlalchemy.orm.session import Session
 
 from heat.common.exception import NotFound
@@ -107,10 +109,7 @@ def resource_get_all_by_stack(context, stack_id):
     results = model_query(context, models.Resource).\
         filter_by(stack_id=stack_id).all()
 
-    if not results:
-        raise NotFound("no resources for stack_id %s were found" % stack_id)
-
-    return results
+    return dict((res.name, res) for res in results)
 
 
 def stack_get_by_name(context, stack_name, owner_id=None):
@@ -143,11 +142,26 @@ def stack_get_all(context):
     return results
 
 
-def stack_get_all_by_tenant(context):
-    results = model_query(context, models.Stack).\
+def stack_get_all_by_tenant(context, limit=None, marker=None):
+    query = model_query(context, models.Stack).\
+        options(orm.joinedload('raw_template')).\
         filter_by(owner_id=None).\
-        filter_by(tenant=context.tenant_id).all()
-    return results
+        filter_by(tenant=context.tenant_id).\
+        order_by(models.Stack.created_at, models.Stack.id)
+
+    if marker is not None:
+        marker_stack = query.filter_by(id=marker).first()
+        if marker_stack is None:
+            raise NotFound("marker stack with id %s not found" % marker)
+        query = query.filter(sqlalchemy.or_(
+            models.Stack.created_at > marker_stack.created_at,
+            sqlalchemy.and_(models.Stack.created_at == marker_stack.created_at,
+                            models.Stack.id > marker_stack.id)))
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    return query.all()
 
 
 def stack_create(context, values):
@@ -224,6 +238,31 @@ def user_creds_get(user_creds_id):
     return result
 
 
+def stack_changes_save(context, stack_id, resources, events,
+                       updated_at=None):
+    '''
+    In a single transaction, update the resources given by a dict mapping
+    resource IDs to dicts of values, create an event for each dict of values
+    in the list events (in order) and, if updated_at is given, set the
+    updated time of the stack.
+    '''
+    session = _session(context)
+    with session.begin():
+        for resource_id, values in resources.items():
+            session.query(models.Resource).\
+                filter_by(id=resource_id).\
+                update(values, synchronize_session=False)
+        for values in events:
+            event_ref = models.Event()
+            event_ref.update(values)
+            session.add(event_ref)
+        if updated_at is not None:
+            session.query(models.Stack).\
+                filter_by(id=stack_id).\
+                update({'updated_at': updated_at},
+                       synchronize_session=False)
+
+
 def event_get(context, event_id):
     result = model_query(context, models.Event).get(event_id)
 
@@ -236,22 +275,42 @@ def event_get_all(context):
     return results
 
 
-def event_get_all_by_tenant(context):
-    stacks = model_query(context, models.Stack).\
-        filter_by(tenant=context.tenant_id).all()
-    results = []
-    for stack in stacks:
-        results.extend(model_query(context, models.Event).
-                       filter_by(stack_id=stack.id).all())
+def _events_page(query, limit=None, marker=None, resource_name=None):
+    # Event listings are returned with their properties, so load them in the
+    # same query rather than lazily for each event
+    query = query.options(orm.undefer('resource_properties'))
 
-    return results
+    if resource_name is not None:
+        query = query.filter(models.Event.logical_resource_id ==
+                             resource_name)
+    if marker is not None:
+        query = query.filter(models.Event.id > marker)
 
+    query = query.order_by(models.Event.id)
 
-def event_get_all_by_stack(context, stack_id):
-    results = model_query(context, models.Event).\
-        filter_by(stack_id=stack_id).all()
+    if limit is not None:
+        query = query.limit(limit)
 
-    return results
+    return query.all()
+
+
+def event_get_all_by_tenant(context, limit=None, marker=None,
+                            resource_name=None):
+    query = model_query(context, models.Event).\
+        join(models.Event.stack).\
+        options(orm.contains_eager(models.Event.stack)).\
+        filter(models.Stack.tenant == context.tenant_id)
+
+    return _events_page(query, limit, marker, resource_name)
+
+
+def event_get_all_by_stack(context, stack_id, limit=None, marker=None,
+                           resource_name=None):
+    query = model_query(context, models.Event).\
+        options(orm.joinedload(models.Event.stack)).\
+        filter_by(stack_id=stack_id)
+
+    return _events_page(query, limit, marker, resource_name)
 
 
 def event_create(context, values):
@@ -261,6 +320,35 @@ def event_create(context, values):
     return event_ref
 
 
+def event_prune(context, max_events, limit=None):
+    '''
+    Delete the oldest events of every stack that has more than max_events,
+    removing at most limit events per stack. Returns the number of events
+    deleted.
+    '''
+    session = _session(context)
+    stack_ids = session.query(models.Event.stack_id).\
+        group_by(models.Event.stack_id).\
+        having(sqlalchemy.func.count(models.Event.id) > max_events).all()
+
+    deleted = 0
+    for (stack_id,) in stack_ids:
+        query = session.query(models.Event.id).\
+            filter_by(stack_id=stack_id).\
+            order_by(models.Event.id.desc()).\
+            offset(max_events)
+        if limit is not None:
+            query = query.limit(limit)
+        event_ids = [event_id for (event_id,) in query]
+        if event_ids:
+            deleted += session.query(models.Event).\
+                filter(models.Event.id.in_(event_ids)).\
+                delete(synchronize_session=False)
+    session.flush()
+
+    return deleted
+
+
 def watch_rule_get(context, watch_rule_id):
     result = model_query(context, models.WatchRule).\
         filter_by(id=watch_rule_id).first()
@@ -284,6 +372,20 @@ def watch_rule_get_all_by_stack(context, stack_id):
     return results
 
 
+def watch_rule_get_all_by_id(context, watch_rule_ids):
+    if not watch_rule_ids:
+        return []
+    results = model_query(context, models.WatchRule).\
+        filter(models.WatchRule.id.in_(watch_rule_ids)).all()
+    return results
+
+
+def watch_rule_get_all_newer(context, watch_rule_id):
+    results = model_query(context, models.WatchRule).\
+        filter(models.WatchRule.id > watch_rule_id).all()
+    return results
+
+
 def watch_rule_create(context, values):
     obj_ref = models.WatchRule()
     obj_ref.update(values)
@@ -312,8 +414,12 @@ def watch_rule_delete(context, watch_name):
 
     session = Session.object_session(wr)
 
-    for d in wr.watch_data:
-        session.delete(d)
+    session.query(models.WatchData).\
+        filter_by(watch_rule_id=wr.id).\
+        delete(synchronize_session=False)
+    session.query(models.WatchMetric).\
+        filter_by(watch_rule_id=wr.id).\
+        delete(synchronize_session=False)
 
     session.delete(wr)
     session.flush()
@@ -326,11 +432,225 @@ def watch_data_create(context, values):
     return obj_ref
 
 
+def watch_data_create_all(context, values):
+    '''
+    Create a watch_data row for each dict in the list values, in a single
+    transaction, and return them.
+    '''
+    session = _session(context)
+    results = []
+    with session.begin():
+        for v in values:
+            obj_ref = models.WatchData()
+            obj_ref.update(v)
+            session.add(obj_ref)
+            results.append(obj_ref)
+    return results
+
+
 def watch_data_get_all(context):
     results = model_query(context, models.WatchData).all()
     return results
 
 
+def watch_data_get_all_by_metric(context, namespace=None, metric_name=None):
+    '''
+    Return the samples of the watch rules which have received data for the
+    given metric, using the metric catalog to find the rules.
+    '''
+    watch_rule_ids = _watch_metric_filter(
+        model_query(context, models.WatchMetric.watch_rule_id),
+        namespace, metric_name)
+    query = model_query(context, models.WatchData).\
+        filter(models.WatchData.watch_rule_id.in_(watch_rule_ids.subquery()))
+    if metric_name is not None:
+        query = query.filter(models.WatchData.metric_name == metric_name)
+
+    return query.order_by(models.WatchData.created_at).all()
+
+
+def _watch_data_window(query, start, end, aggregated=False):
+    if aggregated:
+        query = query.filter(models.WatchData.sample_count !=
+                             sqlalchemy.null())
+    else:
+        query = query.filter(models.WatchData.sample_count ==
+                             sqlalchemy.null())
+    if start is not None:
+        query = query.filter(models.WatchData.created_at >= start)
+    if end is not None:
+        query = query.filter(models.WatchData.created_at < end)
+    return query
+
+
+def watch_data_get_all_by_watch_rule_id(context, watch_rule_id,
+                                        start=None, end=None):
+    query = model_query(context, models.WatchData).\
+        filter_by(watch_rule_id=watch_rule_id)
+
+    return _watch_data_window(query, start, end).\
+        order_by(models.WatchData.created_at).all()
+
+
+def watch_data_get_statistics(context, watch_rule_id, metric_name,
+                              start=None, end=None):
+    '''
+    Return a tuple of the number of samples of a watch rule's metric in the
+    given time window and their sum, minimum and maximum values.
+    '''
+    value = models.WatchData.value
+    query = model_query(context,
+                        sqlalchemy.func.count(value),
+                        sqlalchemy.func.sum(value),
+                        sqlalchemy.func.min(value),
+                        sqlalchemy.func.max(value)).\
+        filter(models.WatchData.watch_rule_id == watch_rule_id).\
+        filter(models.WatchData.metric_name == metric_name)
+
+    count, total, minimum, maximum = _watch_data_window(query,
+                                                        start, end).one()
+    return count, total or 0, minimum, maximum
+
+
+def watch_data_get_series(context, watch_rule_id, metric_name,
+                          start=None, end=None):
+    '''
+    Return a list of (created_at, value) tuples for the samples of a watch
+    rule's metric in the given time window, ordered by time.
+    '''
+    query = model_query(context,
+                        models.WatchData.created_at,
+                        models.WatchData.value).\
+        filter(models.WatchData.watch_rule_id == watch_rule_id).\
+        filter(models.WatchData.metric_name == metric_name)
+
+    return _watch_data_window(query, start, end).\
+        order_by(models.WatchData.created_at).all()
+
+
+def watch_data_get_earliest(context, watch_rule_id, start=None, end=None):
+    '''
+    Return the time of the earliest raw sample for a watch rule in the given
+    time window, or None if there are no samples.
+    '''
+    query = model_query(context,
+                        sqlalchemy.func.min(models.WatchData.created_at)).\
+        filter(models.WatchData.watch_rule_id == watch_rule_id)
+
+    return _watch_data_window(query, start, end).scalar()
+
+
+def watch_data_delete_range(context, watch_rule_id=None, start=None,
+                            end=None, aggregated=False):
+    '''
+    Delete either the raw or the aggregated samples in the given time window,
+    optionally for only one watch rule. Returns the number of rows deleted.
+    '''
+    session = _session(context)
+    query = session.query(models.WatchData)
+    if watch_rule_id is not None:
+        query = query.filter_by(watch_rule_id=watch_rule_id)
+
+    deleted = _watch_data_window(query, start, end, aggregated).\
+        delete(synchronize_session=False)
+    session.flush()
+    return deleted
+
+
+def watch_data_rollup(context, watch_rule_id, metric_name, start, end,
+                      namespace=None, unit=None):
+    '''
+    In a single transaction, replace the raw samples of a watch rule in the
+    given time window with one aggregated sample of its metric at the start
+    of the window. The raw samples are locked while they are read, so that
+    concurrent calls for the same window do not both aggregate them. Returns
+    the aggregated sample, or None if there were no samples of the metric.
+    '''
+    session = _session(context)
+    with session.begin():
+        query = session.query(models.WatchData.id,
+                              models.WatchData.metric_name,
+                              models.WatchData.value).\
+            filter_by(watch_rule_id=watch_rule_id)
+        samples = _watch_data_window(query, start, end).\
+            with_lockmode('update').all()
+        if not samples:
+            return None
+
+        values = [v for i, n, v in samples
+                  if n == metric_name and v is not None]
+        obj_ref = None
+        if values:
+            count, total = len(values), sum(values)
+            average = total / count
+            obj_ref = models.WatchData()
+            obj_ref.update({
+                'watch_rule_id': watch_rule_id,
+                'created_at': start,
+                'metric_name': metric_name,
+                'value': average,
+                'sample_count': count,
+                'data': {'Namespace': namespace,
+                         metric_name: {'Value': average,
+                                       'Unit': unit,
+                                       'SampleCount': count,
+                                       'Sum': total,
+                                       'Minimum': min(values),
+                                       'Maximum': max(values)}}})
+            session.add(obj_ref)
+
+        session.query(models.WatchData).\
+            filter(models.WatchData.id.in_([i for i, n, v in samples])).\
+            delete(synchronize_session=False)
+    return obj_ref
+
+
+def _watch_metric_filter(query, namespace, metric_name):
+    if namespace is not None:
+        query = query.filter(models.WatchMetric.namespace == namespace)
+    if metric_name is not None:
+        query = query.filter(models.WatchMetric.metric_name == metric_name)
+    return query
+
+
+def watch_metric_register(context, values):
+    '''
+    Add a metric to the catalog, unless it is already there. Returns the
+    catalog entry.
+    '''
+    obj_ref = model_query(context, models.WatchMetric).\
+        filter_by(watch_rule_id=values['watch_rule_id']).\
+        filter(models.WatchMetric.namespace == values['namespace']).\
+        filter(models.WatchMetric.metric_name == values['metric_name']).\
+        filter(models.WatchMetric.dimensions == values['dimensions']).first()
+    if obj_ref is None:
+        obj_ref = models.WatchMetric()
+        obj_ref.update(values)
+        obj_ref.save(_session(context))
+    return obj_ref
+
+
+def watch_metric_get_all(context, namespace=None, metric_name=None,
+                         limit=None, marker=None):
+    '''
+    Return the catalog entries for the given metric, or all metrics,
+    ordered by ID and starting after the ID marker if it is given.
+    '''
+    query = _watch_metric_filter(
+        model_query(context, models.WatchMetric).
+        options(orm.joinedload(models.WatchMetric.watch_rule)),
+        namespace, metric_name)
+    if marker is not None:
+        query = query.filter(models.WatchMetric.id > marker)
+
+    query = query.order_by(models.WatchMetric.id)
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    return query.all()
+
+
 def watch_data_delete(context, watch_name):
     ds = model_query(context, models.WatchRule).\
         filter_by(name=watch_name).all()
@@ -0,0 +1,52 @@
+from sqlalchemy import *
+from migrate import *
+
+
+# (index name, table name, columns). A column may be given as a tuple of its
+# name and the length of the prefix indexed on MySQL, where the key of an
+# InnoDB index is limited to 767 bytes (255 characters in utf8).
+INDEXES = (
+    ('ix_stack_tenant_name', 'stack', (('tenant', 64), ('name', 160))),
+    ('ix_resource_stack_id_name', 'resource', ('stack_id', ('name', 200))),
+    ('ix_resource_nova_instance', 'resource', ('nova_instance',)),
+    ('ix_event_stack_id', 'event', ('stack_id',)),
+    ('ix_watch_rule_name', 'watch_rule', ('name',)),
+    ('ix_watch_rule_stack_id', 'watch_rule', ('stack_id',)),
+    ('ix_watch_data_watch_rule_id', 'watch_data', ('watch_rule_id',)),
+)
+
+
+def _column(column):
+    if isinstance(column, tuple):
+        return column
+    return column, None
+
+
+def _tables(meta):
+    tables = {}
+    for name, table_name, columns in INDEXES:
+        if table_name not in tables:
+            tables[table_name] = Table(table_name, meta, autoload=True)
+        yield name, tables[table_name], [_column(c) for c in columns]
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+
+    for name, table, columns in _tables(meta):
+        if migrate_engine.name == 'mysql':
+            keys = ', '.join(length is None and c or '%s(%d)' % (c, length)
+                             for c, length in columns)
+            migrate_engine.execute('CREATE INDEX %s ON %s (%s)' %
+                                   (name, table.name, keys))
+        else:
+            Index(name, *[table.c[c] for c, length in columns]).create(
+                migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+
+    for name, table, columns in _tables(meta):
+        Index(name, *[table.c[c] for c, length in columns]).drop(
+            migrate_engine)
@@ -0,0 +1,61 @@
+import json
+
+from sqlalchemy import *
+from migrate import *
+
+
+def _metric_value(rule, data):
+    '''
+    Extract the name and numeric value of the metric watched by a rule from
+    a serialised watch_data sample.
+    '''
+    try:
+        metric_name = json.loads(rule)['MetricName']
+        value = float(json.loads(data)[metric_name]['Value'])
+    except (KeyError, TypeError, ValueError):
+        return None, None
+    return metric_name, value
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+
+    watch_rule = Table('watch_rule', meta, autoload=True)
+    watch_data = Table('watch_data', meta, autoload=True)
+
+    Column('metric_name', String(length=255)).create(watch_data)
+    Column('value', Float()).create(watch_data)
+
+    samples = select([watch_data.c.id, watch_rule.c.rule, watch_data.c.data],
+                     watch_data.c.watch_rule_id == watch_rule.c.id)
+    for sample_id, rule, data in migrate_engine.execute(samples).fetchall():
+        metric_name, value = _metric_value(rule, data)
+        if metric_name is not None:
+            migrate_engine.execute(
+                watch_data.update().
+                where(watch_data.c.id == sample_id).
+                values(metric_name=metric_name, value=value))
+
+    Index('ix_watch_data_watch_rule_id',
+          watch_data.c.watch_rule_id).drop(migrate_engine)
+    Index('ix_watch_data_rule_time',
+          watch_data.c.watch_rule_id,
+          watch_data.c.created_at).create(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+
+    watch_data = Table('watch_data', meta, autoload=True)
+
+    Index('ix_watch_data_rule_time',
+          watch_data.c.watch_rule_id,
+          watch_data.c.created_at).drop(migrate_engine)
+
+    watch_data = Table('watch_data', MetaData(bind=migrate_engine),
+                       autoload=True)
+    watch_data.c.metric_name.drop()
+    watch_data.c.value.drop()
+
+    Index('ix_watch_data_watch_rule_id',
+          watch_data.c.watch_rule_id).create(migrate_engine)
@@ -0,0 +1,16 @@
+from sqlalchemy import *
+from migrate import *
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+
+    watch_data = Table('watch_data', meta, autoload=True)
+    Column('sample_count', Integer, nullable=True).create(watch_data)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+
+    watch_data = Table('watch_data', meta, autoload=True)
+    watch_data.c.sample_count.drop()
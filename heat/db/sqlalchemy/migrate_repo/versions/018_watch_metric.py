@@ -0,0 +1,79 @@
+import json
+
+from sqlalchemy import *
+from migrate import *
+
+
+def _metric_key(watch_rule_id, data):
+    '''
+    Extract the catalog entry for the metric in a serialised watch_data
+    sample, as stored by the engine.
+    '''
+    try:
+        data = json.loads(data)
+        namespace = data.get('Namespace')
+        metric_name, metric = [(k, v) for k, v in data.items()
+                               if k != 'Namespace'][0]
+        dimensions = metric.get('Dimensions') or []
+        dimensions = [{k: v} for k, v in
+                      sorted((k, v) for d in dimensions for k, v in d.items())]
+    except (AttributeError, IndexError, TypeError, ValueError):
+        return None
+    return watch_rule_id, namespace, metric_name, json.dumps(dimensions)
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+
+    Table('watch_rule', meta, autoload=True)
+    watch_data = Table('watch_data', meta, autoload=True)
+
+    watch_metric = Table(
+        'watch_metric', meta,
+        Column('id', Integer, primary_key=True),
+        Column('created_at', DateTime(timezone=False)),
+        Column('updated_at', DateTime(timezone=False)),
+        Column('namespace', String(length=255)),
+        Column('metric_name', String(length=255)),
+        Column('dimensions', Text()),
+        Column('watch_rule_id', Integer, ForeignKey('watch_rule.id'),
+               nullable=False),
+    )
+    watch_metric.create()
+
+    if migrate_engine.name == 'mysql':
+        # Index prefixes of the names, since the key of an InnoDB index is
+        # limited to 767 bytes (255 characters in utf8)
+        migrate_engine.execute('CREATE INDEX ix_watch_metric_name ON '
+                               'watch_metric (namespace(100), '
+                               'metric_name(150))')
+    else:
+        Index('ix_watch_metric_name',
+              watch_metric.c.namespace,
+              watch_metric.c.metric_name).create(migrate_engine)
+    Index('ix_watch_metric_watch_rule_id',
+          watch_metric.c.watch_rule_id).create(migrate_engine)
+
+    # Populate the catalog with the metrics of the existing samples
+    samples = select([watch_data.c.watch_rule_id, watch_data.c.data,
+                      watch_data.c.created_at],
+                     order_by=[watch_data.c.created_at])
+    metrics = {}
+    for watch_rule_id, data, created_at in migrate_engine.execute(samples):
+        key = _metric_key(watch_rule_id, data)
+        if key is not None and key not in metrics:
+            metrics[key] = created_at
+
+    for (watch_rule_id, namespace, metric_name,
+         dimensions), created_at in metrics.items():
+        migrate_engine.execute(watch_metric.insert().values(
+            watch_rule_id=watch_rule_id, namespace=namespace,
+            metric_name=metric_name, dimensions=dimensions,
+            created_at=created_at))
+
+
+def downgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+
+    watch_metric = Table('watch_metric', meta, autoload=True)
+    watch_metric.drop()
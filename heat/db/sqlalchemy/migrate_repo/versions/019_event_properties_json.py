@@ -0,0 +1,44 @@
+import json
+
+from sqlalchemy import *
+from migrate import *
+
+
+def _convert(migrate_engine, event, old_column, new_type, convert):
+    '''
+    Replace the resource_properties column of the event table with one of
+    new_type, converting each existing value with the given function.
+    '''
+    Column('resource_properties_new', new_type).create(event)
+
+    rows = select([event.c.id, old_column])
+    for event_id, properties in list(migrate_engine.execute(rows)):
+        migrate_engine.execute(event.update().
+                               where(event.c.id == event_id).
+                               values(resource_properties_new=convert(
+                                   properties)))
+
+    event.c.resource_properties.drop()
+    event.c.resource_properties_new.alter(name='resource_properties')
+
+
+def upgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+
+    Table('stack', meta, autoload=True)
+    event = Table('event', meta,
+                  Column('resource_properties', PickleType),
+                  autoload=True)
+
+    _convert(migrate_engine, event, event.c.resource_properties, Text(),
+             json.dumps)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData(bind=migrate_engine)
+
+    Table('stack', meta, autoload=True)
+    event = Table('event', meta, autoload=True)
+
+    _convert(migrate_engine, event, event.c.resource_properties,
+             PickleType(), lambda p: json.loads(p) if p is not None else None)
@@ -17,6 +17,7 @@ SQLAlchemy models for heat data.
 
 from sqlalchemy import *
 from sqlalchemy.orm import relationship, backref, object_mapper
+from sqlalchemy.orm import deferred
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy import types as types
@@ -199,7 +200,7 @@ class Event(BASE, HeatBase):
     physical_resource_id = Column(String)
     resource_status_reason = Column(String)
     resource_type = Column(String)
-    resource_properties = Column(PickleType)
+    resource_properties = deferred(Column(Json))
 
 
 class Resource(BASE, HeatBase):
@@ -241,9 +242,29 @@ class WatchData(BASE, HeatBase):
 
     id = Column(Integer, primary_key=True)
     data = Column('data', Json)
+    metric_name = Column('metric_name', String)
+    value = Column('value', Float)
+    sample_count = Column('sample_count', Integer, nullable=True)
 
     watch_rule_id = Column(
         Integer,
         ForeignKey('watch_rule.id'),
         nullable=False)
     watch_rule = relationship(WatchRule, backref=backref('watch_data'))
+
+
+class WatchMetric(BASE, HeatBase):
+    """Represents a metric for which a watch has received data."""
+
+    __tablename__ = 'watch_metric'
+
+    id = Column(Integer, primary_key=True)
+    namespace = Column('namespace', String)
+    metric_name = Column('metric_name', String)
+    dimensions = Column('dimensions', Json)
+
+    watch_rule_id = Column(
+        Integer,
+        ForeignKey('watch_rule.id'),
+        nullable=False)
+    watch_rule = relationship(WatchRule, backref=backref('watch_metrics'))
@@ -17,6 +17,7 @@
 import sqlalchemy.interfaces
 import sqlalchemy.orm
 import sqlalchemy.engine
+import sqlalchemy.pool
 from sqlalchemy.exc import DisconnectionError
 
 from heat.openstack.common import log as logging
@@ -80,6 +81,13 @@ def get_engine():
         if 'mysql' in connection_dict.drivername:
             engine_args['listeners'] = [MySQLPingListener()]
 
+        if _get_sql_connection() == 'sqlite://':
+            # An in-memory database only exists for the lifetime of its
+            # connection, so share a single connection between all of the
+            # (green) threads that may access it concurrently
+            engine_args['poolclass'] = sqlalchemy.pool.StaticPool
+            engine_args['connect_args'] = {'check_same_thread': False}
+
         _ENGINE = sqlalchemy.create_engine(_get_sql_connection(),
                                            **engine_args)
     return _ENGINE
@@ -14,6 +14,7 @@
 
 from heat.rpc.api import *
 from heat.openstack.common import timeutils
+from heat.common import identifier
 from heat.engine import template
 
 from heat.openstack.common import log as logging
@@ -80,6 +81,32 @@ def format_stack(stack):
     return info
 
 
+def format_stack_summary(db_stack):
+    '''
+    Return a summary representation of the given stack database record that
+    matches the API output expectations, without loading the stack itself.
+    The parameters and outputs of the stack are not included.
+    '''
+    tmpl = template.Template(db_stack.raw_template.template,
+                             db_stack.raw_template_id)
+    stack_id = identifier.HeatIdentifier(db_stack.tenant,
+                                         db_stack.name, db_stack.id)
+    return {
+        STACK_NAME: db_stack.name,
+        STACK_ID: dict(stack_id),
+        STACK_CREATION_TIME: timeutils.isotime(db_stack.created_at),
+        STACK_UPDATED_TIME: timeutils.isotime(db_stack.updated_at),
+        STACK_NOTIFICATION_TOPICS: [],  # TODO Not implemented yet
+        STACK_DESCRIPTION: tmpl[template.DESCRIPTION],
+        STACK_TMPL_DESCRIPTION: tmpl[template.DESCRIPTION],
+        STACK_STATUS: db_stack.status,
+        STACK_STATUS_DATA: db_stack.status_reason,
+        STACK_CAPABILITIES: [],   # TODO Not implemented yet
+        STACK_DISABLE_ROLLBACK: True,   # TODO Not implemented yet
+        STACK_TIMEOUT: db_stack.timeout,
+    }
+
+
 def format_stack_resource(resource, detail=True):
     '''
     Return a representation of the given resource that matches the API output
@@ -125,6 +152,35 @@ def format_event(event):
     return result
 
 
+def format_db_event(db_event):
+    '''
+    Return a representation of the given event database record that matches
+    the API output expectations, without loading the stack it belongs to.
+    '''
+    db_stack = db_event.stack
+    stack_identifier = identifier.HeatIdentifier(db_stack.tenant,
+                                                 db_stack.name, db_stack.id)
+    res_identifier = identifier.ResourceIdentifier(
+        resource_name=db_event.logical_resource_id, **stack_identifier)
+    event_identifier = identifier.EventIdentifier(event_id=str(db_event.id),
+                                                  **res_identifier)
+
+    result = {
+        EVENT_ID: dict(event_identifier),
+        EVENT_STACK_ID: dict(stack_identifier),
+        EVENT_STACK_NAME: stack_identifier.stack_name,
+        EVENT_TIMESTAMP: timeutils.isotime(db_event.created_at),
+        EVENT_RES_NAME: db_event.logical_resource_id,
+        EVENT_RES_PHYSICAL_ID: db_event.physical_resource_id,
+        EVENT_RES_STATUS: db_event.name,
+        EVENT_RES_STATUS_DATA: db_event.resource_status_reason,
+        EVENT_RES_TYPE: db_event.resource_type,
+        EVENT_RES_PROPERTIES: db_event.resource_properties,
+    }
+
+    return result
+
+
 def format_watch(watch):
 
     result = {
@@ -178,3 +234,17 @@ def format_watch_data(wd):
     }
 
     return result
+
+
+def format_watch_metric(wm):
+    '''
+    Return a representation of the given metric catalog entry that matches
+    the API output expectations.
+    '''
+    return {
+        WATCH_METRIC_ID: wm.id,
+        WATCH_METRIC_ALARM: wm.watch_rule.name,
+        WATCH_METRIC_NAME: wm.metric_name,
+        WATCH_METRIC_NAMESPACE: wm.namespace,
+        WATCH_METRIC_DIMENSIONS: wm.dimensions
+    }
@@ -13,9 +13,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+import hashlib
+
+from heat.common import cache
 from heat.openstack.common import cfg
 from heat.openstack.common import importutils
 from heat.openstack.common import log as logging
+from heat.openstack.common import timeutils
 
 logger = logging.getLogger(__name__)
 
@@ -37,10 +42,142 @@ except ImportError:
 cloud_opts = [
     cfg.StrOpt('cloud_backend',
                default=None,
-               help="Cloud module to use as a backend. Defaults to OpenStack.")
+               help="Cloud module to use as a backend. "
+                    "Defaults to OpenStack."),
+    cfg.IntOpt('catalog_cache_ttl',
+               default=60,
+               help="Seconds for which the IDs of images, flavors, keypairs "
+                    "and security groups looked up by name are cached "
+                    "(0 to disable)"),
+    cfg.IntOpt('catalog_cache_size',
+               default=1000,
+               help="Maximum number of catalogs of images, flavors, keypairs "
+                    "and security groups cached, one for each tenant or "
+                    "user and type of catalog"),
+    cfg.IntOpt('client_pool_size',
+               default=100,
+               help="Maximum number of authenticated clients shared between "
+                    "stacks (0 to disable sharing)"),
+    cfg.IntOpt('client_pool_ttl',
+               default=3600,
+               help="Maximum seconds for which a shared client is reused "
+                    "before authenticating again")
 ]
 cfg.CONF.register_opts(cloud_opts)
 
+# Shared clients are discarded this long before their token expires
+TOKEN_EXPIRY_MARGIN = datetime.timedelta(minutes=5)
+
+
+class CatalogCache(object):
+    '''
+    A cache, for each tenant (or user, for catalogs such as keypairs that
+    belong to a user), of the IDs of the entries in Nova catalogs such as
+    images or flavors, indexed by name. The least recently used catalogs are
+    evicted when there are more than catalog_cache_size.
+    '''
+
+    def __init__(self):
+        self._entries = cache.ExpiringCache()
+
+    @staticmethod
+    def _key(owner, manager):
+        return owner, type(manager).__name__
+
+    def lookup(self, owner, manager, name):
+        '''
+        Return the ID of the named entry listed by a novaclient manager, or
+        None if there is no such entry. The catalog is listed again if the
+        cached copy has expired or does not contain the name.
+        '''
+        key = self._key(owner, manager)
+        ids = self._entries.get(key)
+        if ids is not None and name in ids:
+            return ids[name]
+
+        ids = dict((o.name, o.id) for o in manager.list())
+        self._entries.set(key, ids, cfg.CONF.catalog_cache_ttl,
+                          cfg.CONF.catalog_cache_size)
+        return ids.get(name)
+
+    def invalidate(self, owner, manager):
+        '''Discard the cached catalog listed by a novaclient manager.'''
+        self._entries.pop(self._key(owner, manager))
+
+    def clear(self):
+        self._entries.clear()
+
+
+catalog_cache = CatalogCache()
+
+
+def _token_expiry(client):
+    '''
+    Return the time at which the token held by an authenticated Keystone
+    client or Nova HTTP client expires, or None if it is not known.
+    '''
+    try:
+        if hasattr(client, 'auth_ref'):
+            # Keystone
+            expires = client.auth_ref.expires
+        else:
+            # Nova
+            catalog = client.service_catalog.catalog
+            expires = timeutils.parse_isotime(
+                catalog['access']['token']['expires'])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+    return timeutils.normalize_time(expires)
+
+
+class ClientPool(object):
+    '''
+    An engine-wide pool of authenticated clients, indexed by the service and
+    the credentials used to authenticate, so that clients and their tokens
+    can be reused by every stack with the same credentials. Clients are
+    discarded when they reach client_pool_ttl or come close to the expiry of
+    their token, and the least recently used clients are evicted when there
+    are more than client_pool_size.
+    '''
+
+    def __init__(self):
+        self._clients = cache.ExpiringCache()
+
+    def __len__(self):
+        return len(self._clients)
+
+    def get(self, key, create):
+        '''
+        Return the pooled client for a key, calling create() to create and
+        add a new one if there is no unexpired client in the pool.
+        '''
+        size = cfg.CONF.client_pool_size
+        if key is None or size <= 0:
+            return create()
+
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        client = create()
+        if client is None:
+            self._clients.pop(key)
+            return None
+
+        ttl = cfg.CONF.client_pool_ttl
+        token_expiry = _token_expiry(getattr(client, 'client', client))
+        if token_expiry is not None:
+            ttl = min(ttl, timeutils.delta_seconds(
+                timeutils.utcnow(), token_expiry - TOKEN_EXPIRY_MARGIN))
+        self._clients.set(key, client, ttl, size)
+        return client
+
+    def clear(self):
+        self._clients.clear()
+
+
+client_pool = ClientPool()
+
 
 class OpenStackClients(object):
     '''
@@ -54,17 +191,45 @@ class OpenStackClients(object):
         self._swift = None
         self._quantum = None
 
+    def _pool_key(self, *service):
+        '''
+        Return the key for the clients of a service authenticated with the
+        credentials in the context, or None if there are no credentials.
+        '''
+        con = self.context
+        if con is None:
+            return None
+        if con.password is not None:
+            secret = con.password
+        elif con.auth_token is not None:
+            secret = con.auth_token
+        else:
+            return None
+        if isinstance(secret, unicode):
+            secret = secret.encode('utf-8')
+        return service + (con.auth_url, con.tenant, con.tenant_id,
+                          con.username, hashlib.sha1(secret).hexdigest())
+
     def keystone(self):
         if self._keystone:
             return self._keystone
 
-        self._keystone = hkc.KeystoneClient(self.context)
+        self._keystone = client_pool.get(
+            self._pool_key('keystone'),
+            lambda: hkc.KeystoneClient(self.context))
         return self._keystone
 
     def nova(self, service_type='compute'):
         if service_type in self._nova:
             return self._nova[service_type]
 
+        client = client_pool.get(self._pool_key('nova', service_type),
+                                 lambda: self._create_nova(service_type))
+        if client is not None:
+            self._nova[service_type] = client
+        return client
+
+    def _create_nova(self, service_type):
         con = self.context
         args = {
             'project_id': con.tenant,
@@ -92,22 +257,51 @@ class OpenStackClients(object):
             # TODO(shardy): May be able to remove when the bug above is fixed
             client = novaclient.Client(1.1, no_cache=True, **args)
             client.authenticate()
-            self._nova[service_type] = client
         except TypeError:
             # for compatibility with essex, which doesn't have no_cache=True
             # TODO(shardy): remove when we no longer support essex
             client = novaclient.Client(1.1, **args)
             client.authenticate()
-            self._nova[service_type] = client
 
         return client
 
+    def _tenant(self):
+        con = self.context
+        if con is None:
+            return None
+        return con.auth_url, con.tenant_id or con.tenant
+
+    def _owner(self, per_user):
+        owner = self._tenant()
+        if per_user and owner is not None:
+            con = self.context
+            owner += (con.username or con.auth_token,)
+        return owner
+
+    def nova_lookup(self, manager, name, per_user=False):
+        '''
+        Return the ID of the named entry listed by a novaclient manager (e.g.
+        the images or flavors of a Nova client), or None if it does not
+        exist. Lookups are cached for each tenant, or for each user if
+        per_user is set because the entries (e.g. keypairs) belong to a user.
+        '''
+        return catalog_cache.lookup(self._owner(per_user), manager, name)
+
+    def nova_invalidate(self, manager, per_user=False):
+        '''Discard any cached lookups for a novaclient manager.'''
+        catalog_cache.invalidate(self._owner(per_user), manager)
+
     def swift(self):
         if swiftclient is None:
             return None
         if self._swift:
             return self._swift
 
+        self._swift = client_pool.get(self._pool_key('swift'),
+                                      self._create_swift)
+        return self._swift
+
+    def _create_swift(self):
         con = self.context
         args = {
             'auth_version': '2'
@@ -138,8 +332,7 @@ class OpenStackClients(object):
                          "auth_token!")
             return None
 
-        self._swift = swiftclient.Connection(**args)
-        return self._swift
+        return swiftclient.Connection(**args)
 
     def quantum(self):
         if quantumclient is None:
@@ -148,6 +341,11 @@ class OpenStackClients(object):
             logger.debug('using existing _quantum')
             return self._quantum
 
+        self._quantum = client_pool.get(self._pool_key('quantum'),
+                                        self._create_quantum)
+        return self._quantum
+
+    def _create_quantum(self):
         con = self.context
         args = {
             'auth_url': con.auth_url,
@@ -169,9 +367,7 @@ class OpenStackClients(object):
             return None
         logger.debug('quantum args %s', args)
 
-        self._quantum = quantumclient.Client(**args)
-
-        return self._quantum
+        return quantumclient.Client(**args)
 
 
 if cfg.CONF.cloud_backend:
@@ -95,12 +95,14 @@ class Dependencies(object):
         (requirer, required) tuples.
         '''
         self.deps = collections.defaultdict(self.Node)
+        self._order = None
         for e in edges:
             self += e
 
     def __iadd__(self, edge):
         '''Add another edge, in the form of a (requirer, required) tuple'''
         requirer, required = edge
+        self._order = None
 
         if required is None:
             # Just ensure the node is created by accessing the defaultdict
@@ -165,37 +167,80 @@ class Dependencies(object):
         '''Return a string representation of the object'''
         return 'Dependencies([%s])' % ', '.join(repr(e) for e in edges)
 
-    def _toposort(self, deps):
-        '''Generate a topological sort of a dependency graph'''
-        def next_leaf():
-            for leaf, node in deps.items():
-                if not node:
-                    return leaf, node
+    def _toposort(self):
+        '''
+        Return a topological sort of the dependency graph as a tuple.
 
+        The sort uses Kahn's algorithm and so runs in O(V+E) time. The result
+        is cached until the graph is next modified.
+        '''
+        if self._order is not None:
+            return self._order
+
+        remaining = dict((k, len(n)) for k, n in self.deps.iteritems())
+        leaves = collections.deque(k for k, c in remaining.iteritems()
+                                   if not c)
+        order = []
+
+        while leaves:
+            leaf = leaves.popleft()
+            order.append(leaf)
+            del remaining[leaf]
+
+            # Remove the edges from every node that requires this one, and
+            # schedule any that become leaves as a result
+            for rqr in self.deps[leaf].required_by():
+                remaining[rqr] -= 1
+                if not remaining[rqr]:
+                    leaves.append(rqr)
+
+        if remaining:
             # There are nodes remaining, but no more leaves: a cycle
-            cycle = self._deps_to_str(deps)
+            cycle = self._deps_to_str(
+                dict((k, self.Node(set(rqd for rqd in self.deps[k]
+                                       if rqd in remaining)))
+                     for k in remaining))
             raise CircularDependencyException(cycle=cycle)
 
-        for iteration in xrange(len(deps)):
-            leaf, node = next_leaf()
-            yield leaf
+        self._order = tuple(order)
+        return self._order
 
-            # Remove the node and all edges connected to it before continuing
-            # to look for more leaves
-            for src in node.required_by():
-                deps[src] -= leaf
-            del deps[leaf]
-
-    def _mapgraph(self, func):
-        '''Map the supplied function onto every node in the graph.'''
-        return dict((k, func(n)) for k, n in self.deps.items())
+    def _iterate(self, reverse=False):
+        '''Generate the nodes in (optionally reverse) topological order'''
+        order = self._toposort()
+        for node in (reversed(order) if reverse else order):
+            yield node
 
     def __iter__(self):
         '''Return a topologically sorted iterator'''
-        deps = self._mapgraph(lambda n: n.copy())
-        return self._toposort(deps)
+        return self._iterate()
 
     def __reversed__(self):
         '''Return a reverse topologically sorted iterator'''
-        rev_deps = self._mapgraph(lambda n: n.reverse_copy())
-        return self._toposort(rev_deps)
+        return self._iterate(reverse=True)
+
+    def levels(self, reverse=False):
+        '''
+        Return a list of the levels of the graph, in topological (or, if
+        reverse is True, reverse topological) order. Each level is a tuple of
+        nodes that are independent of each other and that depend only on
+        nodes in earlier levels, so that all of the nodes in a level may be
+        processed in parallel once the previous levels are complete.
+        '''
+        order = self._toposort()
+        if reverse:
+            order = tuple(reversed(order))
+            requirements = lambda k: self.deps[k].required_by()
+        else:
+            requirements = lambda k: iter(self.deps[k])
+
+        depth = {}
+        levels = []
+        for key in order:
+            level = max([depth[r] + 1 for r in requirements(key)] or [0])
+            depth[key] = level
+            if level == len(levels):
+                levels.append([])
+            levels[level].append(key)
+
+        return [tuple(l) for l in levels]
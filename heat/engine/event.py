@@ -31,7 +31,8 @@ class Event(object):
         '''
         Initialise from a context, stack, resource, event information and
         current resource data. The timestamp and database ID may also be
-        initialised if the event is already in the database.
+        initialised if the event is already in the database, in which case
+        the resource properties may be None to load them only when needed.
         '''
         self.context = context
         self.resource = resource
@@ -39,10 +40,18 @@ class Event(object):
         self.new_state = new_state
         self.reason = reason
         self.physical_resource_id = physical_resource_id
-        self.resource_properties = dict(resource_properties)
+        self._resource_properties = resource_properties
         self.timestamp = timestamp
         self.id = id
 
+    @property
+    def resource_properties(self):
+        '''The snapshot of the resource's properties.'''
+        if self._resource_properties is None and self.id is not None:
+            ev = db_api.event_get(self.context, self.id)
+            self._resource_properties = ev.resource_properties
+        return self._resource_properties
+
     @classmethod
     def load(cls, context, event_id):
         '''Retrieve an Event from the database'''
@@ -58,13 +67,13 @@ class Event(object):
 
         event = cls(context, stack, resource,
                     ev.name, ev.resource_status_reason,
-                    ev.physical_resource_id, ev.resource_properties,
+                    ev.physical_resource_id, None,
                     ev.created_at, ev.id)
 
         return event
 
-    def store(self):
-        '''Store the Event in the database'''
+    def db_values(self):
+        '''Return the values with which to store the Event in the database'''
         ev = {
             'logical_resource_id': self.resource.name,
             'physical_resource_id': self.physical_resource_id,
@@ -80,10 +89,14 @@ class Event(object):
         if self.timestamp is not None:
             ev['created_at'] = self.timestamp
 
+        return ev
+
+    def store(self):
+        '''Store the Event in the database'''
         if self.id is not None:
             logger.warning('Duplicating event')
 
-        new_ev = db_api.event_create(self.context, ev)
+        new_ev = db_api.event_create(self.context, self.db_values())
         self.id = new_ev.id
         return self.id
 
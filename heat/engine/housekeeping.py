@@ -0,0 +1,123 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import eventlet
+
+from heat.db import api as db_api
+from heat.openstack.common import cfg
+from heat.openstack.common import log as logging
+from heat.openstack.common import timeutils
+
+logger = logging.getLogger(__name__)
+
+
+housekeeping_opts = [
+    cfg.IntOpt('housekeeping_interval',
+               default=3600,
+               help='Seconds between runs of the database housekeeping task'),
+    cfg.IntOpt('watch_data_retention',
+               default=7 * 24 * 3600,
+               help='Seconds for which aggregated watch data is kept '
+                    '(0 to keep it forever)'),
+    cfg.IntOpt('max_events_per_stack',
+               default=1000,
+               help='Maximum number of events kept for each stack '
+                    '(0 for no limit)'),
+    cfg.IntOpt('housekeeping_batch_size',
+               default=1000,
+               help='Maximum number of rows removed by a single DELETE')
+]
+cfg.CONF.register_opts(housekeeping_opts)
+
+
+def _bucket_start(time, period):
+    '''Return the start of the period-long bucket containing time.'''
+    seconds = int(timeutils.delta_seconds(datetime.datetime.min, time))
+    return datetime.datetime.min + datetime.timedelta(
+        seconds=seconds - seconds % period)
+
+
+def rollup_watch_rule(context, watch, now):
+    '''
+    Replace the raw samples for a watch rule that are older than the rule's
+    evaluation window with one aggregated sample per Period. At most
+    housekeeping_batch_size periods are processed in a single call.
+    '''
+    rule = watch.rule
+    metric_name = rule['MetricName']
+    period = int(rule['Period'])
+    window = period * int(rule.get('EvaluationPeriods', 1))
+    cutoff = _bucket_start(now - datetime.timedelta(seconds=window), period)
+
+    for i in range(cfg.CONF.housekeeping_batch_size):
+        earliest = db_api.watch_data_get_earliest(context, watch.id,
+                                                  end=cutoff)
+        if earliest is None:
+            break
+
+        start = _bucket_start(earliest, period)
+        end = start + datetime.timedelta(seconds=period)
+        db_api.watch_data_rollup(context, watch.id, metric_name, start, end,
+                                 rule.get('Namespace'), rule.get('Unit'))
+        eventlet.sleep(0)
+
+
+def rollup_watch_data(context, now=None):
+    '''
+    Aggregate the old watch data of every watch rule, and delete aggregated
+    data that is older than the configured retention time.
+    '''
+    if now is None:
+        now = timeutils.utcnow()
+
+    for watch in db_api.watch_rule_get_all(context):
+        try:
+            rollup_watch_rule(context, watch, now)
+        except Exception as ex:
+            logger.exception('Rolling up data for watch %s failed: %s' %
+                             (watch.name, str(ex)))
+
+    if cfg.CONF.watch_data_retention > 0:
+        expiry = now - datetime.timedelta(
+            seconds=cfg.CONF.watch_data_retention)
+        deleted = db_api.watch_data_delete_range(context, end=expiry,
+                                                 aggregated=True)
+        logger.debug('Deleted %d expired watch data samples' % deleted)
+
+
+def prune_events(context):
+    '''
+    Delete the oldest events of each stack with more than the configured
+    maximum, in batches of housekeeping_batch_size.
+    '''
+    max_events = cfg.CONF.max_events_per_stack
+    if max_events <= 0:
+        return
+
+    batch_size = cfg.CONF.housekeeping_batch_size
+    while True:
+        deleted = db_api.event_prune(context, max_events, batch_size)
+        logger.debug('Deleted %d events' % deleted)
+        if deleted == 0:
+            break
+        eventlet.sleep(0)
+
+
+def run(context):
+    '''Run all of the housekeeping tasks.'''
+    rollup_watch_data(context)
+    prune_events(context)
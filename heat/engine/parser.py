@@ -14,14 +14,15 @@
 #    under the License.
 
 import eventlet
-import functools
 
 from heat.common import exception
 from heat.engine import dependencies
 from heat.common import identifier
 from heat.engine import resource
+from heat.engine import scheduler
 from heat.engine import template
 from heat.engine import timestamp
+from heat.engine import writebuffer
 from heat.engine.parameters import Parameters
 from heat.engine.template import Template
 from heat.engine.clients import Clients
@@ -64,6 +65,7 @@ class Stack(object):
 
         self.id = stack_id
         self.context = context
+        self.write_buffer = None
         self.clients = Clients(context)
         self.t = tmpl
         self.name = stack_name
@@ -80,13 +82,36 @@ class Stack(object):
         else:
             self.outputs = {}
 
+        # Fetch the stored state of all the resources in a single query while
+        # they are being created, rather than one query per resource
+        if self.id is not None:
+            self._db_resources = db_api.resource_get_all_by_stack(context,
+                                                                  self.id)
+        else:
+            self._db_resources = {}
+
         template_resources = self.t[template.RESOURCES]
-        self.resources = dict((name,
-                               resource.Resource(name, data, self))
-                              for (name, data) in template_resources.items())
+        try:
+            self.resources = dict((name, resource.Resource(name, data, self))
+                                  for (name, data) in
+                                  template_resources.items())
+        finally:
+            self._db_resources = None
 
         self.dependencies = self._get_dependencies(self.resources.itervalues())
 
+    def db_resource_get(self, name):
+        '''
+        Return the database record of the named resource in this stack, or
+        None if it has not been stored.
+        '''
+        if self._db_resources is not None:
+            return self._db_resources.get(name)
+        if self.id is None:
+            return None
+        return db_api.resource_get_by_name_and_stack(self.context,
+                                                     name, self.id)
+
     @staticmethod
     def _get_dependencies(resources):
         '''Return the dependency graph for a list of resources'''
@@ -225,26 +250,31 @@ class Stack(object):
 
         stack_status = self.CREATE_COMPLETE
         reason = 'Stack successfully created'
-        res = None
+
+        # Resources are created concurrently, each one starting as soon as
+        # all of the resources it depends on are complete
+        create_task = scheduler.DependencyTaskGroup(self.dependencies,
+                                                    lambda r: r.create())
 
         with eventlet.Timeout(self.timeout_mins * 60) as tmo:
             try:
-                for res in self:
-                    if stack_status != self.CREATE_FAILED:
-                        result = res.create()
-                        if result:
-                            stack_status = self.CREATE_FAILED
-                            reason = 'Resource %s failed with: %s' % (str(res),
-                                                                      result)
+                with writebuffer.buffered(self):
+                    failures = create_task()
+                if failures:
+                    res, result = failures[0]
+                    stack_status = self.CREATE_FAILED
+                    reason = 'Resource %s failed with: %s' % (str(res),
+                                                              result)
 
-                    else:
+                    for res in create_task.pending:
                         res.state_set(res.CREATE_FAILED,
                                       'Stack creation aborted')
 
             except eventlet.Timeout as t:
                 if t is tmo:
                     stack_status = self.CREATE_FAILED
-                    reason = 'Timed out waiting for %s' % str(res)
+                    reason = 'Timed out waiting for %s' % ', '.join(
+                        str(r) for r in create_task.cancelled)
                 else:
                     # not my timeout
                     raise
@@ -374,13 +404,22 @@ class Stack(object):
         '''
         self.state_set(self.DELETE_IN_PROGRESS, 'Stack deletion started')
 
+        # Resources are deleted concurrently, each one as soon as everything
+        # that depends on it has been deleted. A failure does not prevent
+        # the deletion of the remaining resources from being attempted.
+        delete_task = scheduler.DependencyTaskGroup(self.dependencies,
+                                                    lambda r: r.destroy(),
+                                                    reverse=True,
+                                                    stop_on_failure=False)
+
+        with writebuffer.buffered(self):
+            results = delete_task()
+
         failures = []
-        for res in reversed(self):
-            result = res.destroy()
-            if result:
-                logger.error('Failed to delete %s error: %s' % (str(res),
-                                                                result))
-                failures.append(str(res))
+        for res, result in results:
+            logger.error('Failed to delete %s error: %s' % (str(res),
+                                                            result))
+            failures.append(str(res))
 
         if failures:
             self.state_set(self.DELETE_FAILED,
@@ -441,29 +480,8 @@ def resolve_static_data(template, parameters, snippet):
     >>> resolve_static_data(template, parameters, {'Ref': 'KeyName'})
     'my_key'
     '''
-    return transform(snippet,
-                     [functools.partial(template.resolve_param_refs,
-                                        parameters=parameters),
-                      template.resolve_availability_zones,
-                      template.resolve_find_in_map,
-                      template.reduce_joins])
+    return template.resolve_static(snippet, parameters)
 
 
 def resolve_runtime_data(template, resources, snippet):
-    return transform(snippet,
-                     [functools.partial(template.resolve_resource_refs,
-                                        resources=resources),
-                      functools.partial(template.resolve_attributes,
-                                        resources=resources),
-                      template.resolve_joins,
-                      template.resolve_base64])
-
-
-def transform(data, transformations):
-    '''
-    Apply each of the transformation functions in the supplied list to the data
-    in turn.
-    '''
-    for t in transformations:
-        data = t(data)
-    return data
+    return template.resolve_runtime(snippet, resources)
@@ -0,0 +1,154 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+from eventlet import event
+
+from heat.openstack.common import cfg
+from heat.openstack.common import log as logging
+
+logger = logging.getLogger(__name__)
+
+
+poller_opts = [
+    cfg.FloatOpt('status_poll_interval',
+                 default=1.0,
+                 help='Seconds between polls for the status of servers and '
+                      'volumes that resources are waiting on'),
+    cfg.FloatOpt('status_poll_max_interval',
+                 default=10.0,
+                 help='Maximum seconds between status polls when none of '
+                      'the objects being waited on change status')
+]
+cfg.CONF.register_opts(poller_opts)
+
+
+class StatusPoller(object):
+    '''
+    Wait for objects (such as servers or volumes) to change status, fetching
+    the status of every object being waited on with a single list call per
+    interval.
+
+    A single green thread performs the polling for as long as there are
+    waiters. The interval between polls doubles, up to a maximum, for as
+    long as none of the objects change status.
+    '''
+
+    def __init__(self, list_objects, on_idle=None):
+        '''
+        Initialise with a function that returns a list of objects having
+        "id" and "status" attributes. The optional on_idle function is called
+        when the poller stops because there is nothing left to wait for.
+        '''
+        self.list_objects = list_objects
+        self.on_idle = on_idle
+        self._waiters = {}
+        self._thread = None
+
+    def __len__(self):
+        return sum(len(w) for w in self._waiters.values())
+
+    def wait(self, obj_id, status):
+        '''
+        Block until the object with the given ID has a status other than the
+        one specified. Return the new status, or None if the object no longer
+        exists.
+        '''
+        waiter = (status, event.Event())
+        self._waiters.setdefault(obj_id, []).append(waiter)
+        try:
+            if self._thread is None:
+                self._thread = eventlet.spawn(self._run)
+            return waiter[1].wait()
+        finally:
+            self._remove(obj_id, waiter)
+
+    def _remove(self, obj_id, waiter):
+        waiters = self._waiters.get(obj_id, [])
+        if waiter in waiters:
+            waiters.remove(waiter)
+        if not waiters:
+            self._waiters.pop(obj_id, None)
+
+    def poll(self):
+        '''
+        Fetch the current status of all objects and wake the waiters for any
+        whose status has changed. Return True if any waiters were woken.
+        '''
+        try:
+            statuses = dict((o.id, o.status) for o in self.list_objects())
+        except Exception as ex:
+            logger.error('Failed to poll for status: %s' % str(ex))
+            for obj_id, waiters in self._waiters.items():
+                for status, ev in waiters:
+                    ev.send_exception(ex)
+                del self._waiters[obj_id]
+            return True
+
+        changed = False
+        for obj_id, waiters in self._waiters.items():
+            new_status = statuses.get(obj_id)
+            for waiter in list(waiters):
+                status, ev = waiter
+                if new_status != status:
+                    ev.send(new_status)
+                    waiters.remove(waiter)
+                    changed = True
+            if not waiters:
+                del self._waiters[obj_id]
+        return changed
+
+    def _run(self):
+        interval = cfg.CONF.status_poll_interval
+        try:
+            while self._waiters:
+                eventlet.sleep(interval)
+                if self.poll():
+                    interval = cfg.CONF.status_poll_interval
+                else:
+                    interval = min(interval * 2,
+                                   cfg.CONF.status_poll_max_interval)
+        finally:
+            self._thread = None
+            if self.on_idle is not None:
+                self.on_idle()
+
+
+_pollers = {}
+
+
+def wait(name, context, manager, obj):
+    '''
+    Block until the status of obj, a server or volume from the given nova
+    client manager, changes. Return the new status, or None if the object
+    no longer exists.
+
+    Waiters for objects of the same kind (name) belonging to the same tenant
+    share a single poller.
+    '''
+    key = (name, getattr(context, 'tenant_id', None))
+
+    poller = _pollers.get(key)
+    if poller is None:
+        def on_idle():
+            if not len(poller):
+                _pollers.pop(key, None)
+
+        poller = StatusPoller(manager.list, on_idle)
+        _pollers[key] = poller
+    else:
+        poller.list_objects = manager.list
+
+    return poller.wait(obj.id, obj.status)
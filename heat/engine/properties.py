@@ -150,6 +150,7 @@ class Properties(collections.Mapping):
         self.props = dict((k, Property(s, k)) for k, s in schema.items())
         self.resolve = resolver
         self.data = data
+        self._resolved = {}
         if parent_name is None:
             self.error_prefix = ''
         else:
@@ -176,15 +177,33 @@ class Properties(collections.Mapping):
         if key in self.data:
             value = self.resolve(self.data[key])
             try:
-                return prop.validate_data(value)
+                value = prop.validate_data(value)
             except ValueError as e:
                 raise ValueError(self.error_prefix + '%s %s' % (key, str(e)))
+            self._resolved[key] = value
+            return value
         elif prop.has_default():
             return prop.default()
         elif prop.required():
             raise ValueError(self.error_prefix +
                              'Property %s not assigned' % key)
 
+    def snapshot(self):
+        '''
+        Return the values of the properties without resolving them again.
+        Each property has the value it had when it was last read, or if it
+        has not been read, its value as given in the data or its default.
+        '''
+        values = {}
+        for key, prop in self.props.items():
+            if key in self._resolved:
+                values[key] = self._resolved[key]
+            elif key in self.data:
+                values[key] = self.data[key]
+            elif prop.has_default():
+                values[key] = prop.default()
+        return values
+
     def __len__(self):
         return len(self.props)
 
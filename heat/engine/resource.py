@@ -21,6 +21,7 @@ from heat.engine import event
 from heat.common import exception
 from heat.db import api as db_api
 from heat.common import identifier
+from heat.engine import rowcache
 from heat.engine import timestamp
 from heat.engine.properties import Properties
 
@@ -54,7 +55,8 @@ def _register_class(resource_type, resource_class):
 class Metadata(object):
     '''
     A descriptor for accessing the metadata of a resource while ensuring the
-    most up-to-date data is always obtained from the database.
+    most up-to-date data is always obtained from the database, unless it is
+    read within a rowcache scope.
     '''
 
     def __get__(self, resource, resource_class):
@@ -63,14 +65,15 @@ class Metadata(object):
             return None
         if resource.id is None:
             return resource.parsed_template('Metadata')
-        rs = db_api.resource_get(resource.stack.context, resource.id)
-        rs.refresh(attrs=['rsrc_metadata'])
+        rs = rowcache.load(db_api.resource_get, resource.stack.context,
+                           resource.id, ['rsrc_metadata'])
         return rs.rsrc_metadata
 
     def __set__(self, resource, metadata):
         '''Update the metadata for the owning resource.'''
         if resource.id is None:
             raise exception.ResourceNotAvailable(resource_name=resource.name)
+        rowcache.invalidate(db_api.resource_get, resource.id)
         rs = db_api.resource_get(resource.stack.context, resource.id)
         rs.update_and_save({'rsrc_metadata': metadata})
 
@@ -125,8 +128,7 @@ class Resource(object):
                                      self.stack.resolve_runtime_data,
                                      self.name)
 
-        resource = db_api.resource_get_by_name_and_stack(self.context,
-                                                         name, stack.id)
+        resource = stack.db_resource_get(name)
         if resource:
             self.resource_id = resource.nova_instance
             self.state = resource.state
@@ -318,6 +320,9 @@ class Resource(object):
         if self.id is None:
             return
 
+        if self.stack.write_buffer is not None:
+            self.stack.write_buffer.resource_deleted(self.id)
+
         try:
             db_api.resource_get(self.context, self.id).delete()
         except exception.NotFound:
@@ -332,7 +337,10 @@ class Resource(object):
 
     def resource_id_set(self, inst):
         self.resource_id = inst
-        if self.id is not None:
+        if self.id is not None and self.stack.write_buffer is not None:
+            self.stack.write_buffer.resource_updated(self, datetime.utcnow())
+
+        elif self.id is not None:
             try:
                 rs = db_api.resource_get(self.context, self.id)
                 rs.update_and_save({'nova_instance': self.resource_id})
@@ -359,9 +367,17 @@ class Resource(object):
 
     def _add_event(self, new_state, reason):
         '''Add a state change event to the database'''
+        # Record the properties as they were last resolved, rather than
+        # resolving every one of them again (possibly by calling out to
+        # other services) just to store the event
         ev = event.Event(self.context, self.stack, self,
                          new_state, reason,
-                         self.resource_id, self.properties)
+                         self.resource_id, self.properties.snapshot())
+
+        if self.stack.write_buffer is not None:
+            ev.timestamp = datetime.utcnow()
+            self.stack.write_buffer.add_event(ev)
+            return
 
         try:
             ev.store()
@@ -372,7 +388,10 @@ class Resource(object):
         self.state = new_state
         self.state_description = reason
 
-        if self.id is not None:
+        if self.id is not None and self.stack.write_buffer is not None:
+            self.stack.write_buffer.resource_updated(self, datetime.utcnow())
+
+        elif self.id is not None:
             try:
                 rs = db_api.resource_get(self.context, self.id)
                 rs.update_and_save({'state': self.state,
@@ -13,15 +13,56 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from heat.engine import dependencies
 from heat.engine import resource
+from heat.engine import scheduler
 from heat.engine.resources import instance
 
+from heat.openstack.common import cfg
 from heat.openstack.common import log as logging
+from heat.openstack.common import timeutils
 
 logger = logging.getLogger(__name__)
 
 
-class AutoScalingGroup(resource.Resource):
+autoscaling_opts = [
+    cfg.IntOpt('autoscaling_batch_size',
+               default=10,
+               help='Maximum number of instances in an autoscaling group '
+                    'that may be created or deleted concurrently')
+]
+cfg.CONF.register_opts(autoscaling_opts)
+
+
+class CooldownMixin(object):
+    '''
+    Utility class to enforce the Cooldown property of a resource, using the
+    time of its last scaling operation recorded in its metadata.
+    '''
+    LAST_SCALING = 'last_scaling'
+
+    def _cooldown_inprogress(self):
+        try:
+            cooldown = max(0, int(self.properties['Cooldown']))
+        except (TypeError, ValueError):
+            cooldown = 0
+
+        metadata = self.metadata
+        if not cooldown or not metadata or self.LAST_SCALING not in metadata:
+            return False
+        last_scaling = metadata[self.LAST_SCALING]['time']
+        return not timeutils.is_older_than(last_scaling, cooldown)
+
+    def _cooldown_timestamp(self, reason):
+        if self.id is None:
+            return
+        metadata = dict(self.metadata or {})
+        metadata[self.LAST_SCALING] = {'time': timeutils.strtime(),
+                                       'reason': reason}
+        self.metadata = metadata
+
+
+class AutoScalingGroup(resource.Resource, CooldownMixin):
     tags_schema = {'Key': {'Type': 'String',
                            'Required': True},
                    'Value': {'Type': 'String',
@@ -47,6 +88,10 @@ class AutoScalingGroup(resource.Resource):
                                             'Schema': tags_schema}}
     }
 
+    # The adjustments requested for each group while it is being scaled,
+    # keyed by stack ID and group name
+    _pending_adjustments = {}
+
     def __init__(self, name, json_snippet, stack):
         super(AutoScalingGroup, self).__init__(name, json_snippet, stack)
         # resource_id is a list of resources
@@ -86,17 +131,41 @@ class AutoScalingGroup(resource.Resource):
         if self.resource_id is not None:
             inst_list = self.resource_id.split(',')
             logger.debug('handle_delete %s' % str(inst_list))
-            for victim in inst_list:
-                logger.debug('handle_delete %s' % victim)
-                inst = self._make_instance(victim)
-                inst.destroy()
-
-    def adjust(self, adjustment, adjustment_type='ChangeInCapacity'):
-        inst_list = []
-        if self.resource_id is not None:
-            inst_list = sorted(self.resource_id.split(','))
-
-        capacity = len(inst_list)
+            for batch in self._batches(inst_list):
+                self._run_batch(batch, 'destroy')
+
+    @staticmethod
+    def _batches(names):
+        '''Split a list of instance names into batches.'''
+        size = max(cfg.CONF.autoscaling_batch_size, 1)
+        return [names[i:i + size] for i in range(0, len(names), size)]
+
+    def _run_batch(self, names, action):
+        '''
+        Concurrently create or destroy (according to action) the instances
+        with the given names.
+        '''
+        instances = dict((name, self._make_instance(name)) for name in names)
+        task = scheduler.DependencyTaskGroup(
+            dependencies.Dependencies([(name, None) for name in names]),
+            lambda name: getattr(instances[name], action)(),
+            max_concurrent=len(names),
+            stop_on_failure=False)
+
+        for name, error in task():
+            logger.error('Failed to %s instance %s: %s' %
+                         (action, name, error))
+
+    def _instance_list(self):
+        if self.resource_id is None:
+            return []
+        return sorted(self.resource_id.split(','))
+
+    def _new_capacity(self, capacity, adjustment, adjustment_type):
+        '''
+        Return the capacity resulting from an adjustment, or the unchanged
+        capacity if the adjustment would take it out of bounds.
+        '''
         if adjustment_type == 'ChangeInCapacity':
             new_capacity = capacity + adjustment
         elif adjustment_type == 'ExactCapacity':
@@ -107,32 +176,77 @@ class AutoScalingGroup(resource.Resource):
 
         if new_capacity > int(self.properties['MaxSize']):
             logger.warn('can not exceed %s' % self.properties['MaxSize'])
-            return
+            return capacity
         if new_capacity < int(self.properties['MinSize']):
             logger.warn('can not be less than %s' % self.properties['MinSize'])
-            return
+            return capacity
+        return new_capacity
 
-        if new_capacity == capacity:
-            logger.debug('no change in capacity %d' % capacity)
-            return
+    def adjust(self, adjustment, adjustment_type='ChangeInCapacity'):
+        '''
+        Adjust the size of the group, unless a previous adjustment is still
+        within the Cooldown period. Adjustments requested while the group is
+        being resized are combined into a single adjustment which is made
+        once the resize is complete. Returns True if the group was resized.
+        '''
+        key = (self.stack.id, self.name)
+        pending = self._pending_adjustments.get(key)
+        if pending is not None:
+            logger.info('%s is being resized, deferring adjustment %s %s' %
+                        (self.name, adjustment_type, adjustment))
+            pending.append((adjustment, adjustment_type))
+            return False
+
+        if self._cooldown_inprogress():
+            logger.info('%s NOT performing scaling adjustment, cooldown %s' %
+                        (self.name, self.properties['Cooldown']))
+            return False
+
+        pending = [(adjustment, adjustment_type)]
+        self._pending_adjustments[key] = pending
+        try:
+            resized = False
+            while pending:
+                capacity = new_capacity = len(self._instance_list())
+                for adj, adj_type in pending:
+                    new_capacity = self._new_capacity(new_capacity,
+                                                      adj, adj_type)
+                del pending[:]
+
+                if new_capacity == capacity:
+                    logger.debug('no change in capacity %d' % capacity)
+                else:
+                    self._resize(new_capacity)
+                    resized = True
+        finally:
+            del self._pending_adjustments[key]
+
+        if resized:
+            self._cooldown_timestamp('%s : %s' % (adjustment_type,
+                                                  adjustment))
+        return resized
+
+    def _resize(self, new_capacity):
+        inst_list = self._instance_list()
+        capacity = len(inst_list)
         logger.debug('adjusting capacity from %d to %d' % (capacity,
                                                            new_capacity))
 
         if new_capacity > capacity:
             # grow
-            for x in range(capacity, new_capacity):
-                name = '%s-%d' % (self.name, x)
-                inst = self._make_instance(name)
-                inst_list.append(name)
+            new_list = ['%s-%d' % (self.name, x)
+                        for x in range(capacity, new_capacity)]
+            for batch in self._batches(new_list):
+                inst_list.extend(batch)
                 self.resource_id_set(','.join(inst_list))
-                inst.create()
+                self._run_batch(batch, 'create')
         else:
             # shrink (kill largest numbered first)
-            del_list = inst_list[new_capacity:]
-            for victim in reversed(del_list):
-                inst = self._make_instance(victim)
-                inst.destroy()
-                inst_list.remove(victim)
+            del_list = list(reversed(inst_list[new_capacity:]))
+            for batch in self._batches(del_list):
+                self._run_batch(batch, 'destroy')
+                for victim in batch:
+                    inst_list.remove(victim)
                 self.resource_id_set(','.join(inst_list))
 
         # notify the LoadBalancer to reload it's config to include
@@ -179,7 +293,7 @@ class LaunchConfiguration(resource.Resource):
         super(LaunchConfiguration, self).__init__(name, json_snippet, stack)
 
 
-class ScalingPolicy(resource.Resource):
+class ScalingPolicy(resource.Resource, CooldownMixin):
     properties_schema = {
         'AutoScalingGroupName': {'Type': 'String',
                                  'Required': True},
@@ -197,13 +311,23 @@ class ScalingPolicy(resource.Resource):
         super(ScalingPolicy, self).__init__(name, json_snippet, stack)
 
     def alarm(self):
+        if self._cooldown_inprogress():
+            logger.info('%s NOT performing scaling action, cooldown %s' %
+                        (self.name, self.properties['Cooldown']))
+            return
+
         group = self.stack.resources[self.properties['AutoScalingGroupName']]
 
         logger.info('%s Alarm, adjusting Group %s by %s' %
                     (self.name, group.name,
                      self.properties['ScalingAdjustment']))
-        group.adjust(int(self.properties['ScalingAdjustment']),
-                     self.properties['AdjustmentType'])
+        if not group.adjust(int(self.properties['ScalingAdjustment']),
+                            self.properties['AdjustmentType']):
+            return
+
+        self._cooldown_timestamp('%s : %s' %
+                                 (self.properties['AdjustmentType'],
+                                  self.properties['ScalingAdjustment']))
 
 
 def resource_mapping():
@@ -38,7 +38,10 @@ class CloudWatchAlarm(resource.Resource):
                                                          'Average',
                                                          'Sum',
                                                          'Minimum',
-                                                         'Maximum']},
+                                                         'Maximum',
+                                                         'p50',
+                                                         'p90',
+                                                         'p99']},
                          'AlarmActions': {'Type': 'List'},
                          'OKActions': {'Type': 'List'},
                          'Dimensions': {'Type': 'List'},
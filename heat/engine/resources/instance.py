@@ -13,7 +13,6 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import eventlet
 import os
 import json
 from email.mime.multipart import MIMEMultipart
@@ -22,6 +21,7 @@ import pkgutil
 from urlparse import urlparse
 
 from heat.engine import clients
+from heat.engine import poller
 from heat.engine import resource
 from heat.common import exception
 
@@ -220,25 +220,20 @@ class Instance(resource.Resource):
         flavor = self.properties['InstanceType']
         key_name = self.properties['KeyName']
 
-        keypairs = [k.name for k in self.nova().keypairs.list()]
-        if key_name not in keypairs:
+        lookup = self.stack.clients.nova_lookup
+        if lookup(self.nova().keypairs, key_name, per_user=True) is None:
             raise exception.UserKeyPairMissing(key_name=key_name)
 
         image_name = self.properties['ImageId']
-        image_id = None
-        image_list = self.nova().images.list()
-        for o in image_list:
-            if o.name == image_name:
-                image_id = o.id
 
-        if image_id is None:
-            logger.info("Image %s was not found in glance" % image_name)
-            raise exception.ImageNotFound(image_name=image_name)
+        def lookup_ids():
+            image_id = lookup(self.nova().images, image_name)
+            if image_id is None:
+                logger.info("Image %s was not found in glance" % image_name)
+                raise exception.ImageNotFound(image_name=image_name)
+            return image_id, lookup(self.nova().flavors, flavor)
 
-        flavor_list = self.nova().flavors.list()
-        for o in flavor_list:
-            if o.name == flavor:
-                flavor_id = o.id
+        image_id, flavor_id = lookup_ids()
 
         tags = {}
         if self.properties['Tags']:
@@ -255,17 +250,33 @@ class Instance(resource.Resource):
             scheduler_hints = None
 
         server_userdata = self._build_userdata(userdata)
-        server = self.nova().servers.create(name=self.physical_resource_name(),
-                                            image=image_id,
-                                            flavor=flavor_id,
-                                            key_name=key_name,
-                                            security_groups=security_groups,
-                                            userdata=server_userdata,
-                                            meta=tags,
-                                            scheduler_hints=scheduler_hints)
+
+        def create_server(image_id, flavor_id):
+            return self.nova().servers.create(
+                name=self.physical_resource_name(),
+                image=image_id,
+                flavor=flavor_id,
+                key_name=key_name,
+                security_groups=security_groups,
+                userdata=server_userdata,
+                meta=tags,
+                scheduler_hints=scheduler_hints)
+
+        try:
+            server = create_server(image_id, flavor_id)
+        except (clients.novaclient.exceptions.BadRequest,
+                clients.novaclient.exceptions.NotFound):
+            # The cached image or flavor may have been deleted since it was
+            # looked up, so look them up afresh and retry if they changed
+            self.stack.clients.nova_invalidate(self.nova().images)
+            self.stack.clients.nova_invalidate(self.nova().flavors)
+            ids = lookup_ids()
+            if ids == (image_id, flavor_id):
+                raise
+            server = create_server(*ids)
         while server.status == 'BUILD':
+            poller.wait('servers', self.context, self.nova().servers, server)
             server.get()
-            eventlet.sleep(1)
         if server.status == 'ACTIVE':
             self.resource_id_set(server.id)
             self._set_ipaddress(server.networks)
@@ -292,10 +303,9 @@ class Instance(resource.Resource):
         except ValueError:
             return
         else:
-            keypairs = self.nova().keypairs.list()
-            for k in keypairs:
-                if k.name == key_name:
-                    return
+            if self.stack.clients.nova_lookup(self.nova().keypairs, key_name,
+                                              per_user=True) is not None:
+                return
         return {'Error':
                 'Provided KeyName is not registered with nova'}
 
@@ -312,11 +322,12 @@ class Instance(resource.Resource):
         else:
             server.delete()
             while server.status == 'ACTIVE':
+                poller.wait('servers', self.context, self.nova().servers,
+                            server)
                 try:
                     server.get()
                 except clients.novaclient.exceptions.NotFound:
                     break
-                eventlet.sleep(0.2)
         self.resource_id = None
 
 
@@ -34,25 +34,29 @@ class SecurityGroup(resource.Resource):
         super(SecurityGroup, self).__init__(name, json_snippet, stack)
 
     def handle_create(self):
-        sec = None
+        groups = self.nova().security_groups
+        sec_id = self.stack.clients.nova_lookup(groups, self.name)
 
-        groups = self.nova().security_groups.list()
-        for group in groups:
-            if group.name == self.name:
-                sec = group
-                break
+        if sec_id is not None:
+            try:
+                groups.get(sec_id)
+            except clients.novaclient.exceptions.NotFound:
+                # The cached group has been deleted since it was looked up
+                self.stack.clients.nova_invalidate(groups)
+                sec_id = self.stack.clients.nova_lookup(groups, self.name)
 
-        if not sec:
+        if sec_id is None:
             sec = self.nova().security_groups.create(
                 self.physical_resource_name(),
                 self.properties['GroupDescription'])
+            sec_id = sec.id
 
-        self.resource_id_set(sec.id)
+        self.resource_id_set(sec_id)
         if self.properties['SecurityGroupIngress']:
             rules_client = self.nova().security_group_rules
             for i in self.properties['SecurityGroupIngress']:
                 try:
-                    rule = rules_client.create(sec.id,
+                    rule = rules_client.create(sec_id,
                                                i['IpProtocol'],
                                                i['FromPort'],
                                                i['ToPort'],
@@ -82,6 +86,8 @@ class SecurityGroup(resource.Resource):
                         pass
 
                 self.nova().security_groups.delete(sec)
+                self.stack.clients.nova_invalidate(
+                    self.nova().security_groups)
             self.resource_id = None
 
     def FnGetRefId(self):
@@ -17,6 +17,7 @@ import eventlet
 from heat.openstack.common import log as logging
 
 from heat.engine import clients
+from heat.engine import poller
 from heat.common import exception
 from heat.engine import resource
 
@@ -40,7 +41,8 @@ class Volume(resource.Resource):
             display_description=self.physical_resource_name())
 
         while vol.status == 'creating':
-            eventlet.sleep(1)
+            poller.wait('volumes', self.context,
+                        self.nova('volume').volumes, vol)
             vol.get()
         if vol.status == 'available':
             self.resource_id_set(vol.id)
@@ -84,7 +86,8 @@ class VolumeAttachment(resource.Resource):
 
         vol = self.nova('volume').volumes.get(va.id)
         while vol.status == 'available' or vol.status == 'attaching':
-            eventlet.sleep(1)
+            poller.wait('volumes', self.context,
+                        self.nova('volume').volumes, vol)
             vol.get()
         if vol.status == 'in-use':
             self.resource_id_set(va.id)
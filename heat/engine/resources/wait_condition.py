@@ -14,11 +14,13 @@
 #    under the License.
 
 import eventlet
+from eventlet import event
 import time
 import urllib
 import urlparse
 import json
 
+from heat.common import cache
 from heat.common import exception
 from heat.common import identifier
 from heat.engine import resource
@@ -40,6 +42,65 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+waitcondition_opts = [
+    cfg.IntOpt('heat_waitcondition_url_lifetime',
+               default=3600,
+               help='Seconds for which the pre-signed URL of a wait '
+                    'condition handle is reused before being signed again'),
+    cfg.IntOpt('heat_waitcondition_url_cache_size',
+               default=1000,
+               help='Maximum number of pre-signed wait condition handle '
+                    'URLs cached')
+]
+cfg.CONF.register_opts(waitcondition_opts)
+
+
+class SignalListener(object):
+    '''
+    Listen for the signals received by a wait condition handle in this
+    engine, so that a waiting green thread can be woken as soon as a signal
+    is stored instead of polling the database for it.
+    '''
+
+    # The active listeners, indexed by the database ID of the handle
+    _listeners = {}
+
+    def __init__(self, handle_id):
+        self.handle_id = handle_id
+        self._event = event.Event()
+
+    def __enter__(self):
+        self._listeners.setdefault(self.handle_id, set()).add(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        listeners = self._listeners.get(self.handle_id, set())
+        listeners.discard(self)
+        if not listeners:
+            self._listeners.pop(self.handle_id, None)
+        return False
+
+    def wait(self, timeout):
+        '''
+        Wait until the handle is signalled, or until timeout seconds have
+        passed. Signals received since the last wait return immediately.
+        '''
+        with eventlet.Timeout(timeout, False):
+            self._event.wait()
+        if self._event.ready():
+            self._event = event.Event()
+
+    def _notify(self):
+        if not self._event.ready():
+            self._event.send()
+
+    @classmethod
+    def notify(cls, handle_id):
+        '''Wake the listeners for the handle with the given database ID.'''
+        for listener in cls._listeners.get(handle_id, ()):
+            listener._notify()
+
+
 class WaitConditionHandle(resource.Resource):
     '''
     the main point of this class is to :
@@ -50,6 +111,9 @@ class WaitConditionHandle(resource.Resource):
     '''
     properties_schema = {}
 
+    # The signed URLs of all handles, indexed by keystone user ID
+    _signed_urls = cache.ExpiringCache()
+
     def __init__(self, name, json_snippet, stack):
         super(WaitConditionHandle, self).__init__(name, json_snippet, stack)
 
@@ -97,6 +161,7 @@ class WaitConditionHandle(resource.Resource):
     def handle_delete(self):
         if self.resource_id is None:
             return
+        self._signed_urls.pop(self.resource_id)
         self.keystone().delete_stack_user(self.resource_id)
 
     def handle_update(self):
@@ -107,13 +172,31 @@ class WaitConditionHandle(resource.Resource):
         Override the default resource FnGetRefId so we return the signed URL
         '''
         if self.resource_id:
-            urlpath = self.identifier().arn_url_path()
-            ec2_creds = self.keystone().get_ec2_keypair(self.resource_id)
-            signed_url = self._sign_url(ec2_creds, urlpath)
-            return unicode(signed_url)
+            return unicode(self._signed_url())
         else:
             return unicode(self.name)
 
+    def _signed_url(self):
+        '''
+        Return the signed URL for the handle, reusing a previously signed one
+        for up to heat_waitcondition_url_lifetime seconds.
+        '''
+        urlpath = self.identifier().arn_url_path()
+        target = (cfg.CONF.heat_waitcondition_server_url, urlpath)
+
+        cached = self._signed_urls.get(self.resource_id)
+        if cached is not None:
+            cached_target, signed_url = cached
+            if cached_target == target:
+                return signed_url
+
+        ec2_creds = self.keystone().get_ec2_keypair(self.resource_id)
+        signed_url = self._sign_url(ec2_creds, urlpath)
+        self._signed_urls.set(self.resource_id, (target, signed_url),
+                              cfg.CONF.heat_waitcondition_url_lifetime,
+                              cfg.CONF.heat_waitcondition_url_cache_size)
+        return signed_url
+
     def _metadata_format_ok(self, metadata):
         """
         Check the format of the provided metadata is as expected.
@@ -145,6 +228,7 @@ class WaitConditionHandle(resource.Resource):
             # is a Metadata descriptor object which only supports get/set
             rsrc_metadata.update({metadata['UniqueId']: new_metadata})
             self.metadata = rsrc_metadata
+            SignalListener.notify(self.id)
         else:
             logger.error("Metadata failed validation for %s" % self.name)
             raise ValueError("Metadata format invalid")
@@ -187,12 +271,13 @@ class WaitCondition(resource.Resource):
                          'Count': {'Type': 'Number',
                                    'MinValue': '1'}}
 
-    # Sleep time between polling for wait completion
-    # is calculated as a fraction of timeout time
-    # bounded by MIN_SLEEP and MAX_SLEEP
-    MIN_SLEEP = 1  # seconds
-    MAX_SLEEP = 10
-    SLEEP_DIV = 100  # 1/100'th of timeout
+    # Signals received by this engine wake the wait immediately, so the
+    # database is polled only to pick up signals received by other engines.
+    # The sleep time between polls is calculated as a fraction of timeout
+    # time bounded by MIN_SLEEP and MAX_SLEEP
+    MIN_SLEEP = 5  # seconds
+    MAX_SLEEP = 30
+    SLEEP_DIV = 10  # 1/10'th of timeout
 
     def __init__(self, name, json_snippet, stack):
         super(WaitCondition, self).__init__(name, json_snippet, stack)
@@ -216,24 +301,26 @@ class WaitCondition(resource.Resource):
         status = FAILURE
         reason = "Unknown reason"
         try:
-            # keep polling our Metadata to see if the cfn-signal has written
-            # it yet. The execution here is limited by timeout.
+            # wait for the cfn-signal to write our Metadata, checking it
+            # whenever we are notified of a signal or the poll interval
+            # passes. The execution here is limited by timeout.
             with self._create_timeout() as tmo:
                 handle_res_name = self._get_handle_resource_name()
                 handle = self.stack[handle_res_name]
                 self.resource_id_set(handle_res_name)
 
-                # Poll for WaitConditionHandle signals indicating
+                # Wait for WaitConditionHandle signals indicating
                 # SUCCESS/FAILURE.  We need self.count SUCCESS signals
                 # before we can declare the WaitCondition CREATE_COMPLETE
-                handle_status = handle.get_status()
-                while (FAILURE not in handle_status
-                       and len(handle_status) < self.count):
-                    logger.debug('Polling for WaitCondition completion,' +
-                                 ' sleeping for %s seconds, timeout %s' %
-                                 (self.sleep_time, self.timeout))
-                    eventlet.sleep(self.sleep_time)
+                with SignalListener(handle.id) as listener:
                     handle_status = handle.get_status()
+                    while (FAILURE not in handle_status
+                           and len(handle_status) < self.count):
+                        logger.debug('Waiting for WaitCondition signal,' +
+                                     ' polling in %s seconds, timeout %s' %
+                                     (self.sleep_time, self.timeout))
+                        listener.wait(self.sleep_time)
+                        handle_status = handle.get_status()
 
                 if FAILURE in handle_status:
                     reason = handle.get_status_reason(FAILURE)
@@ -0,0 +1,92 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+
+from eventlet import corolocal
+
+
+_local = corolocal.local()
+
+
+class RowCache(object):
+    '''
+    A unit of work in which each database row read through the Metadata and
+    Timestamp descriptors is loaded only once.
+    '''
+
+    def __init__(self):
+        self._rows = {}
+
+    def get(self, db_fetch, context, obj_id):
+        '''
+        Return the row for the given ID, fetching it (given a context and ID)
+        and refreshing it from the database only the first time it is read.
+        '''
+        key = (db_fetch, obj_id)
+        if key not in self._rows:
+            row = db_fetch(context, obj_id)
+            row.refresh()
+            self._rows[key] = row
+        return self._rows[key]
+
+    def discard(self, db_fetch, obj_id):
+        '''Discard the cached row for the given ID, if any.'''
+        self._rows.pop((db_fetch, obj_id), None)
+
+
+def current():
+    '''Return the RowCache in use by the current green thread, if any.'''
+    return getattr(_local, 'cache', None)
+
+
+@contextlib.contextmanager
+def scope():
+    '''
+    Serve the descriptor reads in the current green thread from a single
+    RowCache for the duration of the block. Use this only where every row
+    need be read at most once, as changes made by other processes while the
+    block runs are not seen.
+    '''
+    if current() is not None:
+        yield current()
+        return
+
+    _local.cache = RowCache()
+    try:
+        yield _local.cache
+    finally:
+        del _local.cache
+
+
+def load(db_fetch, context, obj_id, attrs):
+    '''
+    Return the row for the given ID with the specified attributes up to date,
+    from the current RowCache if there is one.
+    '''
+    cache = current()
+    if cache is not None:
+        return cache.get(db_fetch, context, obj_id)
+
+    row = db_fetch(context, obj_id)
+    row.refresh(attrs=attrs)
+    return row
+
+
+def invalidate(db_fetch, obj_id):
+    '''Discard the row for the given ID from the current RowCache, if any.'''
+    cache = current()
+    if cache is not None:
+        cache.discard(db_fetch, obj_id)
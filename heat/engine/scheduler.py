@@ -0,0 +1,143 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import heapq
+
+import eventlet
+from eventlet import queue
+
+from heat.openstack.common import cfg
+from heat.openstack.common import log as logging
+
+logger = logging.getLogger(__name__)
+
+
+scheduler_opts = [
+    cfg.IntOpt('max_concurrent_resources',
+               default=10,
+               help='Maximum number of resources within a single stack that '
+                    'may be created or deleted concurrently')
+]
+cfg.CONF.register_opts(scheduler_opts)
+
+
+class DependencyTaskGroup(object):
+    '''
+    Run a task for every node of a dependency graph, starting each one in its
+    own green thread as soon as all of the nodes it requires are complete.
+    '''
+
+    def __init__(self, dependencies, task, reverse=False,
+                 max_concurrent=None, stop_on_failure=True):
+        '''
+        Initialise with a Dependencies object and a task function. The task
+        is called with a node of the graph and returns an error string on
+        failure (or raises an exception), and None on success.
+
+        If reverse is True, the graph is traversed in reverse order, i.e. each
+        node is started only once everything that requires it is complete.
+
+        If stop_on_failure is True, no further tasks are started after the
+        first failure; otherwise a failed task is treated as complete for the
+        purposes of scheduling the remaining nodes.
+        '''
+        self.dependencies = dependencies
+        self.task = task
+        self.reverse = reverse
+        if max_concurrent is None:
+            max_concurrent = cfg.CONF.max_concurrent_resources
+        self.max_concurrent = max(int(max_concurrent), 1)
+        self.stop_on_failure = stop_on_failure
+
+        self.running = {}
+        self.failures = []
+        self.pending = []
+        self.cancelled = []
+
+    def _graph(self):
+        '''
+        Return a dict mapping each node to the set of nodes which must be
+        complete before it may be started, and a dict mapping each node to
+        the nodes that are waiting on it.
+        '''
+        deps = self.dependencies.deps
+        forward = dict((k, set(n)) for k, n in deps.items())
+        backward = dict((k, set(n.required_by())) for k, n in deps.items())
+        if self.reverse:
+            return backward, forward
+        return forward, backward
+
+    def _run_task(self, key, results):
+        try:
+            result = self.task(key)
+        except Exception as ex:
+            logger.exception('Task for %s failed' % str(key))
+            result = str(ex)
+        results.put((key, result))
+
+    def __call__(self):
+        '''
+        Run the tasks, returning a list of (node, error) tuples for each task
+        that failed, in the order in which they failed. Nodes that were never
+        started because of an earlier failure are left in self.pending.
+
+        If the calling thread is interrupted (e.g. by an eventlet.Timeout),
+        any tasks still running are killed before the exception propagates
+        and their nodes are recorded in self.cancelled.
+        '''
+        requirements, dependents = self._graph()
+        if self.reverse:
+            order = list(reversed(self.dependencies))
+        else:
+            order = list(iter(self.dependencies))
+        priority = dict((k, i) for i, k in enumerate(order))
+
+        # Nodes are started in topological order whenever more than one of
+        # them is ready at the same time
+        ready = [(priority[k], k) for k in order if not requirements[k]]
+        pending = set(order)
+        results = queue.LightQueue()
+
+        try:
+            while ready or self.running:
+                if not (self.stop_on_failure and self.failures):
+                    while ready and len(self.running) < self.max_concurrent:
+                        key = heapq.heappop(ready)[1]
+                        pending.discard(key)
+                        self.running[key] = eventlet.spawn(self._run_task,
+                                                           key, results)
+
+                if not self.running:
+                    break
+
+                key, result = results.get()
+                del self.running[key]
+                if result:
+                    self.failures.append((key, result))
+
+                if not (result and self.stop_on_failure):
+                    for dep in dependents[key]:
+                        requirements[dep].discard(key)
+                        if not requirements[dep]:
+                            heapq.heappush(ready, (priority[dep], dep))
+        finally:
+            self.cancelled = self.running.keys()
+            for key, thread in self.running.items():
+                logger.warning('Cancelling task for %s' % str(key))
+                thread.kill()
+            self.running.clear()
+            self.pending = sorted(pending, key=priority.get)
+
+        return self.failures
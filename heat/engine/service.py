@@ -20,12 +20,13 @@ from heat.common import context
 from heat.db import api as db_api
 from heat.engine import api
 from heat.engine import clients
-from heat.engine.event import Event
+from heat.engine import housekeeping
 from heat.common import exception
 from heat.common import identifier
 from heat.engine import parser
 from heat.engine import resource
 from heat.engine import resources
+from heat.engine import rowcache
 from heat.engine import watchrule
 
 from heat.openstack.common import cfg
@@ -62,22 +63,13 @@ class EngineService(service.Service):
         super(EngineService, self).__init__(host, topic)
         # stg == "Stack Thread Groups"
         self.stg = {}
+        self.watcher = watchrule.WatchRuleScheduler(self._start_in_thread)
 
     def _start_in_thread(self, stack_id, func, *args, **kwargs):
         if stack_id not in self.stg:
             self.stg[stack_id] = threadgroup.ThreadGroup()
         self.stg[stack_id].add_thread(func, *args, **kwargs)
 
-    def _timer_in_thread(self, stack_id, func, *args, **kwargs):
-        """
-        Define a periodic task, to be run in a separate thread, in the stack
-        threadgroups.  Periodicity is cfg.CONF.periodic_interval
-        """
-        if stack_id not in self.stg:
-            self.stg[stack_id] = threadgroup.ThreadGroup()
-        self.stg[stack_id].add_timer(cfg.CONF.periodic_interval,
-                                     func, *args, **kwargs)
-
     def _service_task(self):
         """
         This is a dummy task which gets queued on the service.Service
@@ -88,6 +80,16 @@ class EngineService(service.Service):
         """
         pass
 
+    def _housekeeping_task(self):
+        """
+        Periodic task, run on the service threadgroup, which limits the
+        growth of the watch data and event tables.
+        """
+        try:
+            housekeeping.run(context.get_admin_context())
+        except Exception as ex:
+            logger.exception('Database housekeeping failed: %s' % str(ex))
+
     def start(self):
         super(EngineService, self).start()
 
@@ -96,11 +98,13 @@ class EngineService(service.Service):
         self.tg.add_timer(cfg.CONF.periodic_interval,
                           self._service_task)
 
-        # Create a periodic_watcher_task per-stack
-        admin_context = context.get_admin_context()
-        stacks = db_api.stack_get_all(admin_context)
-        for s in stacks:
-            self._timer_in_thread(s.id, self._periodic_watcher_task, sid=s.id)
+        self.tg.add_timer(cfg.CONF.housekeeping_interval,
+                          self._housekeeping_task)
+
+        # Watch rules are evaluated when new data arrives, and a single
+        # periodic task evaluates those which have stopped receiving data
+        self.tg.add_timer(cfg.CONF.periodic_interval,
+                          self._periodic_watcher_task)
 
     @request_context
     def identify_stack(self, context, stack_name):
@@ -153,29 +157,26 @@ class EngineService(service.Service):
             stack = parser.Stack.load(context, stack=s)
             return api.format_stack(stack)
 
-        return [format_stack_detail(s) for s in stacks]
+        with rowcache.scope():
+            return [format_stack_detail(s) for s in stacks]
 
     @request_context
-    def list_stacks(self, context):
+    def list_stacks(self, context, limit=None, marker=None):
         """
-        The list_stacks method returns attributes of all stacks.
+        The list_stacks method returns summary attributes of all stacks.
         arg1 -> RPC context.
+        arg2 -> Maximum number of stacks to return
+        arg3 -> ID of the last stack in the previous page of results
         """
-
-        def format_stack_details(stacks):
-            for s in stacks:
-                try:
-                    stack = parser.Stack.load(context, stack=s,
-                                              resolve_data=False)
-                except exception.NotFound:
-                    # The stack may have been deleted between listing
-                    # and formatting
-                    pass
-                else:
-                    yield api.format_stack(stack)
-
-        stacks = db_api.stack_get_all_by_tenant(context) or []
-        return list(format_stack_details(stacks))
+        if limit is not None:
+            limit = int(limit)
+            if limit <= 0:
+                raise ValueError('limit must be a positive integer')
+        try:
+            stacks = db_api.stack_get_all_by_tenant(context, limit, marker)
+        except exception.NotFound:
+            raise exception.StackNotFound(stack_name=marker)
+        return [api.format_stack_summary(s) for s in stacks or []]
 
     @request_context
     def create_stack(self, context, stack_name, template, params, args):
@@ -212,10 +213,6 @@ class EngineService(service.Service):
 
         self._start_in_thread(stack_id, stack.create)
 
-        # Schedule a periodic watcher task for this stack
-        self._timer_in_thread(stack_id, self._periodic_watcher_task,
-                              sid=stack_id)
-
         return dict(stack.identifier())
 
     @request_context
@@ -348,20 +345,33 @@ class EngineService(service.Service):
         return list(resource.get_types())
 
     @request_context
-    def list_events(self, context, stack_identity):
+    def list_events(self, context, stack_identity, limit=None, marker=None,
+                    resource_name=None):
         """
         The list_events method lists all events associated with a given stack.
         arg1 -> RPC context.
         arg2 -> Name of the stack you want to get events for.
+        arg3 -> Maximum number of events to return
+        arg4 -> Return only events with an ID greater than this one
+        arg5 -> Return only events for the named resource
         """
+        if limit is not None:
+            limit = int(limit)
+        if marker is not None:
+            marker = int(marker)
+
         if stack_identity is not None:
             st = self._get_stack(context, stack_identity)
 
-            events = db_api.event_get_all_by_stack(context, st.id)
+            events = db_api.event_get_all_by_stack(context, st.id,
+                                                   limit, marker,
+                                                   resource_name)
         else:
-            events = db_api.event_get_all_by_tenant(context)
+            events = db_api.event_get_all_by_tenant(context,
+                                                    limit, marker,
+                                                    resource_name)
 
-        return [api.format_event(Event.load(context, e.id)) for e in events]
+        return [api.format_db_event(e) for e in events]
 
     @request_context
     def describe_stack_resource(self, context, stack_identity, resource_name):
@@ -376,7 +386,8 @@ class EngineService(service.Service):
         if resource.id is None:
             raise exception.ResourceNotAvailable(resource_name=resource_name)
 
-        return api.format_stack_resource(stack[resource_name])
+        with rowcache.scope():
+            return api.format_stack_resource(stack[resource_name])
 
     @request_context
     def find_physical_resource(self, context, physical_resource_id):
@@ -408,9 +419,10 @@ class EngineService(service.Service):
         else:
             name_match = lambda r: True
 
-        return [api.format_stack_resource(resource)
-                for resource in stack
-                if resource.id is not None and name_match(resource)]
+        with rowcache.scope():
+            return [api.format_stack_resource(resource)
+                    for resource in stack
+                    if resource.id is not None and name_match(resource)]
 
     @request_context
     def list_stack_resources(self, context, stack_identity):
@@ -418,8 +430,9 @@ class EngineService(service.Service):
 
         stack = parser.Stack.load(context, stack=s)
 
-        return [api.format_stack_resource(resource, detail=False)
-                for resource in stack if resource.id is not None]
+        with rowcache.scope():
+            return [api.format_stack_resource(resource, detail=False)
+                    for resource in stack if resource.id is not None]
 
     @request_context
     def metadata_update(self, context, stack_identity,
@@ -439,49 +452,88 @@ class EngineService(service.Service):
 
         return resource.metadata
 
-    def _periodic_watcher_task(self, sid):
-        """
-        Periodic task, created for each stack, triggers watch-rule
-        evaluation for all rules defined for the stack
-        sid = stack ID
-        """
-        # Retrieve the stored credentials & create context
-        # Require admin=True to the stack_get to defeat tenant
-        # scoping otherwise we fail to retrieve the stack
-        logger.debug("Periodic watcher task for stack %s" % sid)
-        admin_context = context.get_admin_context()
-        stack = db_api.stack_get(admin_context, sid, admin=True)
-        if not stack:
-            logger.error("Unable to retrieve stack %s for periodic task" %
-                         sid)
-            return
-        user_creds = db_api.user_creds_get(stack.user_creds_id)
-        stack_context = context.RequestContext.from_dict(user_creds)
-
-        # Get all watchrules for this stack and evaluate them
+    def _periodic_watcher_task(self):
+        """
+        Periodic task, run on the service threadgroup, which triggers
+        evaluation of all the watch rules that are due
+        """
         try:
-            wrs = db_api.watch_rule_get_all_by_stack(stack_context, sid)
+            self.watcher.run(context.get_admin_context())
         except Exception as ex:
-            logger.warn('periodic_task db error (%s) %s' %
-                        ('watch rule removed?', str(ex)))
-            return
-        for wr in wrs:
-            rule = watchrule.WatchRule.load(stack_context, watch=wr)
-            actions = rule.evaluate()
-            for action in actions:
-                self._start_in_thread(sid, action)
+            logger.exception('Periodic watcher task failed: %s' % str(ex))
 
     @request_context
     def create_watch_data(self, context, watch_name, stats_data):
         '''
         This could be used by CloudWatch and WaitConditions
         and treat HA service events like any other CloudWatch.
+        The watch rule is evaluated as soon as the data has been stored.
         '''
         rule = watchrule.WatchRule.load(context, watch_name)
-        rule.create_watch_data(stats_data)
+        wd = rule.create_watch_data(stats_data)
         logger.debug('new watch:%s data:%s' % (watch_name, str(stats_data)))
+
+        try:
+            self.watcher.notify(rule, [wd])
+        except Exception as ex:
+            logger.exception('Evaluating watch %s failed: %s' %
+                             (watch_name, str(ex)))
         return stats_data
 
+    @request_context
+    def create_watch_data_batch(self, context, watch_data):
+        '''
+        Store many samples, possibly for different watches, in a single
+        transaction. A sample whose watch does not exist, or which does not
+        contain the watch's metric, is skipped; the error is raised only if
+        no sample at all could be stored. Returns the samples stored.
+        arg1 -> RPC context.
+        arg2 -> List of dicts containing a watch_name and its stats_data
+        '''
+        rules = {}
+        values = []
+        metrics = []
+        stored = []
+        errors = []
+        for datum in watch_data:
+            watch_name = datum['watch_name']
+            try:
+                if watch_name not in rules:
+                    rules[watch_name] = watchrule.WatchRule.load(context,
+                                                                 watch_name)
+                rule = rules[watch_name]
+                values.append(rule.watch_data_values(datum['stats_data']))
+            except (exception.WatchRuleNotFound, ValueError) as ex:
+                logger.warning('Skipping data for watch %s: %s' %
+                               (watch_name, str(ex)))
+                errors.append(ex)
+                continue
+
+            stored.append(datum)
+            metric = rule.watch_metric_values(datum['stats_data'])
+            if metric not in metrics:
+                metrics.append(metric)
+
+        if errors and not stored:
+            raise errors[0]
+
+        wds = db_api.watch_data_create_all(None, values)
+        for metric in metrics:
+            db_api.watch_metric_register(None, metric)
+        logger.debug('new watch data: %d samples for %d watches' %
+                     (len(wds), len(rules)))
+
+        for watch_name, rule in rules.items():
+            rule_wds = [wd for wd in wds if wd.watch_rule_id == rule.id]
+            if not rule_wds:
+                continue
+            try:
+                self.watcher.notify(rule, rule_wds)
+            except Exception as ex:
+                logger.exception('Evaluating watch %s failed: %s' %
+                                 (watch_name, str(ex)))
+        return stored
+
     @request_context
     def show_watch(self, context, watch_name):
         '''
@@ -510,16 +562,12 @@ class EngineService(service.Service):
         arg2 -> Name of the namespace you want to see, or None to see all
         arg3 -> Name of the metric you want to see, or None to see all
         '''
-
-        # DB API and schema does not yet allow us to easily query by
-        # namespace/metric, but we will want this at some point
-        # for now, the API can query all metric data and filter locally
-        if namespace is not None or metric_name is not None:
-            logger.error("Filtering by namespace/metric not yet supported")
-            return
-
         try:
-            wds = db_api.watch_data_get_all(context)
+            if namespace is None and metric_name is None:
+                wds = db_api.watch_data_get_all(context)
+            else:
+                wds = db_api.watch_data_get_all_by_metric(context, namespace,
+                                                          metric_name)
         except Exception as ex:
             logger.warn('show_metric (all) db error %s' % str(ex))
             return
@@ -527,6 +575,22 @@ class EngineService(service.Service):
         result = [api.format_watch_data(w) for w in wds]
         return result
 
+    @request_context
+    def list_watch_metrics(self, context, namespace=None, metric_name=None,
+                           limit=None, marker=None):
+        '''
+        The list_watch_metrics method returns the metrics for which watches
+        have received data, from the metric catalog.
+        arg1 -> RPC context.
+        arg2 -> Name of the namespace you want to see, or None to see all
+        arg3 -> Name of the metric you want to see, or None to see all
+        arg4 -> Maximum number of metrics to return
+        arg5 -> ID of the last metric in the previous page of results
+        '''
+        wms = db_api.watch_metric_get_all(context, namespace, metric_name,
+                                          limit, marker)
+        return [api.format_watch_metric(wm) for wm in wms]
+
     @request_context
     def set_watch_state(self, context, watch_name, state):
         '''
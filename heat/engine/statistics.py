@@ -0,0 +1,141 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import array
+import bisect
+import calendar
+import math
+import re
+
+
+STATISTICS = (
+    SAMPLE_COUNT, SUM, AVERAGE, MINIMUM, MAXIMUM,
+) = (
+    'SampleCount', 'Sum', 'Average', 'Minimum', 'Maximum',
+)
+
+PERCENTILES = ('p50', 'p90', 'p99')
+
+_PERCENTILE_RE = re.compile(r'^p(\d{1,2}(\.\d+)?|100)$')
+
+
+def _seconds(time):
+    '''Convert a naive UTC datetime to seconds since the epoch.'''
+    return calendar.timegm(time.utctimetuple()) + time.microsecond / 1e6
+
+
+def percentile(statistic):
+    '''
+    Return the percentile requested by a statistic name such as "p90", or
+    None if the statistic is not a percentile.
+    '''
+    match = _PERCENTILE_RE.match(statistic)
+    if match is None:
+        return None
+    return float(match.group(1))
+
+
+class PeriodStatistics(object):
+    '''The statistics for the samples of a metric in a single period.'''
+
+    def __init__(self, values):
+        self.values = values
+        self.sample_count = len(values)
+        self.sum = math.fsum(values)
+        if values:
+            self.minimum = min(values)
+            self.maximum = max(values)
+        else:
+            self.minimum = self.maximum = None
+        self._sorted = None
+
+    def percentile(self, p):
+        '''Return the p-th percentile of the values, using nearest rank.'''
+        if self._sorted is None:
+            self._sorted = sorted(self.values)
+        rank = int(math.ceil(p / 100.0 * self.sample_count))
+        return self._sorted[max(rank, 1) - 1]
+
+    def get(self, statistic):
+        '''
+        Return the value of the named statistic, or None if there is no data
+        from which to calculate it.
+        '''
+        if statistic == SAMPLE_COUNT:
+            return self.sample_count
+        if statistic == SUM:
+            return self.sum
+
+        if statistic not in STATISTICS and percentile(statistic) is None:
+            raise ValueError('Unknown statistic %s' % statistic)
+        if not self.sample_count:
+            return None
+
+        if statistic == AVERAGE:
+            return self.sum / self.sample_count
+        if statistic == MINIMUM:
+            return self.minimum
+        if statistic == MAXIMUM:
+            return self.maximum
+        return self.percentile(percentile(statistic))
+
+
+class Series(object):
+    '''
+    The samples of a metric, held as compact arrays of timestamps and values
+    sorted by time.
+    '''
+
+    def __init__(self, samples):
+        '''
+        Initialise from an iterable of (datetime, value) pairs. Samples with
+        no value are ignored.
+        '''
+        pairs = sorted((_seconds(t), float(v)) for t, v in samples
+                       if v is not None)
+        self.times = array.array('d', (t for t, v in pairs))
+        self.values = array.array('d', (v for t, v in pairs))
+
+    def __len__(self):
+        return len(self.values)
+
+    def add(self, time, value):
+        '''Add a sample to the series. Samples with no value are ignored.'''
+        if value is None:
+            return
+        time = _seconds(time)
+        index = bisect.bisect_right(self.times, time)
+        self.times.insert(index, time)
+        self.values.insert(index, float(value))
+
+    def expire(self, start):
+        '''Remove the samples earlier than the datetime start.'''
+        index = bisect.bisect_left(self.times, _seconds(start))
+        del self.times[:index]
+        del self.values[:index]
+
+    def periods(self, end, period, count=1):
+        '''
+        Return the statistics for count consecutive periods of the given
+        length in seconds, ending at the datetime end, oldest first. Samples
+        later than end are included in the last period.
+        '''
+        end = _seconds(end)
+        bounds = [bisect.bisect_left(self.times, end - period * (count - i))
+                  for i in range(count)]
+        bounds.append(len(self.times))
+
+        return [PeriodStatistics(self.values[bounds[i]:bounds[i + 1]])
+                for i in range(count)]
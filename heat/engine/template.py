@@ -35,6 +35,7 @@ class Template(collections.Mapping):
         self.id = template_id
         self.t = template
         self.maps = self[MAPPINGS]
+        self._compiled = None
 
     @classmethod
     def load(cls, context, template_id):
@@ -72,21 +73,49 @@ class Template(collections.Mapping):
         '''Return the number of sections'''
         return len(SECTIONS)
 
+    def compile(self, snippet):
+        '''
+        Return the evaluation tree for a snippet. The template data is
+        compiled only once, the first time any of it is needed, and the trees
+        of its snippets are kept for as long as the Template exists; any
+        other snippet is compiled afresh each time.
+        '''
+        if not isinstance(snippet, (dict, list)):
+            return _LITERAL
+
+        if self._compiled is None:
+            self._compiled = {}
+            _compile(self.t, self._compiled)
+
+        cached = self._compiled.get(id(snippet))
+        if cached is not None and cached[0] is snippet:
+            return cached[1]
+        return _compile(snippet)
+
+    def resolve_static(self, snippet, parameters):
+        '''
+        Resolve parameter references, map lookups and availability zones in
+        a snippet, and reduce any joins as far as possible, in a single pass.
+        '''
+        resolver = _StaticResolver(self, parameters)
+        return self.compile(snippet).evaluate(snippet, resolver)
+
+    def resolve_runtime(self, snippet, resources):
+        '''
+        Resolve resource references, attributes, joins and base64 encoding
+        in a snippet, in a single pass.
+        '''
+        resolver = _RuntimeResolver(resources)
+        return self.compile(snippet).evaluate(snippet, resolver)
+
     def resolve_find_in_map(self, s):
         '''
         Resolve constructs of the form { "Fn::FindInMap" : [ "mapping",
                                                              "key",
                                                              "value" ] }
         '''
-        def handle_find_in_map(args):
-            try:
-                name, key, value = args
-                return self.maps[name][key][value]
-            except (ValueError, TypeError) as ex:
-                raise KeyError(str(ex))
-
         return _resolve(lambda k, v: k == 'Fn::FindInMap',
-                        handle_find_in_map, s)
+                        lambda args: _find_in_map(self.maps, args), s)
 
     @staticmethod
     def resolve_availability_zones(s):
@@ -97,10 +126,7 @@ class Template(collections.Mapping):
             return (key == 'Fn::GetAZs' and
                     isinstance(value, basestring))
 
-        def handle_get_az(ref):
-            return ['nova']
-
-        return _resolve(match_get_az, handle_get_az, s)
+        return _resolve(match_get_az, _get_azs, s)
 
     @staticmethod
     def resolve_param_refs(s, parameters):
@@ -112,13 +138,8 @@ class Template(collections.Mapping):
                     isinstance(value, basestring) and
                     value in parameters)
 
-        def handle_param_ref(ref):
-            try:
-                return parameters[ref]
-            except (KeyError, ValueError):
-                raise exception.UserParameterMissing(key=ref)
-
-        return _resolve(match_param_ref, handle_param_ref, s)
+        return _resolve(match_param_ref,
+                        lambda ref: _param_ref(parameters, ref), s)
 
     @staticmethod
     def resolve_resource_refs(s, resources):
@@ -139,15 +160,8 @@ class Template(collections.Mapping):
         Resolve constructs of the form { "Fn::GetAtt" : [ "WebServer",
                                                           "PublicIp" ] }
         '''
-        def handle_getatt(args):
-            resource, att = args
-            try:
-                return resources[resource].FnGetAtt(att)
-            except KeyError:
-                raise exception.InvalidTemplateAttribute(resource=resource,
-                                                         key=att)
-
-        return _resolve(lambda k, v: k == 'Fn::GetAtt', handle_getatt, s)
+        return _resolve(lambda k, v: k == 'Fn::GetAtt',
+                        lambda args: _get_att(resources, args), s)
 
     @staticmethod
     def reduce_joins(s):
@@ -158,27 +172,7 @@ class Template(collections.Mapping):
         is reduced to
         { "Fn::Join" : [ " ", [ "str1 str2", {"f": "b"}, "str3 str4"]}
         '''
-        def handle_join(args):
-            if not isinstance(args, (list, tuple)):
-                raise TypeError('Arguments to "Fn::Join" must be a list')
-            delim, items = args
-            if not isinstance(items, (list, tuple)):
-                raise TypeError('Arguments to "Fn::Join" not fully resolved')
-            reduced = []
-            contiguous = []
-            for item in items:
-                if isinstance(item, (str, unicode)):
-                    contiguous.append(item)
-                else:
-                    if contiguous:
-                        reduced.append(delim.join(contiguous))
-                        contiguous = []
-                    reduced.append(item)
-            if contiguous:
-                reduced.append(delim.join(contiguous))
-            return {'Fn::Join': [delim, reduced]}
-
-        return _resolve(lambda k, v: k == 'Fn::Join', handle_join, s)
+        return _resolve(lambda k, v: k == 'Fn::Join', _reduce_join, s)
 
     @staticmethod
     def resolve_joins(s):
@@ -186,27 +180,245 @@ class Template(collections.Mapping):
         Resolve constructs of the form { "Fn::Join" : [ "delim", [ "str1",
                                                                    "str2" ] }
         '''
-        def handle_join(args):
-            if not isinstance(args, (list, tuple)):
-                raise TypeError('Arguments to "Fn::Join" must be a list')
-            delim, strings = args
-            if not isinstance(strings, (list, tuple)):
-                raise TypeError('Arguments to "Fn::Join" not fully resolved')
-            return delim.join(strings)
-
-        return _resolve(lambda k, v: k == 'Fn::Join', handle_join, s)
+        return _resolve(lambda k, v: k == 'Fn::Join', _join, s)
 
     @staticmethod
     def resolve_base64(s):
         '''
         Resolve constructs of the form { "Fn::Base64" : "string" }
         '''
-        def handle_base64(string):
-            if not isinstance(string, basestring):
-                raise TypeError('Arguments to "Fn::Base64" not fully resolved')
-            return string
+        return _resolve(lambda k, v: k == 'Fn::Base64', _base64, s)
+
+
+def _find_in_map(maps, args):
+    try:
+        name, key, value = args
+        return maps[name][key][value]
+    except (ValueError, TypeError) as ex:
+        raise KeyError(str(ex))
+
+
+def _get_azs(ref):
+    return ['nova']
+
+
+def _param_ref(parameters, ref):
+    try:
+        return parameters[ref]
+    except (KeyError, ValueError):
+        raise exception.UserParameterMissing(key=ref)
+
+
+def _get_att(resources, args):
+    resource, att = args
+    try:
+        return resources[resource].FnGetAtt(att)
+    except KeyError:
+        raise exception.InvalidTemplateAttribute(resource=resource,
+                                                 key=att)
+
+
+def _reduce_join(args):
+    if not isinstance(args, (list, tuple)):
+        raise TypeError('Arguments to "Fn::Join" must be a list')
+    delim, items = args
+    if not isinstance(items, (list, tuple)):
+        raise TypeError('Arguments to "Fn::Join" not fully resolved')
+    reduced = []
+    contiguous = []
+    for item in items:
+        if isinstance(item, (str, unicode)):
+            contiguous.append(item)
+        else:
+            if contiguous:
+                reduced.append(delim.join(contiguous))
+                contiguous = []
+            reduced.append(item)
+    if contiguous:
+        reduced.append(delim.join(contiguous))
+    return {'Fn::Join': [delim, reduced]}
+
+
+def _join(args):
+    if not isinstance(args, (list, tuple)):
+        raise TypeError('Arguments to "Fn::Join" must be a list')
+    delim, strings = args
+    if not isinstance(strings, (list, tuple)):
+        raise TypeError('Arguments to "Fn::Join" not fully resolved')
+    return delim.join(strings)
 
-        return _resolve(lambda k, v: k == 'Fn::Base64', handle_base64, s)
+
+def _base64(string):
+    if not isinstance(string, basestring):
+        raise TypeError('Arguments to "Fn::Base64" not fully resolved')
+    return string
+
+
+FUNCTIONS = (REF, GET_ATT, JOIN, FIND_IN_MAP, GET_AZS, BASE64) = \
+            ('Ref', 'Fn::GetAtt', 'Fn::Join', 'Fn::FindInMap', 'Fn::GetAZs',
+             'Fn::Base64')
+
+# Returned by a resolver for a function it does not handle
+_UNRESOLVED = object()
+
+
+class _StaticResolver(object):
+    '''Resolves the functions that depend only on the template data.'''
+
+    def __init__(self, template, parameters):
+        self.template = template
+        self.parameters = parameters
+
+    def __call__(self, name, raw, args):
+        if name == REF:
+            if isinstance(raw, basestring) and raw in self.parameters:
+                return _param_ref(self.parameters, args)
+        elif name == GET_AZS:
+            if isinstance(raw, basestring):
+                return _get_azs(args)
+        elif name == FIND_IN_MAP:
+            # The mapped value is itself template data, so resolve it too
+            value = _find_in_map(self.template.maps, args)
+            return self.template.compile(value).evaluate(value, self)
+        elif name == JOIN:
+            return _reduce_join(args)
+        return _UNRESOLVED
+
+
+class _RuntimeResolver(object):
+    '''Resolves the functions that depend on the stack's resources.'''
+
+    def __init__(self, resources):
+        self.resources = resources
+
+    def __call__(self, name, raw, args):
+        if name == REF:
+            if isinstance(raw, basestring) and raw in self.resources:
+                return self.resources[args].FnGetRefId()
+        elif name == GET_ATT:
+            return _get_att(self.resources, args)
+        elif name == JOIN:
+            return _join(args)
+        elif name == BASE64:
+            return _base64(args)
+        return _UNRESOLVED
+
+
+class _Literal(object):
+    '''A snippet containing no functions, which evaluates to itself.'''
+
+    def evaluate(self, snippet, resolver):
+        return snippet
+
+
+class _Function(object):
+    '''A snippet of the form { "Function" : arguments }.'''
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def evaluate(self, snippet, resolver):
+        if not (isinstance(snippet, dict) and len(snippet) == 1 and
+                self.name in snippet):
+            return _recompile(snippet, resolver)
+
+        raw = snippet[self.name]
+        args = self.args.evaluate(raw, resolver)
+        result = resolver(self.name, raw, args)
+        if result is not _UNRESOLVED:
+            return result
+        if args is raw:
+            return snippet
+        return {self.name: args}
+
+
+class _Dict(object):
+    '''A dict snippet containing functions.'''
+
+    def __init__(self, items):
+        self.items = items
+
+    def evaluate(self, snippet, resolver):
+        if not isinstance(snippet, dict):
+            return _recompile(snippet, resolver)
+
+        changed = {}
+        for k, node in self.items:
+            if k not in snippet:
+                return _recompile(snippet, resolver)
+            value = node.evaluate(snippet[k], resolver)
+            if value is not snippet[k]:
+                changed[k] = value
+        if not changed:
+            return snippet
+        result = dict(snippet)
+        result.update(changed)
+        return result
+
+
+class _List(object):
+    '''A list snippet containing functions.'''
+
+    def __init__(self, items):
+        self.items = items
+
+    def evaluate(self, snippet, resolver):
+        if not isinstance(snippet, list) or len(snippet) <= self.items[-1][0]:
+            return _recompile(snippet, resolver)
+
+        result = snippet
+        for i, node in self.items:
+            value = node.evaluate(snippet[i], resolver)
+            if value is not snippet[i]:
+                if result is snippet:
+                    result = list(snippet)
+                result[i] = value
+        return result
+
+
+_LITERAL = _Literal()
+
+
+def _recompile(snippet, resolver):
+    '''
+    Evaluate a snippet whose structure no longer matches its compiled tree
+    (because the template data was modified after it was compiled).
+    '''
+    return _compile(snippet).evaluate(snippet, resolver)
+
+
+def _compile(snippet, trees=None):
+    '''
+    Compile a snippet of a template into an evaluation tree. The tree records
+    only where the functions are; the data itself is read from the snippet
+    when the tree is evaluated. Subtrees that contain no functions are
+    neither traversed nor copied during evaluation.
+
+    If a dict is supplied, the tree of every dict and list in the snippet is
+    added to it along with the object itself, indexed by the object's id.
+    '''
+    if isinstance(snippet, dict):
+        tree = None
+        if len(snippet) == 1:
+            name, args = snippet.items()[0]
+            if name in FUNCTIONS:
+                tree = _Function(name, _compile(args, trees))
+        if tree is None:
+            items = [(k, _compile(v, trees)) for k, v in snippet.items()]
+            items = [(k, v) for k, v in items if v is not _LITERAL]
+            tree = items and _Dict(items) or _LITERAL
+    elif isinstance(snippet, list):
+        items = [(i, _compile(v, trees)) for i, v in enumerate(snippet)]
+        items = [(i, v) for i, v in items if v is not _LITERAL]
+        tree = items and _List(items) or _LITERAL
+    else:
+        return _LITERAL
+
+    if trees is not None:
+        # Keep a reference to the snippet so that its id cannot be reused
+        trees[id(snippet)] = (snippet, tree)
+    return tree
 
 
 def _resolve(match, handle, snippet):
@@ -14,11 +14,13 @@
 #    under the License.
 
 from heat.common import exception
+from heat.engine import rowcache
 
 
 class Timestamp(object):
     '''
-    A descriptor for fetching an up-to-date timestamp from the database.
+    A descriptor for fetching an up-to-date timestamp from the database, or
+    from the current rowcache scope if there is one.
     '''
 
     def __init__(self, db_fetch, attribute):
@@ -37,13 +39,14 @@ class Timestamp(object):
         if obj is None or obj.id is None:
             return None
 
-        o = self.db_fetch(obj.context, obj.id)
-        o.refresh(attrs=[self.attribute])
+        o = rowcache.load(self.db_fetch, obj.context, obj.id,
+                          [self.attribute])
         return getattr(o, self.attribute)
 
     def __set__(self, obj, timestamp):
         '''Update the timestamp for the given object.'''
         if obj.id is None:
             raise exception.ResourceNotAvailable(resource_name=obj.name)
+        rowcache.invalidate(self.db_fetch, obj.id)
         o = self.db_fetch(obj.context, obj.id)
         o.update_and_save({self.attribute: timestamp})
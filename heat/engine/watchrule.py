@@ -15,12 +15,17 @@
 
 
 import datetime
+import heapq
+import itertools
+
+from heat.common import context
 from heat.common import exception
 from heat.openstack.common import log as logging
 from heat.openstack.common import timeutils
 from heat.engine import timestamp
 from heat.db import api as db_api
 from heat.engine import parser
+from heat.engine import statistics
 from heat.rpc import api as rpc_api
 
 logger = logging.getLogger(__name__)
@@ -44,7 +49,7 @@ class WatchRule(object):
     updated_at = timestamp.Timestamp(db_api.watch_rule_get, 'updated_at')
 
     def __init__(self, context, watch_name, rule, stack_id=None,
-                 state=NORMAL, wid=None, watch_data=[],
+                 state=NORMAL, wid=None, watch_data=None,
                  last_evaluated=timeutils.utcnow()):
         self.context = context
         self.now = timeutils.utcnow()
@@ -55,6 +60,7 @@ class WatchRule(object):
         self.timeperiod = datetime.timedelta(seconds=int(rule['Period']))
         self.id = wid
         self.watch_data = watch_data
+        self.series = None
         self.last_evaluated = last_evaluated
 
     @classmethod
@@ -77,7 +83,6 @@ class WatchRule(object):
                        stack_id=watch.stack_id,
                        state=watch.state,
                        wid=watch.id,
-                       watch_data=watch.watch_data,
                        last_evaluated=watch.last_evaluated)
 
     def store(self):
@@ -112,100 +117,62 @@ class WatchRule(object):
         else:
             return False
 
-    def do_Maximum(self):
-        data = 0
-        have_data = False
-        for d in self.watch_data:
-            if d.created_at < self.now - self.timeperiod:
-                continue
-            if not have_data:
-                data = float(d.data[self.rule['MetricName']]['Value'])
-                have_data = True
-            if float(d.data[self.rule['MetricName']]['Value']) > data:
-                data = float(d.data[self.rule['MetricName']]['Value'])
-
-        if not have_data:
-            return self.NODATA
-
-        if self.do_data_cmp(data,
-                            float(self.rule['Threshold'])):
-            return self.ALARM
-        else:
-            return self.NORMAL
-
-    def do_Minimum(self):
-        data = 0
-        have_data = False
-        for d in self.watch_data:
-            if d.created_at < self.now - self.timeperiod:
-                continue
-            if not have_data:
-                data = float(d.data[self.rule['MetricName']]['Value'])
-                have_data = True
-            elif float(d.data[self.rule['MetricName']]['Value']) < data:
-                data = float(d.data[self.rule['MetricName']]['Value'])
-
-        if not have_data:
-            return self.NODATA
-
-        if self.do_data_cmp(data,
-                            float(self.rule['Threshold'])):
-            return self.ALARM
+    def get_series(self):
+        '''
+        Return a statistics.Series of the samples of the rule's metric in the
+        rule's evaluation window. The samples are taken from the series
+        attribute if it has been set, otherwise from the watch_data supplied
+        or, failing that, from the database.
+        '''
+        periods = int(self.rule.get('EvaluationPeriods', 1))
+        start = self.now - self.timeperiod * periods
+        if self.series is not None:
+            self.series.expire(start)
+            return self.series
+
+        metric_name = self.rule['MetricName']
+        if self.watch_data is None:
+            samples = db_api.watch_data_get_series(self.context, self.id,
+                                                   metric_name, start)
         else:
-            return self.NORMAL
+            samples = ((d.created_at, d.data[metric_name]['Value'])
+                       for d in self.watch_data if d.created_at >= start)
+        return statistics.Series(samples)
 
-    def do_SampleCount(self):
+    def get_period_statistics(self):
         '''
-        count all samples within the specified period
+        Return a list of the statistics.PeriodStatistics for each of the
+        rule's evaluation periods, oldest first.
         '''
-        data = 0
-        for d in self.watch_data:
-            if d.created_at < self.now - self.timeperiod:
-                continue
-            data = data + 1
+        periods = int(self.rule.get('EvaluationPeriods', 1))
+        return self.get_series().periods(self.now, int(self.rule['Period']),
+                                         periods)
 
-        if self.do_data_cmp(data,
-                            float(self.rule['Threshold'])):
-            return self.ALARM
-        else:
-            return self.NORMAL
+    def get_statistics(self):
+        '''
+        Return a tuple of the number of samples of the rule's metric in the
+        current period and their sum, minimum and maximum values.
+        '''
+        current = self.get_period_statistics()[-1]
+        return current.sample_count, current.sum, current.minimum, \
+            current.maximum
 
-    def do_Average(self):
-        data = 0
-        samples = 0
-        for d in self.watch_data:
-            if d.created_at < self.now - self.timeperiod:
-                continue
-            samples = samples + 1
-            data = data + float(d.data[self.rule['MetricName']]['Value'])
+    def get_alarm_state(self):
+        '''
+        Return the state of the alarm: ALARM if the rule's statistic breaches
+        the threshold in each of the last EvaluationPeriods periods, NODATA
+        if there is no data in the current period and NORMAL otherwise.
+        '''
+        statistic = self.rule['Statistic']
+        threshold = float(self.rule['Threshold'])
+        values = [p.get(statistic) for p in self.get_period_statistics()]
 
-        if samples == 0:
+        if values[-1] is None:
             return self.NODATA
-
-        data = data / samples
-        if self.do_data_cmp(data,
-                            float(self.rule['Threshold'])):
-            return self.ALARM
-        else:
-            return self.NORMAL
-
-    def do_Sum(self):
-        data = 0
-        for d in self.watch_data:
-            if d.created_at < self.now - self.timeperiod:
-                logger.debug('ignoring %s' % str(d.data))
-                continue
-            data = data + float(d.data[self.rule['MetricName']]['Value'])
-
-        if self.do_data_cmp(data,
-                            float(self.rule['Threshold'])):
+        if all(v is not None and self.do_data_cmp(v, threshold)
+               for v in values):
             return self.ALARM
-        else:
-            return self.NORMAL
-
-    def get_alarm_state(self):
-        fn = getattr(self, 'do_%s' % self.rule['Statistic'])
-        return fn()
+        return self.NORMAL
 
     def evaluate(self):
         # has enough time progressed to run the rule
@@ -245,19 +212,48 @@ class WatchRule(object):
                                new_state)
         return actions
 
-    def create_watch_data(self, data):
+    def watch_data_values(self, data):
+        '''
+        Return the database values for a new sample of the rule's metric,
+        validating that the data contains the metric.
+        '''
         if not self.rule['MetricName'] in data:
             logger.warn('new data has incorrect metric:%s' %
                         (self.rule['MetricName']))
             raise ValueError('MetricName %s missing' %
                              self.rule['MetricName'])
 
-        watch_data = {
+        try:
+            value = float(data[self.rule['MetricName']]['Value'])
+        except (KeyError, TypeError, ValueError):
+            value = None
+
+        return {
             'data': data,
+            'metric_name': self.rule['MetricName'],
+            'value': value,
+            'watch_rule_id': self.id
+        }
+
+    def watch_metric_values(self, data):
+        '''
+        Return the metric catalog values for a sample of the rule's metric.
+        '''
+        dimensions = data[self.rule['MetricName']].get('Dimensions') or []
+        return {
+            'namespace': data.get('Namespace'),
+            'metric_name': self.rule['MetricName'],
+            'dimensions': [{k: v} for k, v in
+                           sorted((k, v) for d in dimensions
+                                  for k, v in d.items())],
             'watch_rule_id': self.id
         }
-        wd = db_api.watch_data_create(None, watch_data)
+
+    def create_watch_data(self, data):
+        wd = db_api.watch_data_create(None, self.watch_data_values(data))
+        db_api.watch_metric_register(None, self.watch_metric_values(data))
         logger.debug('new watch:%s data:%s' % (self.name, str(wd.data)))
+        return wd
 
     def set_watch_state(self, state):
         '''
@@ -278,3 +274,166 @@ class WatchRule(object):
                 logger.warning("Unable to override state %s for watch %s" %
                               (self.state, self.name))
         return actions
+
+
+class WatchRuleScheduler(object):
+    '''
+    Evaluates all of the watch rules in the database from a single periodic
+    task. Rules are kept in a priority queue ordered by the time at which
+    they are next due for evaluation, so that only rules which are due are
+    loaded from the database.
+
+    Rules are also evaluated as soon as new data arrives for them, using
+    the samples in their evaluation window cached in memory and reloaded
+    from the database at least once a Period. Each such
+    evaluation postpones the periodic one by a Period, so the periodic task
+    only evaluates rules which have stopped receiving data.
+    '''
+
+    def __init__(self, run_action, batch_size=100):
+        '''
+        Initialise with a function that will be called with a stack ID and
+        an action returned by a rule evaluation, in order to run the action.
+        '''
+        self.run_action = run_action
+        self.batch_size = batch_size
+        self._queue = []
+        self._due = {}
+        self._last_id = 0
+        self._reload = False
+        self._series = {}
+
+    def __contains__(self, watch_id):
+        return watch_id in self._due
+
+    def schedule(self, watch_id, due):
+        '''Schedule the watch rule with the given ID for evaluation.'''
+        self._due[watch_id] = due
+        heapq.heappush(self._queue, (due, watch_id))
+
+    def _schedule_rule(self, watch):
+        period = datetime.timedelta(seconds=int(watch.rule['Period']))
+        last_evaluated = watch.last_evaluated or timeutils.utcnow()
+        self.schedule(watch.id, last_evaluated + period)
+        self._last_id = max(self._last_id, watch.id)
+
+    def refresh(self, ctxt):
+        '''
+        Add any watch rules created since the last refresh, or reload all of
+        them if any rule has been deleted since then.
+        '''
+        if self._reload:
+            self._queue = []
+            self._due = {}
+            self._last_id = 0
+            self._reload = False
+
+        for watch in db_api.watch_rule_get_all_newer(ctxt, self._last_id):
+            self._schedule_rule(watch)
+
+    def _stack_context(self, ctxt, stack_id):
+        '''
+        Return a context with the stored credentials of the owner of a stack,
+        or None if the stack does not exist.
+        '''
+        stack = db_api.stack_get(ctxt, stack_id, admin=True)
+        if stack is None:
+            logger.error('Unable to retrieve stack %s for watch rules' %
+                         stack_id)
+            return None
+
+        user_creds = db_api.user_creds_get(stack.user_creds_id)
+        return context.RequestContext.from_dict(user_creds)
+
+    def notify(self, rule, watch_data):
+        '''
+        Evaluate a watch rule immediately after new samples of its metric,
+        the list watch_data, have been stored. The rule is evaluated with the
+        credentials of the owner of its stack, not those of the sender of
+        the samples.
+        '''
+        admin_context = context.get_admin_context()
+        stack_context = self._stack_context(admin_context, rule.stack_id)
+        watch = db_api.watch_rule_get(admin_context, rule.id)
+        if stack_context is None or watch is None:
+            self._series.pop(rule.id, None)
+            return
+
+        rule = WatchRule.load(stack_context, watch=watch)
+        rule.now = timeutils.utcnow()
+        cached = self._series.get(rule.id)
+        if cached is None or rule.now >= cached[0] + rule.timeperiod:
+            # Reload the samples at least once a Period, to include any
+            # stored by another engine. The new samples are already stored.
+            series = rule.get_series()
+            self._series[rule.id] = (rule.now, series)
+        else:
+            series = cached[1]
+            for wd in watch_data:
+                series.add(wd.created_at, wd.value)
+
+        rule.series = series
+        actions = rule.run_rule()
+
+        for action in actions:
+            self.run_action(rule.stack_id, action)
+        self.schedule(rule.id, rule.last_evaluated + rule.timeperiod)
+
+    def _pop_due(self, now):
+        due = []
+        while (self._queue and self._queue[0][0] <= now and
+               len(due) < self.batch_size):
+            when, watch_id = heapq.heappop(self._queue)
+            # Skip entries superseded by a later call to schedule()
+            if self._due.get(watch_id) == when:
+                del self._due[watch_id]
+                due.append(watch_id)
+        return due
+
+    def run(self, ctxt):
+        '''Evaluate all of the watch rules that are due.'''
+        self.refresh(ctxt)
+
+        now = timeutils.utcnow()
+        due = self._pop_due(now)
+        while due:
+            self._evaluate(ctxt, due, now)
+            due = self._pop_due(now)
+
+    def _evaluate(self, ctxt, watch_ids, now):
+        watches = db_api.watch_rule_get_all_by_id(ctxt, watch_ids)
+
+        for watch_id in watch_ids:
+            # Reload the cached samples when data next arrives, in case
+            # any were stored by another engine
+            self._series.pop(watch_id, None)
+        if len(watches) < len(watch_ids):
+            # Rules that have been deleted are dropped from the queue, but
+            # their IDs may be re-used by new rules, so reload all of them
+            self._reload = True
+
+        by_stack = lambda w: w.stack_id
+        for stack_id, stack_watches in itertools.groupby(
+                sorted(watches, key=by_stack), by_stack):
+            stack_watches = list(stack_watches)
+            stack_context = self._stack_context(ctxt, stack_id)
+            if stack_context is None:
+                for wr in stack_watches:
+                    period = datetime.timedelta(seconds=int(wr.rule['Period']))
+                    self.schedule(wr.id, now + period)
+                continue
+
+            for wr in stack_watches:
+                period = datetime.timedelta(seconds=int(wr.rule['Period']))
+                try:
+                    rule = WatchRule.load(stack_context, watch=wr)
+                    actions = rule.evaluate()
+                except Exception as ex:
+                    logger.exception('Evaluating watch %s failed: %s' %
+                                     (wr.name, str(ex)))
+                    self.schedule(wr.id, now + period)
+                    continue
+
+                for action in actions:
+                    self.run_action(stack_id, action)
+                self.schedule(wr.id, rule.last_evaluated + rule.timeperiod)
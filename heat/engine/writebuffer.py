@@ -0,0 +1,148 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+
+import eventlet
+
+from heat.db import api as db_api
+
+from heat.openstack.common import log as logging
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBuffer(object):
+    '''
+    Buffer the state transitions of the resources in a stack, the events
+    recording them and the updated time of the stack, so that all of those
+    made before the running green thread next yields are written to the
+    database together in a single transaction.
+    '''
+
+    def __init__(self, context, stack_id):
+        self.context = context
+        self.stack_id = stack_id
+        self._resources = {}
+        self._events = []
+        self._updated_at = None
+        self._flusher = None
+
+    def resource_updated(self, resource, updated_at):
+        '''
+        Record that the state of a stored resource, and hence the stack, has
+        changed. The state is read from the resource when written.
+        '''
+        self._resources[resource.id] = resource
+        self._updated_at = updated_at
+        self._schedule()
+
+    def resource_deleted(self, resource_id):
+        '''Discard any pending update to a resource removed from the DB.'''
+        self._resources.pop(resource_id, None)
+
+    def add_event(self, event):
+        '''Add an event to be stored in the database.'''
+        self._events.append(event)
+        self._schedule()
+
+    def _schedule(self):
+        if self._flusher is None:
+            self._flusher = eventlet.spawn(self._flush_all)
+
+    def _flush_all(self):
+        try:
+            while self._resources or self._events or self._updated_at:
+                if not self.flush():
+                    break
+        finally:
+            self._flusher = None
+
+    def _take(self):
+        resources, self._resources = self._resources, {}
+        events, self._events = self._events, []
+        updated_at, self._updated_at = self._updated_at, None
+        return resources, events, updated_at
+
+    def _save(self, resources, events, updated_at):
+        values = dict((rid, {'state': r.state,
+                             'state_description': r.state_description,
+                             'nova_instance': r.resource_id})
+                      for rid, r in resources.items())
+        try:
+            db_api.stack_changes_save(self.context, self.stack_id, values,
+                                      [e.db_values() for e in events],
+                                      updated_at)
+        except Exception as ex:
+            logger.error('DB error %s' % str(ex))
+            return False
+        return True
+
+    def flush(self):
+        '''
+        Write all of the buffered changes to the database. If they cannot be
+        written, they are kept in the buffer to be written again later.
+        Returns True if the changes were written.
+        '''
+        resources, events, updated_at = self._take()
+        if not (resources or events or updated_at):
+            return True
+
+        if self._save(resources, events, updated_at):
+            return True
+
+        # Keep the changes, ahead of any made since they were taken
+        for rid, r in resources.items():
+            self._resources.setdefault(rid, r)
+        self._events[:0] = events
+        self._updated_at = self._updated_at or updated_at
+        return False
+
+    def close(self):
+        '''
+        Write any changes still buffered, waiting for a pending flush. If
+        they cannot be written together, each is written on its own so that
+        one bad change does not prevent the others from being stored.
+        '''
+        if self._flusher is not None:
+            self._flusher.wait()
+        if self.flush():
+            return
+
+        resources, events, updated_at = self._take()
+        for rid, r in resources.items():
+            self._save({rid: r}, [], None)
+        for e in events:
+            self._save({}, [e], None)
+        if updated_at is not None:
+            self._save({}, [], updated_at)
+
+
+@contextlib.contextmanager
+def buffered(stack):
+    '''
+    Buffer the writes of resource state changes and events for the stack for
+    the duration of the block, writing them all out when it exits.
+    '''
+    if stack.id is None or stack.write_buffer is not None:
+        yield
+        return
+
+    stack.write_buffer = WriteBuffer(stack.context, stack.id)
+    try:
+        yield
+    finally:
+        write_buffer, stack.write_buffer = stack.write_buffer, None
+        write_buffer.close()
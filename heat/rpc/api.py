@@ -123,3 +123,11 @@ WATCH_DATA_KEYS = (
     'watch_name', 'metric_name', 'timestamp',
     'namespace', 'data'
 )
+
+WATCH_METRIC_KEYS = (
+    WATCH_METRIC_ID, WATCH_METRIC_ALARM, WATCH_METRIC_NAME,
+    WATCH_METRIC_NAMESPACE, WATCH_METRIC_DIMENSIONS
+) = (
+    'id', 'watch_name', 'metric_name',
+    'namespace', 'dimensions'
+)
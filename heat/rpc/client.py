@@ -68,13 +68,20 @@ class EngineClient(heat.openstack.common.rpc.proxy.RpcProxy):
                                              stack_name=stack_name),
                          topic=_engine_topic(self.topic, ctxt, None))
 
-    def list_stacks(self, ctxt):
+    def list_stacks(self, ctxt, limit=None, marker=None):
         """
-        The list_stacks method returns the attributes of all stacks.
+        The list_stacks method returns the summary attributes of all stacks.
 
         :param ctxt: RPC context.
+        :param limit: Maximum number of stacks to return.
+        :param marker: ID of the last stack in the previous page of results.
         """
-        return self.call(ctxt, self.make_msg('list_stacks'),
+        page = {}
+        if limit is not None:
+            page['limit'] = limit
+        if marker is not None:
+            page['marker'] = marker
+        return self.call(ctxt, self.make_msg('list_stacks', **page),
                          topic=_engine_topic(self.topic, ctxt, None))
 
     def show_stack(self, ctxt, stack_identity):
@@ -184,16 +191,27 @@ class EngineClient(heat.openstack.common.rpc.proxy.RpcProxy):
         return self.call(ctxt, self.make_msg('list_resource_types'),
                          topic=_engine_topic(self.topic, ctxt, None))
 
-    def list_events(self, ctxt, stack_identity):
+    def list_events(self, ctxt, stack_identity, limit=None, marker=None,
+                    resource_name=None):
         """
         The list_events method lists all events associated with a given stack.
 
         :param ctxt: RPC context.
         :param stack_identity: Name of the stack you want to get events for.
-        :param params: Params passed from API.
+        :param limit: Maximum number of events to return.
+        :param marker: Return only events with an ID greater than this one.
+        :param resource_name: Return only events for the named resource.
         """
+        filters = {}
+        if limit is not None:
+            filters['limit'] = limit
+        if marker is not None:
+            filters['marker'] = marker
+        if resource_name is not None:
+            filters['resource_name'] = resource_name
         return self.call(ctxt, self.make_msg('list_events',
-                                             stack_identity=stack_identity),
+                                             stack_identity=stack_identity,
+                                             **filters),
                          topic=_engine_topic(self.topic, ctxt, None))
 
     def describe_stack_resource(self, ctxt, stack_identity, resource_name):
@@ -244,6 +262,18 @@ class EngineClient(heat.openstack.common.rpc.proxy.RpcProxy):
                          watch_name=watch_name, stats_data=stats_data),
                          topic=_engine_topic(self.topic, ctxt, None))
 
+    def create_watch_data_batch(self, ctxt, watch_data):
+        '''
+        Store many samples, possibly for different watches, at once.
+
+        :param ctxt: RPC context.
+        :param watch_data: List of dicts, each containing the watch_name
+                           and stats_data arguments of create_watch_data
+        '''
+        return self.call(ctxt, self.make_msg('create_watch_data_batch',
+                         watch_data=watch_data),
+                         topic=_engine_topic(self.topic, ctxt, None))
+
     def show_watch(self, ctxt, watch_name):
         """
         The show_watch method returns the attributes of one watch
@@ -272,6 +302,30 @@ class EngineClient(heat.openstack.common.rpc.proxy.RpcProxy):
                          namespace=namespace, metric_name=metric_name),
                          topic=_engine_topic(self.topic, ctxt, None))
 
+    def list_watch_metrics(self, ctxt, namespace=None, metric_name=None,
+                           limit=None, marker=None):
+        """
+        The list_watch_metrics method returns the metrics for which watches
+        have received data, optionally filtered by namespace and name.
+
+        :param ctxt: RPC context.
+        :param namespace: Name of the namespace you want to see,
+                           or None to see all
+        :param metric_name: Name of the metric you want to see,
+                           or None to see all
+        :param limit: Maximum number of metrics to return.
+        :param marker: ID of the last metric in the previous page of results.
+        """
+        page = {}
+        if limit is not None:
+            page['limit'] = limit
+        if marker is not None:
+            page['marker'] = marker
+        return self.call(ctxt, self.make_msg('list_watch_metrics',
+                         namespace=namespace, metric_name=metric_name,
+                         **page),
+                         topic=_engine_topic(self.topic, ctxt, None))
+
     def set_watch_state(self, ctxt, watch_name, state):
         '''
         Temporarily set the state of a given watch
@@ -18,6 +18,9 @@ import unittest
 from nose.plugins.attrib import attr
 
 from heat.common import context
+from heat.db import api as db_api
+from heat.engine import parser
+from heat.engine import service
 from heat.openstack.common import cfg
 from heat.openstack.common import rpc
 from heat.common.wsgi import Request
@@ -174,123 +177,74 @@ class WatchControllerTest(unittest.TestCase):
         result = self.controller.get_metric_statistics(dummy_req)
         self.assert_(type(result) == exception.HeatAPINotImplementedError)
 
+    def _stub_list_watch_metrics(self, req, engine_resp, namespace=None,
+                                 metric_name=None, marker=None):
+        args = {'namespace': namespace, 'metric_name': metric_name,
+                'limit': self.controller.METRICS_PAGE_SIZE}
+        if marker is not None:
+            args['marker'] = marker
+
+        self.m.StubOutWithMock(rpc, 'call')
+        rpc.call(req.context, self.topic,
+                 {'args': args,
+                  'method': 'list_watch_metrics',
+                  'version': self.api_version},
+                 None).AndReturn(engine_resp)
+
+        self.m.ReplayAll()
+
     def test_list_metrics_all(self):
         params = {'Action': 'ListMetrics'}
         dummy_req = self._dummy_GET_request(params)
 
         # Stub out the RPC call to the engine with a pre-canned response
-        # We dummy three different metrics and namespaces to test
-        # filtering by parameter
-        engine_resp = [{u'timestamp': u'2012-08-30T15:09:02Z',
+        engine_resp = [{u'id': 1,
                         u'watch_name': u'HttpFailureAlarm',
                         u'namespace': u'system/linux',
                         u'metric_name': u'ServiceFailure',
-                        u'data': {u'Units': u'Counter', u'Value': 1}},
+                        u'dimensions': []},
 
-                       {u'timestamp': u'2012-08-30T15:10:03Z',
+                       {u'id': 2,
                         u'watch_name': u'HttpFailureAlarm2',
                         u'namespace': u'system/linux2',
                         u'metric_name': u'ServiceFailure2',
-                        u'data': {u'Units': u'Counter', u'Value': 1}},
-
-                       {u'timestamp': u'2012-08-30T15:16:03Z',
-                        u'watch_name': u'HttpFailureAlar3m',
-                        u'namespace': u'system/linux3',
-                        u'metric_name': u'ServiceFailure3',
-                        u'data': {u'Units': u'Counter', u'Value': 1}}]
-
-        self.m.StubOutWithMock(rpc, 'call')
-        # Current engine implementation means we filter in the API
-        # and pass None/None for namespace/watch_name which returns
-        # all metric data which we post-process in the API
-        rpc.call(dummy_req.context, self.topic,
-                 {'args': {'namespace': None, 'metric_name': None},
-                  'method': 'show_watch_metric',
-                  'version': self.api_version},
-                 None).AndReturn(engine_resp)
+                        u'dimensions': [{u'Service': u'httpd'}]}]
 
-        self.m.ReplayAll()
+        self._stub_list_watch_metrics(dummy_req, engine_resp)
 
-        # First pass no query paramters filtering, should get all three
         response = self.controller.list_metrics(dummy_req)
         expected = {'ListMetricsResponse':
                     {'ListMetricsResult':
                      {'Metrics': [{'Namespace': u'system/linux',
                                    'Dimensions':
                                    [{'Name': 'AlarmName',
-                                     'Value': u'HttpFailureAlarm'},
-                                    {'Name': 'Timestamp',
-                                     'Value': u'2012-08-30T15:09:02Z'},
-                                    {'Name': u'Units',
-                                     'Value': u'Counter'},
-                                    {'Name': u'Value',
-                                     'Value': 1}],
+                                     'Value': u'HttpFailureAlarm'}],
                                    'MetricName': u'ServiceFailure'},
                                   {'Namespace': u'system/linux2',
                                    'Dimensions':
                                    [{'Name': 'AlarmName',
                                      'Value': u'HttpFailureAlarm2'},
-                                    {'Name': 'Timestamp',
-                                     'Value': u'2012-08-30T15:10:03Z'},
-                                    {'Name': u'Units',
-                                     'Value': u'Counter'},
-                                    {'Name': u'Value',
-                                     'Value': 1}],
-                                   'MetricName': u'ServiceFailure2'},
-                                  {'Namespace': u'system/linux3',
-                                   'Dimensions':
-                                   [{'Name': 'AlarmName',
-                                     'Value': u'HttpFailureAlar3m'},
-                                    {'Name': 'Timestamp',
-                                     'Value': u'2012-08-30T15:16:03Z'},
-                                    {'Name': u'Units',
-                                     'Value': u'Counter'},
-                                    {'Name': u'Value',
-                                     'Value': 1}],
-                                   'MetricName': u'ServiceFailure3'}]}}}
+                                    {'Name': u'Service',
+                                     'Value': u'httpd'}],
+                                   'MetricName': u'ServiceFailure2'}]}}}
         self.assert_(response == expected)
 
     def test_list_metrics_filter_name(self):
 
-        # Add a MetricName filter, so we should only get one of the three
+        # The MetricName filter is passed to the engine
         params = {'Action': 'ListMetrics',
                   'MetricName': 'ServiceFailure'}
         dummy_req = self._dummy_GET_request(params)
 
-        # Stub out the RPC call to the engine with a pre-canned response
-        # We dummy three different metrics and namespaces to test
-        # filtering by parameter
-        engine_resp = [{u'timestamp': u'2012-08-30T15:09:02Z',
+        engine_resp = [{u'id': 1,
                         u'watch_name': u'HttpFailureAlarm',
                         u'namespace': u'system/linux',
                         u'metric_name': u'ServiceFailure',
-                        u'data': {u'Units': u'Counter', u'Value': 1}},
+                        u'dimensions': []}]
 
-                       {u'timestamp': u'2012-08-30T15:10:03Z',
-                        u'watch_name': u'HttpFailureAlarm2',
-                        u'namespace': u'system/linux2',
-                        u'metric_name': u'ServiceFailure2',
-                        u'data': {u'Units': u'Counter', u'Value': 1}},
-
-                       {u'timestamp': u'2012-08-30T15:16:03Z',
-                        u'watch_name': u'HttpFailureAlar3m',
-                        u'namespace': u'system/linux3',
-                        u'metric_name': u'ServiceFailure3',
-                        u'data': {u'Units': u'Counter', u'Value': 1}}]
-
-        self.m.StubOutWithMock(rpc, 'call')
-        # Current engine implementation means we filter in the API
-        # and pass None/None for namespace/watch_name which returns
-        # all metric data which we post-process in the API
-        rpc.call(dummy_req.context, self.topic, {'args':
-                 {'namespace': None,
-                 'metric_name': None},
-                 'method': 'show_watch_metric', 'version': self.api_version},
-                 None).AndReturn(engine_resp)
-
-        self.m.ReplayAll()
+        self._stub_list_watch_metrics(dummy_req, engine_resp,
+                                      metric_name='ServiceFailure')
 
-        # First pass no query paramters filtering, should get all three
         response = self.controller.list_metrics(dummy_req)
         expected = {'ListMetricsResponse':
                     {'ListMetricsResult':
@@ -298,56 +252,31 @@ class WatchControllerTest(unittest.TestCase):
                       [{'Namespace': u'system/linux',
                         'Dimensions':
                         [{'Name': 'AlarmName',
-                          'Value': u'HttpFailureAlarm'},
-                         {'Name': 'Timestamp',
-                          'Value': u'2012-08-30T15:09:02Z'},
-                         {'Name': u'Units',
-                          'Value': u'Counter'},
-                         {'Name': u'Value',
-                          'Value': 1}],
+                          'Value': u'HttpFailureAlarm'}],
                         'MetricName': u'ServiceFailure'}]}}}
         self.assert_(response == expected)
 
     def test_list_metrics_filter_namespace(self):
 
-        # Add a Namespace filter and change the engine response so
-        # we should get two reponses
+        # The Namespace filter is passed to the engine
         params = {'Action': 'ListMetrics',
                   'Namespace': 'atestnamespace/foo'}
         dummy_req = self._dummy_GET_request(params)
 
-        # Stub out the RPC call to the engine with a pre-canned response
-        # We dummy three different metrics and namespaces to test
-        # filtering by parameter
-        engine_resp = [{u'timestamp': u'2012-08-30T15:09:02Z',
+        engine_resp = [{u'id': 1,
                         u'watch_name': u'HttpFailureAlarm',
                         u'namespace': u'atestnamespace/foo',
                         u'metric_name': u'ServiceFailure',
-                        u'data': {u'Units': u'Counter', u'Value': 1}},
+                        u'dimensions': []},
 
-                       {u'timestamp': u'2012-08-30T15:10:03Z',
+                       {u'id': 2,
                         u'watch_name': u'HttpFailureAlarm2',
                         u'namespace': u'atestnamespace/foo',
                         u'metric_name': u'ServiceFailure2',
-                        u'data': {u'Units': u'Counter', u'Value': 1}},
-
-                       {u'timestamp': u'2012-08-30T15:16:03Z',
-                        u'watch_name': u'HttpFailureAlar3m',
-                        u'namespace': u'system/linux3',
-                        u'metric_name': u'ServiceFailure3',
-                        u'data': {u'Units': u'Counter', u'Value': 1}}]
+                        u'dimensions': []}]
 
-        self.m.StubOutWithMock(rpc, 'call')
-        # Current engine implementation means we filter in the API
-        # and pass None/None for namespace/watch_name which returns
-        # all metric data which we post-process in the API
-        rpc.call(dummy_req.context, self.topic, {'args':
-                 {'namespace': None,
-                 'metric_name': None},
-                 'method': 'show_watch_metric', 'version': self.api_version},
-                 None).AndReturn(engine_resp)
-
-        self.m.ReplayAll()
+        self._stub_list_watch_metrics(dummy_req, engine_resp,
+                                      namespace='atestnamespace/foo')
 
         response = self.controller.list_metrics(dummy_req)
         expected = {'ListMetricsResponse':
@@ -356,27 +285,49 @@ class WatchControllerTest(unittest.TestCase):
                       [{'Namespace': u'atestnamespace/foo',
                         'Dimensions':
                         [{'Name': 'AlarmName',
-                          'Value': u'HttpFailureAlarm'},
-                         {'Name': 'Timestamp',
-                          'Value': u'2012-08-30T15:09:02Z'},
-                         {'Name': u'Units',
-                          'Value': u'Counter'},
-                         {'Name': u'Value',
-                          'Value': 1}],
+                          'Value': u'HttpFailureAlarm'}],
                         'MetricName': u'ServiceFailure'},
                        {'Namespace': u'atestnamespace/foo',
                         'Dimensions':
                         [{'Name': 'AlarmName',
-                          'Value': u'HttpFailureAlarm2'},
-                         {'Name': 'Timestamp',
-                          'Value': u'2012-08-30T15:10:03Z'},
-                         {'Name': u'Units',
-                          'Value': u'Counter'},
-                         {'Name': u'Value',
-                          'Value': 1}],
+                          'Value': u'HttpFailureAlarm2'}],
                         'MetricName': u'ServiceFailure2'}]}}}
         self.assert_(response == expected)
 
+    def test_list_metrics_page(self):
+        params = {'Action': 'ListMetrics',
+                  'NextToken': '10'}
+        dummy_req = self._dummy_GET_request(params)
+
+        self.controller.METRICS_PAGE_SIZE = 2
+        engine_resp = [{u'id': 11,
+                        u'watch_name': u'HttpFailureAlarm',
+                        u'namespace': u'system/linux',
+                        u'metric_name': u'ServiceFailure',
+                        u'dimensions': []},
+
+                       {u'id': 12,
+                        u'watch_name': u'HttpFailureAlarm2',
+                        u'namespace': u'system/linux',
+                        u'metric_name': u'ServiceFailure',
+                        u'dimensions': []}]
+
+        self._stub_list_watch_metrics(dummy_req, engine_resp, marker=10)
+
+        response = self.controller.list_metrics(dummy_req)
+        result = response['ListMetricsResponse']['ListMetricsResult']
+        self.assertEqual(len(result['Metrics']), 2)
+        self.assertEqual(result['NextToken'], '12')
+
+    def test_list_metrics_bad_token(self):
+        params = {'Action': 'ListMetrics',
+                  'NextToken': 'foo'}
+        dummy_req = self._dummy_GET_request(params)
+
+        result = self.controller.list_metrics(dummy_req)
+        self.assertEqual(type(result),
+                         exception.HeatInvalidParameterValueError)
+
     def test_put_metric_alarm(self):
         # Not yet implemented, should raise HeatAPINotImplementedError
         params = {'Action': 'PutMetricAlarm'}
@@ -404,14 +355,15 @@ class WatchControllerTest(unittest.TestCase):
         self.m.StubOutWithMock(rpc, 'call')
         rpc.call(dummy_req.context, self.topic,
                  {'args':
-                  {'stats_data':
-                  {'Namespace': u'system/linux',
-                  u'ServiceFailure':
-                  {'Value': u'1',
-                   'Unit': u'Count',
-                   'Dimensions': []}},
-                 'watch_name': u'HttpFailureAlarm'},
-                 'method': 'create_watch_data',
+                  {'watch_data':
+                   [{'stats_data':
+                     {'Namespace': u'system/linux',
+                      u'ServiceFailure':
+                      {'Value': u'1',
+                       'Unit': u'Count',
+                       'Dimensions': []}},
+                     'watch_name': u'HttpFailureAlarm'}]},
+                 'method': 'create_watch_data_batch',
                  'version': self.api_version},
                  None).AndReturn(engine_resp)
 
@@ -422,6 +374,141 @@ class WatchControllerTest(unittest.TestCase):
                     {'ResponseMetadata': None}}}
         self.assert_(response == expected)
 
+    def test_put_metric_data_multiple(self):
+
+        params = {u'Namespace': u'system/linux',
+                  u'MetricData.member.1.Unit': u'Count',
+                  u'MetricData.member.1.Value': u'1',
+                  u'MetricData.member.1.MetricName': u'ServiceFailure',
+                  u'MetricData.member.1.Dimensions.member.1.Name':
+                  u'AlarmName',
+                  u'MetricData.member.1.Dimensions.member.1.Value':
+                  u'HttpFailureAlarm',
+                  u'MetricData.member.2.Unit': u'Percent',
+                  u'MetricData.member.2.Value': u'75',
+                  u'MetricData.member.2.MetricName': u'MemoryUtilization',
+                  u'MetricData.member.2.Dimensions.member.1.Name':
+                  u'AlarmName',
+                  u'MetricData.member.2.Dimensions.member.1.Value':
+                  u'MemoryAlarmHigh',
+                  u'MetricData.member.3.Unit': u'Count',
+                  u'MetricData.member.3.Value': u'2',
+                  u'MetricData.member.3.MetricName': u'ServiceFailure',
+                  u'MetricData.member.3.Dimensions.member.1.Name':
+                  u'Service',
+                  u'MetricData.member.3.Dimensions.member.1.Value':
+                  u'httpd',
+                  u'MetricData.member.4.Unit': u'Percent',
+                  u'MetricData.member.4.Value': u'50',
+                  u'MetricData.member.4.MetricName': u'DiskUtilization',
+                  u'Action': u'PutMetricData'}
+
+        dummy_req = self._dummy_GET_request(params)
+
+        # Stub out the RPC call to verify the engine call parameters
+        engine_resp = {}
+
+        def stats(metric, unit, value, dimensions=[]):
+            return {'Namespace': u'system/linux',
+                    metric: {'Value': value,
+                             'Unit': unit,
+                             'Dimensions': dimensions}}
+
+        self.m.StubOutWithMock(rpc, 'call')
+        rpc.call(dummy_req.context, self.topic,
+                 {'args':
+                  {'watch_data':
+                   [{'stats_data': stats(u'ServiceFailure', u'Count', u'1'),
+                     'watch_name': u'HttpFailureAlarm'},
+                    {'stats_data': stats(u'MemoryUtilization', u'Percent',
+                                         u'75'),
+                     'watch_name': u'MemoryAlarmHigh'},
+                    {'stats_data': stats(u'ServiceFailure', u'Count', u'2',
+                                         [{u'Service': u'httpd'}]),
+                     'watch_name': u'HttpFailureAlarm'}]},
+                 'method': 'create_watch_data_batch',
+                 'version': self.api_version},
+                 None).AndReturn(engine_resp)
+
+        self.m.ReplayAll()
+
+        response = self.controller.put_metric_data(dummy_req)
+        expected = {'PutMetricDataResponse': {'PutMetricDataResult':
+                    {'ResponseMetadata': None}}}
+        self.assert_(response == expected)
+
+    def test_put_metric_data_engine(self):
+        # A batch mixing the metrics of different alarms is stored by the
+        # engine, apart from any datum that does not match its alarm
+        ctx = self._create_context()
+        stack = parser.Stack(ctx, 'put_metric_data_test',
+                             parser.Template({}))
+        stack.store()
+        rule = {u'EvaluationPeriods': u'1',
+                u'Namespace': u'system/linux',
+                u'Period': u'300',
+                u'ComparisonOperator': u'GreaterThanThreshold',
+                u'Statistic': u'SampleCount',
+                u'Threshold': u'10',
+                u'MetricName': u'ServiceFailure'}
+        http = db_api.watch_rule_create(ctx, {
+            'stack_id': stack.id, 'state': 'NORMAL',
+            'name': u'MixedHttpAlarm', 'rule': rule})
+        memory = db_api.watch_rule_create(ctx, {
+            'stack_id': stack.id, 'state': 'NORMAL',
+            'name': u'MixedMemoryAlarm',
+            'rule': dict(rule, MetricName=u'MemoryUtilization')})
+
+        params = {u'Namespace': u'system/linux',
+                  u'MetricData.member.1.Unit': u'Count',
+                  u'MetricData.member.1.Value': u'1',
+                  u'MetricData.member.1.MetricName': u'ServiceFailure',
+                  u'MetricData.member.1.Dimensions.member.1.Name':
+                  u'AlarmName',
+                  u'MetricData.member.1.Dimensions.member.1.Value':
+                  u'MixedHttpAlarm',
+                  u'MetricData.member.2.Unit': u'Percent',
+                  u'MetricData.member.2.Value': u'75',
+                  u'MetricData.member.2.MetricName': u'MemoryUtilization',
+                  u'MetricData.member.2.Dimensions.member.1.Name':
+                  u'AlarmName',
+                  u'MetricData.member.2.Dimensions.member.1.Value':
+                  u'MixedMemoryAlarm',
+                  u'MetricData.member.3.Unit': u'Count',
+                  u'MetricData.member.3.Value': u'2',
+                  u'MetricData.member.3.MetricName': u'ServiceFailure',
+                  u'MetricData.member.4.Unit': u'Percent',
+                  u'MetricData.member.4.Value': u'50',
+                  u'MetricData.member.4.MetricName': u'DiskUtilization',
+                  u'MetricData.member.4.Dimensions.member.1.Name':
+                  u'AlarmName',
+                  u'MetricData.member.4.Dimensions.member.1.Value':
+                  u'MixedHttpAlarm',
+                  u'Action': u'PutMetricData'}
+        dummy_req = self._dummy_GET_request(params)
+
+        # Deliver the RPC call to a real engine
+        engine = service.EngineService('a-host', 'a-topic')
+
+        def call(context, topic, msg, timeout=None):
+            return getattr(engine, msg['method'])(context, **msg['args'])
+
+        self.m.stubs.Set(rpc, 'call', call)
+
+        response = self.controller.put_metric_data(dummy_req)
+        expected = {'PutMetricDataResponse': {'PutMetricDataResult':
+                    {'ResponseMetadata': None}}}
+        self.assertEqual(response, expected)
+
+        samples = db_api.watch_data_get_all_by_watch_rule_id(ctx, http.id)
+        self.assertEqual([s.value for s in samples], [1.0, 2.0])
+        samples = db_api.watch_data_get_all_by_watch_rule_id(ctx, memory.id)
+        self.assertEqual([s.value for s in samples], [75.0])
+
+        db_api.watch_rule_delete(ctx, u'MixedHttpAlarm')
+        db_api.watch_rule_delete(ctx, u'MixedMemoryAlarm')
+        db_api.stack_delete(ctx, stack.id)
+
     def test_set_alarm_state(self):
         state_map = {'OK': engine_api.WATCH_STATE_OK,
                      'ALARM': engine_api.WATCH_STATE_ALARM,
@@ -302,6 +302,56 @@ class StackControllerTest(ControllerTest, unittest.TestCase):
                           req, tenant_id=self.tenant)
         self.m.VerifyAll()
 
+    def test_index_page(self):
+        req = self._get('/stacks')
+        req.environ['QUERY_STRING'] = 'limit=2&marker=1'
+
+        self.m.StubOutWithMock(rpc, 'call')
+        rpc.call(req.context, self.topic,
+                 {'method': 'list_stacks',
+                  'args': {'limit': '2', 'marker': '1'},
+                  'version': self.api_version},
+                 None).AndReturn([])
+        self.m.ReplayAll()
+
+        result = self.controller.index(req, tenant_id=self.tenant)
+        self.assertEqual(result, {'stacks': []})
+        self.m.VerifyAll()
+
+    def test_index_page_bad_limit(self):
+        req = self._get('/stacks')
+        req.environ['QUERY_STRING'] = 'limit=-1'
+
+        self.m.StubOutWithMock(rpc, 'call')
+        rpc.call(req.context, self.topic,
+                 {'method': 'list_stacks',
+                  'args': {'limit': '-1'},
+                  'version': self.api_version},
+                 None).AndRaise(rpc_common.RemoteError("ValueError"))
+        self.m.ReplayAll()
+
+        self.assertRaises(webob.exc.HTTPBadRequest,
+                          self.controller.index,
+                          req, tenant_id=self.tenant)
+        self.m.VerifyAll()
+
+    def test_index_page_bad_marker(self):
+        req = self._get('/stacks')
+        req.environ['QUERY_STRING'] = 'marker=wibble'
+
+        self.m.StubOutWithMock(rpc, 'call')
+        rpc.call(req.context, self.topic,
+                 {'method': 'list_stacks',
+                  'args': {'marker': 'wibble'},
+                  'version': self.api_version},
+                 None).AndRaise(rpc_common.RemoteError("StackNotFound"))
+        self.m.ReplayAll()
+
+        self.assertRaises(webob.exc.HTTPNotFound,
+                          self.controller.index,
+                          req, tenant_id=self.tenant)
+        self.m.VerifyAll()
+
     def test_index_rmt_interr(self):
         req = self._get('/stacks')
 
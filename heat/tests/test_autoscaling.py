@@ -13,8 +13,10 @@
 #    under the License.
 
 
+import datetime
 import os
 
+import eventlet
 import unittest
 import mox
 
@@ -23,8 +25,11 @@ from nose.plugins.attrib import attr
 from heat.common import context
 from heat.common import template_format
 from heat.engine.resources import autoscaling as asc
+from heat.engine.resources import instance
 from heat.engine.resources import loadbalancer
 from heat.engine import parser
+from heat.openstack.common import cfg
+from heat.openstack.common import timeutils
 
 
 @attr(tag=['unit', 'resource'])
@@ -36,6 +41,7 @@ class AutoScalingTest(unittest.TestCase):
 
     def tearDown(self):
         self.m.UnsetStubs()
+        cfg.CONF.clear_override('autoscaling_batch_size')
         print "AutoScalingTest teardown complete"
 
     def load_template(self):
@@ -140,9 +146,117 @@ class AutoScalingTest(unittest.TestCase):
 
         resource.delete()
 
+    def test_scaling_group_batches(self):
+        t = self.load_template()
+        t['Resources']['WebServerGroup']['Properties']['MaxSize'] = '5'
+        stack = self.parse_stack(t)
+
+        running = []
+        peak = []
+
+        def fake_action(inst):
+            running.append(inst.name)
+            peak.append(len(running))
+            eventlet.sleep(0)
+            running.remove(inst.name)
+
+        self.m.stubs.Set(instance.Instance, 'create', fake_action)
+        self.m.stubs.Set(instance.Instance, 'destroy', fake_action)
+        cfg.CONF.set_override('autoscaling_batch_size', 2)
+
+        resource = self.create_scaling_group(t, stack, 'WebServerGroup')
+        committed = []
+        resource_id_set = resource.resource_id_set
+
+        def record_resource_id(inst):
+            committed.append(inst)
+            resource_id_set(inst)
+
+        resource.resource_id_set = record_resource_id
+
+        # grow from 1 to 4, creating instances two at a time
+        resource.adjust(3)
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(committed,
+                         ['WebServerGroup-0,WebServerGroup-1,'
+                          'WebServerGroup-2',
+                          'WebServerGroup-0,WebServerGroup-1,'
+                          'WebServerGroup-2,WebServerGroup-3'])
+
+        # shrink to 1, deleting instances two at a time
+        del peak[:]
+        del committed[:]
+        resource.adjust(1, 'ExactCapacity')
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(committed,
+                         ['WebServerGroup-0,WebServerGroup-1',
+                          'WebServerGroup-0'])
+
+        resource.delete()
+
+    def test_scaling_group_coalesce(self):
+        t = self.load_template()
+        t['Resources']['WebServerGroup']['Properties']['MaxSize'] = '5'
+        stack = self.parse_stack(t)
+
+        resource = self.create_scaling_group(t, stack, 'WebServerGroup')
+        other = asc.AutoScalingGroup('WebServerGroup',
+                                     t['Resources']['WebServerGroup'],
+                                     stack)
+        created = []
+
+        def fake_create(inst):
+            # Further adjustments arrive while the first is in progress
+            if not created:
+                other.adjust(1)
+                other.adjust(-50, 'PercentChangeInCapacity')
+                other.adjust(2)
+            created.append(inst.name)
+
+        self.m.stubs.Set(instance.Instance, 'create', fake_create)
+
+        # 1 -> 2, then 2 -> 1 -> 3 in a single adjustment
+        resource.adjust(1)
+        self.assertEqual(created, ['WebServerGroup-1', 'WebServerGroup-2'])
+        self.assertEqual('WebServerGroup-0,WebServerGroup-1,WebServerGroup-2',
+                         resource.resource_id)
+
+        # The group is no longer marked as being resized
+        resource.adjust(-2)
+        self.assertEqual('WebServerGroup-0', resource.resource_id)
+
+        resource.delete()
+
+    def test_scaling_group_cooldown(self):
+        t = self.load_template()
+        properties = t['Resources']['WebServerGroup']['Properties']
+        properties['Cooldown'] = '60'
+        stack = self.parse_stack(t)
+        stack.store()
+
+        resource = self.create_scaling_group(t, stack, 'WebServerGroup')
+        self.assertEqual('WebServerGroup-0', resource.resource_id)
+
+        # The initial sizing starts the cooldown period
+        self.assertFalse(resource.adjust(1))
+        self.assertEqual('WebServerGroup-0', resource.resource_id)
+
+        last = timeutils.utcnow() - datetime.timedelta(seconds=61)
+        resource.metadata = {'last_scaling':
+                             {'time': timeutils.strtime(last),
+                              'reason': 'test'}}
+        self.assertTrue(resource.adjust(1))
+        self.assertEqual('WebServerGroup-0,WebServerGroup-1',
+                         resource.resource_id)
+        self.assertEqual(resource.metadata['last_scaling']['reason'],
+                         'ChangeInCapacity : 1')
+
+        resource.delete()
+
     def test_scaling_policy(self):
         t = self.load_template()
         stack = self.parse_stack(t)
+        stack.store()
 
         # start with min then delete
         resource = self.create_scaling_group(t, stack, 'WebServerGroup')
@@ -156,9 +270,46 @@ class AutoScalingTest(unittest.TestCase):
         self.assertEqual('WebServerGroup-0,WebServerGroup-1',
                          resource.resource_id)
 
+        # Further alarms are ignored during the policy's cooldown
+        up_policy.alarm()
+        self.assertEqual('WebServerGroup-0,WebServerGroup-1',
+                         resource.resource_id)
+
         down_policy = self.create_scaling_policy(t, stack,
                                                  'WebServerScaleDownPolicy')
         down_policy.alarm()
         self.assertEqual('WebServerGroup-0', resource.resource_id)
 
         resource.delete()
+
+    def test_scaling_policy_group_cooldown(self):
+        t = self.load_template()
+        properties = t['Resources']['WebServerGroup']['Properties']
+        properties['Cooldown'] = '60'
+        stack = self.parse_stack(t)
+        stack.store()
+
+        resource = self.create_scaling_group(t, stack, 'WebServerGroup')
+        stack.resources['WebServerGroup'] = resource
+        self.assertEqual('WebServerGroup-0', resource.resource_id)
+
+        # The group refuses the adjustment, so the policy's cooldown does
+        # not start and its next alarm is acted upon
+        up_policy = self.create_scaling_policy(t, stack,
+                                               'WebServerScaleUpPolicy')
+        up_policy.alarm()
+        self.assertEqual('WebServerGroup-0', resource.resource_id)
+        self.assertFalse(up_policy.metadata and
+                         'last_scaling' in up_policy.metadata)
+
+        last = timeutils.utcnow() - datetime.timedelta(seconds=61)
+        resource.metadata = {'last_scaling':
+                             {'time': timeutils.strtime(last),
+                              'reason': 'test'}}
+        up_policy.alarm()
+        self.assertEqual('WebServerGroup-0,WebServerGroup-1',
+                         resource.resource_id)
+        self.assertEqual(up_policy.metadata['last_scaling']['reason'],
+                         'ChangeInCapacity : 1')
+
+        resource.delete()
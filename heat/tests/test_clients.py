@@ -0,0 +1,255 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import datetime
+import mox
+import unittest
+from nose.plugins.attrib import attr
+
+from heat.common import context
+from heat.engine import clients
+from heat.openstack.common import cfg
+from heat.openstack.common import timeutils
+
+
+class FakeEntry(object):
+    def __init__(self, entry_id, name):
+        self.id = entry_id
+        self.name = name
+
+
+@attr(tag=['unit', 'clients'])
+@attr(speed='fast')
+class CatalogCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.m = mox.Mox()
+        timeutils.set_time_override(datetime.datetime(2013, 1, 1))
+        self.manager = self.m.CreateMockAnything()
+        self.cache = clients.CatalogCache()
+        self.images = [FakeEntry(1, 'F17'), FakeEntry(2, 'F18')]
+
+    def tearDown(self):
+        self.m.UnsetStubs()
+        timeutils.clear_time_override()
+        cfg.CONF.clear_override('catalog_cache_ttl')
+        cfg.CONF.clear_override('catalog_cache_size')
+
+    def test_lookup_cached(self):
+        self.manager.list().AndReturn(self.images)
+        self.m.ReplayAll()
+
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 1)
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F18'), 2)
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 1)
+        self.m.VerifyAll()
+
+    def test_lookup_miss(self):
+        self.manager.list().AndReturn(self.images)
+        self.manager.list().AndReturn(self.images + [FakeEntry(3, 'F19')])
+        self.manager.list().AndReturn(self.images)
+        self.m.ReplayAll()
+
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 1)
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F19'), 3)
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F20'), None)
+        self.m.VerifyAll()
+
+    def test_lookup_expired(self):
+        self.manager.list().AndReturn(self.images)
+        self.manager.list().AndReturn([FakeEntry(4, 'F17')])
+        self.m.ReplayAll()
+
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 1)
+        timeutils.advance_time_seconds(59)
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F18'), 2)
+        timeutils.advance_time_seconds(1)
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 4)
+        self.m.VerifyAll()
+
+    def test_lookup_per_tenant(self):
+        self.manager.list().AndReturn(self.images)
+        self.manager.list().AndReturn([])
+        self.m.ReplayAll()
+
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 1)
+        self.assertEqual(self.cache.lookup('t2', self.manager, 'F17'), None)
+        self.m.VerifyAll()
+
+    def test_lookup_evicted(self):
+        cfg.CONF.set_override('catalog_cache_size', 2)
+        self.manager.list().AndReturn(self.images)
+        self.manager.list().AndReturn(self.images)
+        self.manager.list().AndReturn(self.images)
+        self.manager.list().AndReturn(self.images)
+        self.m.ReplayAll()
+
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 1)
+        self.assertEqual(self.cache.lookup('t2', self.manager, 'F17'), 1)
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 1)
+        self.assertEqual(self.cache.lookup('t3', self.manager, 'F17'), 1)
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 1)
+        self.assertEqual(self.cache.lookup('t2', self.manager, 'F17'), 1)
+        self.m.VerifyAll()
+
+    def test_invalidate(self):
+        self.manager.list().AndReturn(self.images)
+        self.manager.list().AndReturn([FakeEntry(4, 'F17')])
+        self.m.ReplayAll()
+
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 1)
+        self.cache.invalidate('t1', self.manager)
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 4)
+        self.m.VerifyAll()
+
+    def test_disabled(self):
+        cfg.CONF.set_override('catalog_cache_ttl', 0)
+        self.manager.list().AndReturn(self.images)
+        self.manager.list().AndReturn(self.images)
+        self.m.ReplayAll()
+
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 1)
+        self.assertEqual(self.cache.lookup('t1', self.manager, 'F17'), 1)
+        self.m.VerifyAll()
+
+    def test_keypairs_per_user(self):
+        ctx = context.RequestContext.from_dict({
+            'tenant': 'test_tenant',
+            'tenant_id': '1234',
+            'username': 'user1',
+            'auth_url': 'http://localhost:5000/v2.0'})
+        self.manager.list().AndReturn([FakeEntry(1, 'key1')])
+        self.manager.list().AndReturn([])
+        self.manager.list().AndReturn(self.images)
+        self.m.ReplayAll()
+
+        try:
+            c = clients.OpenStackClients(ctx)
+            self.assertEqual(c.nova_lookup(self.manager, 'key1',
+                                           per_user=True), 1)
+            self.assertEqual(c.nova_lookup(self.manager, 'key1',
+                                           per_user=True), 1)
+
+            # Another user of the same tenant has no such keypair
+            ctx.username = 'user2'
+            self.assertEqual(c.nova_lookup(self.manager, 'key1',
+                                           per_user=True), None)
+
+            # Catalogs such as images are shared by the tenant
+            self.assertEqual(c.nova_lookup(self.manager, 'F17'), 1)
+            ctx.username = 'user1'
+            self.assertEqual(c.nova_lookup(self.manager, 'F17'), 1)
+        finally:
+            clients.catalog_cache.clear()
+        self.m.VerifyAll()
+
+
+class FakeClient(object):
+    def __init__(self, name, expires=None):
+        self.name = name
+        if expires is not None:
+            self.service_catalog = FakeCatalog(expires)
+
+
+class FakeCatalog(object):
+    def __init__(self, expires):
+        self.catalog = {'access': {'token': {'expires': expires}}}
+
+
+@attr(tag=['unit', 'clients'])
+@attr(speed='fast')
+class ClientPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.m = mox.Mox()
+        timeutils.set_time_override(datetime.datetime(2013, 1, 1))
+        self.pool = clients.ClientPool()
+        self.ctx = context.RequestContext.from_dict({
+            'tenant': 'test_tenant',
+            'tenant_id': '1234',
+            'username': 'test_username',
+            'password': 'password',
+            'auth_url': 'http://localhost:5000/v2.0'})
+
+    def tearDown(self):
+        self.m.UnsetStubs()
+        timeutils.clear_time_override()
+        cfg.CONF.clear_override('client_pool_size')
+        cfg.CONF.clear_override('client_pool_ttl')
+        clients.client_pool.clear()
+
+    def test_reuse(self):
+        self.assertEqual(self.pool.get('a', lambda: 'a1'), 'a1')
+        self.assertEqual(self.pool.get('a', lambda: 'a2'), 'a1')
+        self.assertEqual(self.pool.get('b', lambda: 'b1'), 'b1')
+        self.assertEqual(self.pool.get(None, lambda: 'c1'), 'c1')
+        self.assertEqual(self.pool.get(None, lambda: 'c2'), 'c2')
+        self.assertEqual(self.pool.get('d', lambda: None), None)
+        self.assertEqual(len(self.pool), 2)
+
+    def test_ttl(self):
+        cfg.CONF.set_override('client_pool_ttl', 60)
+        self.assertEqual(self.pool.get('a', lambda: 'a1'), 'a1')
+        timeutils.advance_time_seconds(59)
+        self.assertEqual(self.pool.get('a', lambda: 'a2'), 'a1')
+        timeutils.advance_time_seconds(1)
+        self.assertEqual(self.pool.get('a', lambda: 'a3'), 'a3')
+
+    def test_token_expiry(self):
+        client = FakeClient('a1', '2013-01-01T00:10:00Z')
+        self.assertEqual(self.pool.get('a', lambda: client), client)
+        timeutils.advance_time_seconds(299)
+        self.assertEqual(self.pool.get('a', lambda: None), client)
+        timeutils.advance_time_seconds(1)
+        self.assertEqual(self.pool.get('a', lambda: 'a2'), 'a2')
+
+    def test_lru(self):
+        cfg.CONF.set_override('client_pool_size', 2)
+        self.pool.get('a', lambda: 'a1')
+        self.pool.get('b', lambda: 'b1')
+        self.pool.get('a', lambda: 'a2')
+        self.pool.get('c', lambda: 'c1')
+        self.assertEqual(len(self.pool), 2)
+        self.assertEqual(self.pool.get('a', lambda: 'a3'), 'a1')
+        self.assertEqual(self.pool.get('b', lambda: 'b2'), 'b2')
+
+    def test_disabled(self):
+        cfg.CONF.set_override('client_pool_size', 0)
+        self.assertEqual(self.pool.get('a', lambda: 'a1'), 'a1')
+        self.assertEqual(self.pool.get('a', lambda: 'a2'), 'a2')
+        self.assertEqual(len(self.pool), 0)
+
+    def test_shared_between_stacks(self):
+        self.m.StubOutWithMock(clients.novaclient, 'Client')
+        nova = self.m.CreateMockAnything()
+        clients.novaclient.Client(
+            1.1, no_cache=True, project_id='test_tenant',
+            auth_url='http://localhost:5000/v2.0', service_type='compute',
+            username='test_username', api_key='password').AndReturn(nova)
+        nova.authenticate().AndReturn(None)
+        other = self.m.CreateMockAnything()
+        clients.novaclient.Client(
+            1.1, no_cache=True, project_id='test_tenant',
+            auth_url='http://localhost:5000/v2.0', service_type='compute',
+            username='test_username', api_key='secret').AndReturn(other)
+        other.authenticate().AndReturn(None)
+        self.m.ReplayAll()
+
+        self.assertEqual(clients.OpenStackClients(self.ctx).nova(), nova)
+        self.assertEqual(clients.OpenStackClients(self.ctx).nova(), nova)
+
+        self.ctx.password = 'secret'
+        self.assertEqual(clients.OpenStackClients(self.ctx).nova(), other)
+        self.m.VerifyAll()
@@ -192,3 +192,44 @@ class dependenciesTest(unittest.TestCase):
         for n in ('last', 'mid1', 'mid2', 'mid3'):
             self.assertTrue(n in order,
                             "'%s' not found in dependency order" % n)
+
+    def test_order_cached(self):
+        d = Dependencies([('last', 'first')])
+        self.assertEqual(list(iter(d)), ['first', 'last'])
+        self.assertTrue(d._toposort() is d._toposort())
+
+    def test_order_invalidated(self):
+        d = Dependencies([('last', 'first')])
+        self.assertEqual(list(iter(d)), ['first', 'last'])
+        d += ('first', 'new')
+        self.assertEqual(list(iter(d)), ['new', 'first', 'last'])
+        self.assertEqual(list(reversed(d)), ['last', 'first', 'new'])
+
+    def test_levels(self):
+        d = Dependencies([('last', 'mid1'), ('last', 'mid2'),
+                          ('mid1', 'mid3'), ('mid1', 'first'),
+                          ('mid3', 'first'), ('mid2', 'first'),
+                          ('other', None)])
+        levels = d.levels()
+        self.assertEqual(len(levels), 4)
+        self.assertEqual(set(levels[0]), set(['first', 'other']))
+        self.assertEqual(set(levels[1]), set(['mid2', 'mid3']))
+        self.assertEqual(levels[2], ('mid1',))
+        self.assertEqual(levels[3], ('last',))
+
+    def test_levels_rev(self):
+        d = Dependencies([('last', 'mid1'), ('last', 'mid2'),
+                          ('mid1', 'mid3'), ('mid1', 'first'),
+                          ('mid3', 'first'), ('mid2', 'first'),
+                          ('other', None)])
+        levels = d.levels(reverse=True)
+        self.assertEqual(len(levels), 4)
+        self.assertEqual(set(levels[0]), set(['last', 'other']))
+        self.assertEqual(set(levels[1]), set(['mid1', 'mid2']))
+        self.assertEqual(levels[2], ('mid3',))
+        self.assertEqual(levels[3], ('first',))
+
+    def test_levels_circular(self):
+        d = Dependencies([('first', 'second'),
+                          ('second', 'first')])
+        self.assertRaises(CircularDependencyException, d.levels)
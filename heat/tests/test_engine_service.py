@@ -31,6 +31,7 @@ from heat.engine import service
 from heat.engine.resources import instance as instances
 from heat.engine import watchrule
 from heat.openstack.common import threadgroup
+from heat.openstack.common import timeutils
 
 
 tests_dir = os.path.dirname(os.path.realpath(__file__))
@@ -462,6 +463,32 @@ class stackServiceTest(unittest.TestCase):
 
             self.assertTrue('event_time' in ev)
 
+    def test_stack_event_list_page(self):
+        events = self.man.list_events(self.ctx, self.stack_identity, limit=1)
+        self.assertEqual(len(events), 1)
+        first_id = events[0]['event_identity']['path'].rsplit('/', 1)[1]
+
+        events = self.man.list_events(self.ctx, self.stack_identity,
+                                      marker=first_id)
+        self.assertEqual(len(events), 1)
+        next_id = events[0]['event_identity']['path'].rsplit('/', 1)[1]
+        self.assertTrue(int(next_id) > int(first_id))
+
+    def test_stack_event_list_resource(self):
+        events = self.man.list_events(self.ctx, self.stack_identity,
+                                      resource_name='WebServer')
+        self.assertEqual(len(events), 2)
+
+        events = self.man.list_events(self.ctx, self.stack_identity,
+                                      resource_name='wibble')
+        self.assertEqual(len(events), 0)
+
+    def test_event_list_tenant(self):
+        events = self.man.list_events(self.ctx, None)
+        self.assertEqual(len(events), 2)
+        for ev in events:
+            self.assertEqual(ev['stack_name'], self.stack_name)
+
     def test_stack_list_all(self):
         sl = self.man.list_stacks(self.ctx)
 
@@ -478,6 +505,23 @@ class stackServiceTest(unittest.TestCase):
             self.assertTrue('description' in s)
             self.assertNotEqual(s['description'].find('WordPress'), -1)
 
+    def test_stack_list_page(self):
+        sl = self.man.list_stacks(self.ctx, limit=1)
+        self.assertEqual(len(sl), 1)
+        self.assertEqual(sl[0]['stack_identity'], self.stack_identity)
+
+        sl = self.man.list_stacks(self.ctx,
+                                  marker=self.stack_identity['stack_id'])
+        self.assertEqual(len(sl), 0)
+
+        self.assertRaises(exception.StackNotFound, self.man.list_stacks,
+                          self.ctx, marker='wibble')
+
+    def test_stack_list_bad_limit(self):
+        for limit in (0, -1, '-1', 'wibble'):
+            self.assertRaises(ValueError, self.man.list_stacks,
+                              self.ctx, limit=limit)
+
     def test_stack_list_all_empty(self):
         self.tearDown()
         self.tenant = 'stack_list_all_empty_tenant'
@@ -774,6 +818,76 @@ class stackServiceTest(unittest.TestCase):
         for key in engine_api.WATCH_DATA_KEYS:
             self.assertTrue(key in result[0])
 
+    def test_list_watch_metrics(self):
+        # Insert two dummy watch rules into the DB
+        values = {'stack_id': self.stack.id,
+                  'state': 'NORMAL',
+                  'name': u'CatalogAlarm1',
+                  'rule': {u'EvaluationPeriods': u'1',
+                           u'Namespace': u'system/linux',
+                           u'Period': u'300',
+                           u'ComparisonOperator': u'GreaterThanThreshold',
+                           u'Statistic': u'SampleCount',
+                           u'Threshold': u'100',
+                           u'MetricName': u'ServiceFailure'}}
+        db_api.watch_rule_create(self.ctx, values)
+        values['name'] = u'CatalogAlarm2'
+        values['rule'] = dict(values['rule'], MetricName=u'MemoryUsage')
+        db_api.watch_rule_create(self.ctx, values)
+
+        def stats(metric, value, dimensions=[]):
+            return {u'Namespace': u'system/linux',
+                    metric: {u'Units': u'Counter', u'Value': value,
+                             u'Dimensions': dimensions}}
+
+        # Each distinct metric is added to the catalog once
+        self.man.create_watch_data(self.ctx, u'CatalogAlarm1',
+                                   stats(u'ServiceFailure', 1))
+        self.man.create_watch_data(self.ctx, u'CatalogAlarm1',
+                                   stats(u'ServiceFailure', 2))
+        self.man.create_watch_data_batch(self.ctx, [
+            {'watch_name': u'CatalogAlarm1',
+             'stats_data': stats(u'ServiceFailure', 1,
+                                 [{u'Service': u'httpd'}])},
+            {'watch_name': u'CatalogAlarm2',
+             'stats_data': stats(u'MemoryUsage', 75)},
+            {'watch_name': u'CatalogAlarm2',
+             'stats_data': stats(u'MemoryUsage', 85)}])
+
+        result = self.man.list_watch_metrics(self.ctx)
+        self.assertEqual([(m['watch_name'], m['metric_name'],
+                           m['dimensions']) for m in result],
+                         [(u'CatalogAlarm1', u'ServiceFailure', []),
+                          (u'CatalogAlarm1', u'ServiceFailure',
+                           [{u'Service': u'httpd'}]),
+                          (u'CatalogAlarm2', u'MemoryUsage', [])])
+        for key in engine_api.WATCH_METRIC_KEYS:
+            self.assertTrue(key in result[0])
+
+        result = self.man.list_watch_metrics(self.ctx,
+                                             metric_name=u'MemoryUsage')
+        self.assertEqual([m['watch_name'] for m in result],
+                         [u'CatalogAlarm2'])
+        result = self.man.list_watch_metrics(self.ctx,
+                                             namespace=u'system/other')
+        self.assertEqual(result, [])
+
+        page = self.man.list_watch_metrics(self.ctx, limit=2)
+        self.assertEqual(len(page), 2)
+        page = self.man.list_watch_metrics(self.ctx, limit=2,
+                                           marker=page[-1]['id'])
+        self.assertEqual([m['metric_name'] for m in page], [u'MemoryUsage'])
+
+        # show_watch_metric uses the catalog to filter the datapoints
+        result = self.man.show_watch_metric(self.ctx,
+                                            metric_name=u'MemoryUsage')
+        self.assertEqual([d['data']['Value'] for d in result], [75, 85])
+
+        # Cleanup, delete the dummy rules
+        db_api.watch_rule_delete(self.ctx, u'CatalogAlarm1')
+        db_api.watch_rule_delete(self.ctx, u'CatalogAlarm2')
+        self.assertEqual(self.man.list_watch_metrics(self.ctx), [])
+
     def test_set_watch_state(self):
         # Insert dummy watch rule into the DB
         values = {'stack_id': self.stack.id,
@@ -830,6 +944,159 @@ class stackServiceTest(unittest.TestCase):
         # Cleanup, delete the dummy rule
         db_api.watch_rule_delete(self.ctx, "OverrideAlarm")
 
+    def test_create_watch_data(self):
+        # Insert dummy watch rule into the DB
+        values = {'stack_id': self.stack.id,
+                  'state': 'NORMAL',
+                  'name': u'PushAlarm',
+                  'rule': {u'EvaluationPeriods': u'1',
+                           u'AlarmActions': [u'WebServerRestartPolicy'],
+                           u'AlarmDescription': u'Restart the WikiDatabase',
+                           u'Namespace': u'system/linux',
+                           u'Period': u'300',
+                           u'ComparisonOperator': u'GreaterThanThreshold',
+                           u'Statistic': u'SampleCount',
+                           u'Threshold': u'1',
+                           u'MetricName': u'ServiceFailure'}}
+        db_ret = db_api.watch_rule_create(self.ctx, values)
+        self.assertNotEqual(db_ret, None)
+
+        class DummyAction:
+            alarm = "dummyfoo"
+
+        dummy_action = DummyAction()
+        self.m.StubOutWithMock(parser.Stack, '__getitem__')
+        parser.Stack.__getitem__(
+            'WebServerRestartPolicy').AndReturn(dummy_action)
+
+        self.man.stg[self.stack.id] = DummyThreadGroup()
+
+        self.m.ReplayAll()
+
+        # The rule is evaluated immediately when each sample arrives
+        data = {u'Namespace': u'system/linux',
+                u'ServiceFailure': {u'Units': u'Counter', u'Value': 1}}
+        self.man.create_watch_data(self.ctx, u'PushAlarm', data)
+        watch = db_api.watch_rule_get(self.ctx, db_ret.id)
+        self.assertEqual(watch.state, 'NORMAL')
+        self.assertEqual(self.man.stg[self.stack.id].threads, [])
+
+        self.man.create_watch_data(self.ctx, u'PushAlarm', data)
+        watch = db_api.watch_rule_get(self.ctx, db_ret.id)
+        self.assertEqual(watch.state, 'ALARM')
+        self.assertEqual(self.man.stg[self.stack.id].threads,
+                         [DummyAction.alarm])
+
+        # The periodic evaluation is postponed by a Period
+        self.assertTrue(db_ret.id in self.man.watcher)
+        self.assertEqual(self.man.watcher._pop_due(timeutils.utcnow()), [])
+
+        # Cleanup, delete the dummy rule
+        db_api.watch_rule_delete(self.ctx, "PushAlarm")
+
+    def test_create_watch_data_stack_context(self):
+        values = {'stack_id': self.stack.id,
+                  'state': 'NORMAL',
+                  'name': u'ContextAlarm',
+                  'rule': {u'EvaluationPeriods': u'1',
+                           u'AlarmActions': [u'WebServerRestartPolicy'],
+                           u'Namespace': u'system/linux',
+                           u'Period': u'300',
+                           u'ComparisonOperator': u'GreaterThanThreshold',
+                           u'Statistic': u'SampleCount',
+                           u'Threshold': u'0',
+                           u'MetricName': u'ServiceFailure'}}
+        db_api.watch_rule_create(self.ctx, values)
+
+        contexts = []
+
+        def rule_actions(rule, new_state):
+            contexts.append(rule.context)
+            return []
+
+        self.m.stubs.Set(watchrule.WatchRule, 'rule_actions', rule_actions)
+
+        # The rule is evaluated as the owner of the stack, not as the user
+        # sending the data
+        sender = context.RequestContext(username='instance_user',
+                                        tenant_id=self.tenant)
+        data = {u'Namespace': u'system/linux',
+                u'ServiceFailure': {u'Units': u'Counter', u'Value': 1}}
+        self.man.create_watch_data(sender, u'ContextAlarm', data)
+        self.assertEqual([c.username for c in contexts], [self.username])
+
+        # Cleanup, delete the dummy rule
+        db_api.watch_rule_delete(self.ctx, "ContextAlarm")
+
+    def test_create_watch_data_batch(self):
+        # Insert two dummy watch rules into the DB
+        values = {'stack_id': self.stack.id,
+                  'state': 'NORMAL',
+                  'name': u'BatchAlarm1',
+                  'rule': {u'EvaluationPeriods': u'1',
+                           u'Namespace': u'system/linux',
+                           u'Period': u'300',
+                           u'ComparisonOperator': u'GreaterThanThreshold',
+                           u'Statistic': u'SampleCount',
+                           u'Threshold': u'1',
+                           u'MetricName': u'ServiceFailure'}}
+        watch1 = db_api.watch_rule_create(self.ctx, values)
+        values['name'] = u'BatchAlarm2'
+        values['rule'] = dict(values['rule'], MetricName=u'MemoryUsage')
+        watch2 = db_api.watch_rule_create(self.ctx, values)
+
+        def datum(watch_name, metric, value):
+            return {'watch_name': watch_name,
+                    'stats_data': {u'Namespace': u'system/linux',
+                                   metric: {u'Units': u'Counter',
+                                            u'Value': value}}}
+
+        data = [datum(u'BatchAlarm1', u'ServiceFailure', 1),
+                datum(u'BatchAlarm2', u'MemoryUsage', 75),
+                datum(u'BatchAlarm1', u'ServiceFailure', 2)]
+        self.man.create_watch_data_batch(self.ctx, data)
+
+        samples = db_api.watch_data_get_all_by_watch_rule_id(self.ctx,
+                                                             watch1.id)
+        self.assertEqual([s.value for s in samples], [1.0, 2.0])
+        samples = db_api.watch_data_get_all_by_watch_rule_id(self.ctx,
+                                                             watch2.id)
+        self.assertEqual([s.value for s in samples], [75.0])
+
+        # Each rule is evaluated once all of its samples are stored
+        watch = db_api.watch_rule_get(self.ctx, watch1.id)
+        self.assertEqual(watch.state, 'ALARM')
+        watch = db_api.watch_rule_get(self.ctx, watch2.id)
+        self.assertEqual(watch.state, 'NORMAL')
+
+        # A sample for a missing watch, or for another metric than that of
+        # its watch, is skipped without affecting the rest of the batch
+        bad = [datum(u'NoSuchAlarm', u'ServiceFailure', 1),
+               datum(u'BatchAlarm1', u'MemoryUsage', 80)]
+        good = [datum(u'BatchAlarm1', u'ServiceFailure', 3),
+                datum(u'BatchAlarm2', u'MemoryUsage', 85)]
+        stored = self.man.create_watch_data_batch(self.ctx,
+                                                  [bad[0], good[0],
+                                                   bad[1], good[1]])
+        self.assertEqual(stored, good)
+        samples = db_api.watch_data_get_all_by_watch_rule_id(self.ctx,
+                                                             watch1.id)
+        self.assertEqual([s.value for s in samples], [1.0, 2.0, 3.0])
+        samples = db_api.watch_data_get_all_by_watch_rule_id(self.ctx,
+                                                             watch2.id)
+        self.assertEqual([s.value for s in samples], [75.0, 85.0])
+
+        # The error is reported if no sample could be stored
+        self.assertRaises(exception.WatchRuleNotFound,
+                          self.man.create_watch_data_batch, self.ctx, bad)
+        samples = db_api.watch_data_get_all_by_watch_rule_id(self.ctx,
+                                                             watch1.id)
+        self.assertEqual(len(samples), 3)
+
+        # Cleanup, delete the dummy rules
+        db_api.watch_rule_delete(self.ctx, u'BatchAlarm1')
+        db_api.watch_rule_delete(self.ctx, u'BatchAlarm2')
+
     def test_set_watch_state_badstate(self):
         # Insert dummy watch rule into the DB
         values = {'stack_id': self.stack.id,
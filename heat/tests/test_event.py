@@ -20,6 +20,7 @@ import unittest
 from heat.common import context
 import heat.db as db_api
 from heat.engine import parser
+from heat.engine import properties
 from heat.engine import template
 from heat.engine import event
 from heat.engine import resource
@@ -94,3 +95,23 @@ class EventTest(unittest.TestCase):
             'path': '/resources/EventTestResource/events/%s' % str(eid)
         }
         self.assertEqual(e.identifier(), expected_identifier)
+
+    def test_resource_properties_snapshot(self):
+        schema = {'Foo': {'Type': 'String'},
+                  'Bar': {'Type': 'String'},
+                  'Baz': {'Type': 'String', 'Default': 'wibble'}}
+        props = {'Foo': {'Fn::GetAtt': ['EventTestResource', 'Foo']},
+                 'Bar': {'Fn::GetAtt': ['EventTestResource', 'Bar']}}
+        self.resource.properties = properties.Properties(
+            schema, props, lambda d: d['Fn::GetAtt'][1].lower())
+        self.assertEqual(self.resource.properties['Foo'], 'foo')
+        self.resource.state_set('TEST_IN_PROGRESS', 'Testing')
+
+        expected = {'Foo': 'foo', 'Bar': props['Bar'], 'Baz': 'wibble'}
+        events = db_api.event_get_all_by_stack(self.ctx, self.stack.id)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].resource_properties, expected)
+
+        loaded_e = event.Event.load(self.ctx, events[0].id)
+        self.assertEqual(loaded_e._resource_properties, None)
+        self.assertEqual(loaded_e.resource_properties, expected)
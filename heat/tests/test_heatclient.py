@@ -0,0 +1,150 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import mox
+import unittest
+from nose.plugins.attrib import attr
+
+from heat.common import context
+from heat.common import heat_keystoneclient
+from heat.openstack.common import cfg
+from heat.openstack.common import timeutils
+
+
+class FakeRole(object):
+    def __init__(self, role_id, name):
+        self.id = role_id
+        self.name = name
+
+
+@attr(tag=['unit', 'keystoneclient'])
+@attr(speed='fast')
+class KeystoneClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.m = mox.Mox()
+        cfg.CONF.set_default('heat_stack_user_role', 'heat_stack_user')
+        self.ctx = context.RequestContext.from_dict({
+            'tenant': 'test_tenant',
+            'tenant_id': 'tenant1',
+            'username': 'test_username',
+            'password': 'password',
+            'auth_url': 'http://localhost:5000/v2.0'})
+
+        self.m.StubOutWithMock(heat_keystoneclient.kc, 'Client')
+        self.client = self.m.CreateMockAnything()
+        self.client.roles = self.m.CreateMockAnything()
+        self.client.users = self.m.CreateMockAnything()
+        self.client.ec2 = self.m.CreateMockAnything()
+        heat_keystoneclient.kc.Client(
+            auth_url='http://localhost:5000/v2.0', username='test_username',
+            password='password', tenant_name='test_tenant',
+            tenant_id='tenant1').AndReturn(self.client)
+        self.client.authenticate().AndReturn(None)
+
+    def tearDown(self):
+        self.m.UnsetStubs()
+        heat_keystoneclient._role_ids.clear()
+        heat_keystoneclient._ec2_credentials.clear()
+        timeutils.clear_time_override()
+        cfg.CONF.clear_override('keystone_cache_ttl')
+        cfg.CONF.clear_override('keystone_cache_size')
+
+    def _user(self, user_id):
+        user = self.m.CreateMockAnything()
+        user.id = user_id
+        self.client.users.create(user_id, '', '%s@heat-api.org' % user_id,
+                                 tenant_id='tenant1',
+                                 enabled=True).AndReturn(user)
+        return user
+
+    def test_stack_user_role_cached(self):
+        self._user('user1')
+        self.client.roles.list().AndReturn([FakeRole('r1', 'admin'),
+                                            FakeRole('r2', 'heat_stack_user')])
+        self.client.roles.add_user_role('user1', 'r2', 'tenant1')
+        self._user('user2')
+        self.client.roles.add_user_role('user2', 'r2', 'tenant1')
+        self.m.ReplayAll()
+
+        ks = heat_keystoneclient.KeystoneClient(self.ctx)
+        self.assertEqual(ks.create_stack_user('user1'), 'user1')
+        self.assertEqual(ks.create_stack_user('user2'), 'user2')
+        self.m.VerifyAll()
+
+    def test_stack_user_role_stale(self):
+        heat_keystoneclient._role_ids.set(('http://localhost:5000/v2.0',
+                                           'heat_stack_user'), 'r1',
+                                          300, 1000)
+        self._user('user1')
+        self.client.roles.add_user_role(
+            'user1', 'r1', 'tenant1').AndRaise(
+                heat_keystoneclient.kc_exception.NotFound(404))
+        self.client.roles.list().AndReturn([FakeRole('r2', 'heat_stack_user')])
+        self.client.roles.add_user_role('user1', 'r2', 'tenant1')
+        self.m.ReplayAll()
+
+        ks = heat_keystoneclient.KeystoneClient(self.ctx)
+        self.assertEqual(ks.create_stack_user('user1'), 'user1')
+        self.m.VerifyAll()
+
+    def test_ec2_keypair_cached(self):
+        self.client.ec2.list('user1').AndReturn(['cred1'])
+        self.client.ec2.delete('user1', 'access1')
+        self.client.ec2.list('user1').AndReturn([])
+        self.client.ec2.create('user1', 'tenant1').AndReturn('cred2')
+        self.m.ReplayAll()
+
+        ks = heat_keystoneclient.KeystoneClient(self.ctx)
+        self.assertEqual(ks.get_ec2_keypair('user1'), 'cred1')
+        self.assertEqual(ks.get_ec2_keypair('user1'), 'cred1')
+        ks.delete_ec2_keypair('user1', 'access1')
+        self.assertEqual(ks.get_ec2_keypair('user1'), 'cred2')
+        self.assertEqual(ks.get_ec2_keypair('user1'), 'cred2')
+        self.m.VerifyAll()
+
+    def test_ec2_keypair_expired(self):
+        timeutils.set_time_override(datetime.datetime(2013, 1, 1))
+        cfg.CONF.set_override('keystone_cache_ttl', 60)
+        self.client.ec2.list('user1').AndReturn(['cred1'])
+        self.client.ec2.list('user1').AndReturn(['cred2'])
+        self.m.ReplayAll()
+
+        ks = heat_keystoneclient.KeystoneClient(self.ctx)
+        self.assertEqual(ks.get_ec2_keypair('user1'), 'cred1')
+        timeutils.advance_time_seconds(59)
+        self.assertEqual(ks.get_ec2_keypair('user1'), 'cred1')
+        timeutils.advance_time_seconds(1)
+        self.assertEqual(ks.get_ec2_keypair('user1'), 'cred2')
+        self.m.VerifyAll()
+
+    def test_ec2_keypair_evicted(self):
+        cfg.CONF.set_override('keystone_cache_size', 2)
+        self.client.ec2.list('user1').AndReturn(['cred1'])
+        self.client.ec2.list('user2').AndReturn(['cred2'])
+        self.client.ec2.list('user3').AndReturn(['cred3'])
+        self.client.ec2.list('user2').AndReturn(['cred2'])
+        self.m.ReplayAll()
+
+        ks = heat_keystoneclient.KeystoneClient(self.ctx)
+        self.assertEqual(ks.get_ec2_keypair('user1'), 'cred1')
+        self.assertEqual(ks.get_ec2_keypair('user2'), 'cred2')
+        self.assertEqual(ks.get_ec2_keypair('user1'), 'cred1')
+        self.assertEqual(ks.get_ec2_keypair('user3'), 'cred3')
+        self.assertEqual(len(heat_keystoneclient._ec2_credentials), 2)
+        self.assertEqual(ks.get_ec2_keypair('user1'), 'cred1')
+        self.assertEqual(ks.get_ec2_keypair('user2'), 'cred2')
+        self.m.VerifyAll()
@@ -0,0 +1,161 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import datetime
+import unittest
+from nose.plugins.attrib import attr
+
+from heat.common import context
+from heat.db import api as db_api
+from heat.engine import housekeeping
+from heat.openstack.common import cfg
+from heat.openstack.common import uuidutils
+
+
+@attr(tag=['unit', 'housekeeping'])
+@attr(speed='fast')
+class HousekeepingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ctx = context.get_admin_context()
+        tmpl = db_api.raw_template_create(self.ctx, {'template': {}})
+        stack = db_api.stack_create(self.ctx, {
+            'id': uuidutils.generate_uuid(),
+            'name': 'housekeeping_test_stack',
+            'raw_template_id': tmpl.id,
+            'user_creds_id': 1,
+            'username': 'housekeeping_test_user',
+            'tenant': 'housekeeping_test_tenant',
+            'parameters': {},
+            'timeout': 60})
+        self.stack_id = stack.id
+        self.now = datetime.datetime(2013, 1, 1, 12, 0, 0)
+
+    def tearDown(self):
+        for name in ('max_events_per_stack', 'housekeeping_batch_size',
+                     'watch_data_retention'):
+            cfg.CONF.clear_override(name)
+
+    def _watch(self):
+        rule = {'MetricName': 'test_metric',
+                'Namespace': 'system/linux',
+                'Period': '60',
+                'EvaluationPeriods': '1',
+                'Statistic': 'Average',
+                'ComparisonOperator': 'GreaterThanThreshold',
+                'Threshold': '100'}
+        return db_api.watch_rule_create(self.ctx, {
+            'name': 'housekeeping_test_%s' % uuidutils.generate_uuid(),
+            'rule': rule,
+            'state': 'NORMAL',
+            'stack_id': self.stack_id})
+
+    def _add_sample(self, watch, value, age):
+        db_api.watch_data_create(self.ctx, {
+            'watch_rule_id': watch.id,
+            'data': {'test_metric': {'Value': value, 'Unit': 'Count'}},
+            'metric_name': 'test_metric',
+            'value': value,
+            'created_at': self.now - datetime.timedelta(seconds=age)})
+
+    def _samples(self, watch, aggregated):
+        return [d for d in db_api.watch_data_get_all(self.ctx)
+                if d.watch_rule_id == watch.id and
+                (d.sample_count is not None) == aggregated]
+
+    def test_rollup(self):
+        watch = self._watch()
+        for value, age in ((10, 1000), (30, 990), (5, 500), (7, 30)):
+            self._add_sample(watch, value, age)
+
+        housekeeping.rollup_watch_rule(self.ctx, watch, self.now)
+
+        raw = self._samples(watch, False)
+        self.assertEqual([d.value for d in raw], [7])
+
+        rollups = sorted(self._samples(watch, True),
+                         key=lambda d: d.created_at)
+        self.assertEqual([d.created_at for d in rollups],
+                         [datetime.datetime(2013, 1, 1, 11, 43),
+                          datetime.datetime(2013, 1, 1, 11, 51)])
+        self.assertEqual([d.sample_count for d in rollups], [2, 1])
+        self.assertEqual([d.value for d in rollups], [20.0, 5.0])
+        self.assertEqual(rollups[0].data['test_metric']['Maximum'], 30)
+        self.assertEqual(rollups[0].data['Namespace'], 'system/linux')
+
+        db_api.watch_rule_delete(self.ctx, watch.name)
+
+    def test_rollup_once(self):
+        watch = self._watch()
+        for value, age in ((10, 1000), (30, 990)):
+            self._add_sample(watch, value, age)
+
+        start = datetime.datetime(2013, 1, 1, 11, 43)
+        end = start + datetime.timedelta(seconds=60)
+        rollup = db_api.watch_data_rollup(self.ctx, watch.id, 'test_metric',
+                                          start, end)
+        self.assertEqual(rollup.value, 20.0)
+        self.assertEqual(db_api.watch_data_rollup(self.ctx, watch.id,
+                                                  'test_metric', start, end),
+                         None)
+
+        self.assertEqual(self._samples(watch, False), [])
+        self.assertEqual([d.sample_count for d in self._samples(watch, True)],
+                         [2])
+
+        db_api.watch_rule_delete(self.ctx, watch.name)
+
+    def test_rollup_failed(self):
+        watch = self._watch()
+        for value, age in ((10, 1000), (30, 990)):
+            self._add_sample(watch, value, age)
+
+        start = datetime.datetime(2013, 1, 1, 11, 43)
+        end = start + datetime.timedelta(seconds=60)
+        # The aggregated sample cannot be stored, so nothing is deleted
+        self.assertRaises(Exception, db_api.watch_data_rollup, self.ctx,
+                          watch.id, 'test_metric', start, end,
+                          unit=object())
+
+        self.assertEqual([d.value for d in self._samples(watch, False)],
+                         [10, 30])
+        self.assertEqual(self._samples(watch, True), [])
+
+        db_api.watch_rule_delete(self.ctx, watch.name)
+
+    def test_rollup_retention(self):
+        cfg.CONF.set_override('watch_data_retention', 600)
+        watch = self._watch()
+        for value, age in ((10, 1000), (5, 500)):
+            self._add_sample(watch, value, age)
+
+        housekeeping.rollup_watch_data(self.ctx, self.now)
+
+        rollups = self._samples(watch, True)
+        self.assertEqual([d.value for d in rollups], [5.0])
+
+        db_api.watch_rule_delete(self.ctx, watch.name)
+
+    def test_prune_events(self):
+        cfg.CONF.set_override('max_events_per_stack', 2)
+        cfg.CONF.set_override('housekeeping_batch_size', 2)
+        for i in range(5):
+            db_api.event_create(self.ctx, {'stack_id': self.stack_id,
+                                           'name': 'event%d' % i})
+
+        housekeeping.prune_events(self.ctx)
+
+        events = db_api.event_get_all_by_stack(self.ctx, self.stack_id)
+        self.assertEqual([e.name for e in events], ['event3', 'event4'])
@@ -21,6 +21,7 @@ import mox
 from nose.plugins.attrib import attr
 
 from heat.tests.v1_1 import fakes
+from heat.engine import clients
 from heat.engine.resources import instance as instances
 from heat.common import template_format
 from heat.engine import parser
@@ -38,6 +39,7 @@ class instancesTest(unittest.TestCase):
 
     def tearDown(self):
         self.m.UnsetStubs()
+        clients.catalog_cache.clear()
         print "instancesTest teardown complete"
 
     def test_instance_create(self):
@@ -80,6 +82,111 @@ class instancesTest(unittest.TestCase):
         self.assertTrue(instance.id > 0)
         self.m.VerifyAll()
 
+    def test_instance_create_image_stale(self):
+        f = open("%s/WordPress_Single_Instance_gold.template" % self.path)
+        t = template_format.parse(f.read())
+        f.close()
+
+        stack_name = 'instance_create_stale_test_stack'
+        template = parser.Template(t)
+        params = parser.Parameters(stack_name, template, {'KeyName': 'test'})
+        stack = parser.Stack(None, stack_name, template, params,
+                             stack_id=uuidutils.generate_uuid())
+
+        t['Resources']['WebServer']['Properties']['ImageId'] = 'CentOS 5.2'
+        t['Resources']['WebServer']['Properties']['InstanceType'] = \
+            '256 MB Server'
+        instance = instances.Instance('create_instance_name',
+                                      t['Resources']['WebServer'], stack)
+
+        self.m.StubOutWithMock(instance, 'nova')
+        instance.nova().MultipleTimes().AndReturn(self.fc)
+
+        instance.t = instance.stack.resolve_runtime_data(instance.t)
+
+        # The image was deleted and re-uploaded since it was cached
+        clients.catalog_cache.clear()
+        images = self.fc.images.list()
+        self.m.StubOutWithMock(self.fc.images, 'list')
+
+        class StaleImage(object):
+            name = 'CentOS 5.2'
+            id = 99
+
+        self.fc.images.list().AndReturn([StaleImage()])
+        self.fc.images.list().AndReturn(images)
+
+        server_userdata = instance._build_userdata(
+            instance.t['Properties']['UserData'])
+        self.m.StubOutWithMock(self.fc.servers, 'create')
+        create_args = dict(flavor=1, key_name='test',
+                           name='%s.%s' % (stack_name, instance.name),
+                           security_groups=None,
+                           userdata=server_userdata, scheduler_hints=None,
+                           meta=None)
+        self.fc.servers.create(image=99, **create_args).AndRaise(
+            clients.novaclient.exceptions.BadRequest(400))
+        self.fc.servers.create(image=1, **create_args).AndReturn(
+            self.fc.servers.list()[1])
+        self.m.ReplayAll()
+
+        self.assertEqual(instance.create(), None)
+        self.m.VerifyAll()
+
+    def test_instance_create_poll_missing(self):
+        f = open("%s/WordPress_Single_Instance_gold.template" % self.path)
+        t = template_format.parse(f.read())
+        f.close()
+
+        stack_name = 'instance_create_poll_test_stack'
+        template = parser.Template(t)
+        params = parser.Parameters(stack_name, template, {'KeyName': 'test'})
+        stack = parser.Stack(None, stack_name, template, params,
+                             stack_id=uuidutils.generate_uuid())
+
+        t['Resources']['WebServer']['Properties']['ImageId'] = 'CentOS 5.2'
+        t['Resources']['WebServer']['Properties']['InstanceType'] = \
+            '256 MB Server'
+        instance = instances.Instance('create_instance_name',
+                                      t['Resources']['WebServer'], stack)
+
+        self.m.StubOutWithMock(instance, 'nova')
+        instance.nova().MultipleTimes().AndReturn(self.fc)
+
+        instance.t = instance.stack.resolve_runtime_data(instance.t)
+
+        server = self.fc.servers.list()[1]
+        server.status = 'BUILD'
+        statuses = ['BUILD', 'ACTIVE']
+
+        def get():
+            server.status = statuses.pop(0)
+
+        self.m.stubs.Set(server, 'get', get)
+
+        server_userdata = instance._build_userdata(
+            instance.t['Properties']['UserData'])
+        self.m.StubOutWithMock(self.fc.servers, 'create')
+        self.fc.servers.create(
+            image=1, flavor=1, key_name='test',
+            name='%s.%s' % (stack_name, instance.name),
+            security_groups=None,
+            userdata=server_userdata, scheduler_hints=None,
+            meta=None).AndReturn(server)
+
+        # The server is missing from the listing while it is being built
+        self.m.StubOutWithMock(instances.poller, 'wait')
+        instances.poller.wait('servers', None, self.fc.servers,
+                              server).AndReturn(None)
+        instances.poller.wait('servers', None, self.fc.servers,
+                              server).AndReturn(None)
+        self.m.ReplayAll()
+
+        self.assertEqual(instance.create(), None)
+        self.assertEqual(instance.state, instance.CREATE_COMPLETE)
+        self.assertEqual(statuses, [])
+        self.m.VerifyAll()
+
     def test_instance_create_delete(self):
         f = open("%s/WordPress_Single_Instance_gold.template" % self.path)
         t = template_format.parse(f.read())
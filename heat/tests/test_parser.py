@@ -20,9 +20,11 @@ import mox
 from heat.common import context
 from heat.common import exception
 from heat.common import template_format
+from heat.db import api as db_api
 from heat.engine import parser
 from heat.engine import parameters
 from heat.engine import template
+from heat.engine import resource
 from heat.engine.resource import Resource
 
 
@@ -285,6 +287,62 @@ class TemplateTest(unittest.TestCase):
         self.assertRaises(TypeError, parser.Template.resolve_base64,
                           dict_snippet)
 
+    def test_resolve_static(self):
+        tmpl = parser.Template(mapping_template)
+        params = {'foo': 'bar'}
+        find = {'Fn::FindInMap': ['ValidMapping', 'TestKey', 'TestValue']}
+        snippet = {'a': {'Fn::Join': [' ', [{'Ref': 'foo'}, find,
+                                            {'Ref': 'baz'}]]},
+                   'b': ['x', 'y']}
+        resolved = tmpl.resolve_static(snippet, params)
+        self.assertEqual(resolved['a'],
+                         {'Fn::Join': [' ', ['bar wibble', {'Ref': 'baz'}]]})
+        self.assertTrue(resolved['b'] is snippet['b'])
+        self.assertEqual(snippet['a']['Fn::Join'][1][0], {'Ref': 'foo'})
+
+    def test_resolve_runtime(self):
+        tmpl = parser.Template({})
+        resources = {'foo': self.m.CreateMock(Resource)}
+        resources['foo'].FnGetRefId().AndReturn('bar')
+        resources['foo'].FnGetAtt('Attr').AndReturn('baz')
+        self.m.ReplayAll()
+
+        snippet = {'Fn::Base64': {'Fn::Join': ['-', [
+            {'Ref': 'foo'}, {'Fn::GetAtt': ['foo', 'Attr']}]]}}
+        self.assertEqual(tmpl.resolve_runtime(snippet, resources), 'bar-baz')
+        self.m.VerifyAll()
+
+    def test_compile_cached(self):
+        tmpl = parser.Template({'Resources': {'r': {'a': {'Ref': 'foo'}}}})
+        snippet = tmpl['Resources']['r']
+        self.assertTrue(tmpl.compile(snippet) is tmpl.compile(snippet))
+        self.assertTrue(tmpl.compile(snippet['a']) is
+                        tmpl.compile(snippet['a']))
+
+    def test_compile_not_cached(self):
+        tmpl = parser.Template({})
+        snippet = {'a': {'Ref': 'foo'}}
+        self.assertFalse(tmpl.compile(snippet) is tmpl.compile(snippet))
+        self.assertEqual(tmpl._compiled.keys(), [id(tmpl.t)])
+
+    def test_resolve_extended_snippet(self):
+        tmpl = parser.Template({})
+        snippet = {'a': 'wibble'}
+        self.assertEqual(tmpl.resolve_static(snippet, {'foo': 'bar'}),
+                         {'a': 'wibble'})
+        snippet['b'] = {'Ref': 'foo'}
+        self.assertEqual(tmpl.resolve_static(snippet, {'foo': 'bar'}),
+                         {'a': 'wibble', 'b': 'bar'})
+
+    def test_resolve_modified_snippet(self):
+        tmpl = parser.Template({})
+        snippet = {'a': {'Ref': 'foo'}}
+        self.assertEqual(tmpl.resolve_static(snippet, {'foo': 'bar'}),
+                         {'a': 'bar'})
+        snippet['a'] = 'wibble'
+        self.assertEqual(tmpl.resolve_static(snippet, {'foo': 'bar'}),
+                         {'a': 'wibble'})
+
 
 @attr(tag=['unit', 'parser', 'stack'])
 @attr(speed='fast')
@@ -326,6 +384,25 @@ class StackTest(unittest.TestCase):
         self.assertRaises(exception.NotFound, parser.Stack.load,
                           None, -1)
 
+    def test_load_resources(self):
+        tmpl = {'Resources': {
+                'AResource': {'Type': 'GenericResourceType'},
+                'BResource': {'Type': 'GenericResourceType'}}}
+        stack = parser.Stack(self.ctx, 'load_resources_test',
+                             parser.Template(tmpl))
+        stack.store()
+        stack.create()
+        self.assertEqual(stack.state, stack.CREATE_COMPLETE)
+
+        self.m.StubOutWithMock(db_api, 'resource_get_by_name_and_stack')
+        self.m.ReplayAll()
+
+        loaded = parser.Stack.load(self.ctx, stack_id=stack.id)
+        for name in ('AResource', 'BResource'):
+            self.assertEqual(loaded[name].id, stack[name].id)
+            self.assertEqual(loaded[name].state, loaded[name].CREATE_COMPLETE)
+        self.m.VerifyAll()
+
     def test_identifier(self):
         stack = parser.Stack(self.ctx, 'identifier_test',
                              parser.Template({}))
@@ -352,3 +429,135 @@ class StackTest(unittest.TestCase):
         stack.state_set(stack.CREATE_IN_PROGRESS, 'testing')
         self.assertNotEqual(stack.updated_time, None)
         self.assertNotEqual(stack.updated_time, stored_time)
+
+    def test_create_failure_aborts_dependents(self):
+        tmpl = {'Resources': {
+                'AResource': {'Type': 'GenericResourceType'},
+                'BResource': {'Type': 'GenericResourceType',
+                              'DependsOn': 'AResource'}}}
+
+        self.m.StubOutWithMock(resource.GenericResource, 'handle_create')
+        resource.GenericResource.handle_create().AndRaise(Exception('oops'))
+        self.m.ReplayAll()
+
+        stack = parser.Stack(self.ctx, 'create_abort_test',
+                             parser.Template(tmpl))
+        stack.store()
+        stack.create()
+
+        self.assertEqual(stack.state, stack.CREATE_FAILED)
+        self.assertEqual(stack.state_description,
+                         'Resource GenericResource "AResource" failed with: '
+                         'oops')
+        self.assertEqual(stack['AResource'].state,
+                         stack['AResource'].CREATE_FAILED)
+        self.assertEqual(stack['BResource'].state,
+                         stack['BResource'].CREATE_FAILED)
+        self.assertEqual(stack['BResource'].state_description,
+                         'Stack creation aborted')
+        self.m.VerifyAll()
+
+    def test_create_writes_batched(self):
+        tmpl = {'Resources': {
+                'AResource': {'Type': 'GenericResourceType'},
+                'BResource': {'Type': 'GenericResourceType'}}}
+
+        saves = []
+        stack_changes_save = db_api.stack_changes_save
+
+        def save(context, stack_id, resources, events, updated_at=None):
+            saves.append([e['name'] for e in events])
+            return stack_changes_save(context, stack_id, resources, events,
+                                      updated_at)
+
+        self.m.stubs.Set(db_api, 'stack_changes_save', save)
+
+        stack = parser.Stack(self.ctx, 'create_batch_test',
+                             parser.Template(tmpl))
+        stack.store()
+        stack.create()
+        self.assertEqual(stack.state, stack.CREATE_COMPLETE)
+        self.assertEqual(stack.write_buffer, None)
+
+        states = [Resource.CREATE_IN_PROGRESS, Resource.CREATE_COMPLETE]
+        self.assertEqual(saves, [states + states])
+
+        loaded = parser.Stack.load(self.ctx, stack_id=stack.id)
+        for name in ('AResource', 'BResource'):
+            self.assertEqual(loaded[name].state, loaded[name].CREATE_COMPLETE)
+
+            events = [e.name for e in db_api.event_get_all_by_stack(
+                self.ctx, stack.id, resource_name=name)]
+            self.assertEqual(events, states)
+
+    def _create_batch_failing(self, fail):
+        tmpl = {'Resources': {
+                'AResource': {'Type': 'GenericResourceType'},
+                'BResource': {'Type': 'GenericResourceType'}}}
+
+        saves = []
+        stack_changes_save = db_api.stack_changes_save
+
+        def save(context, stack_id, resources, events, updated_at=None):
+            saves.append(len(resources) + len(events))
+            if fail(saves):
+                raise Exception('DB unavailable')
+            return stack_changes_save(context, stack_id, resources, events,
+                                      updated_at)
+
+        self.m.stubs.Set(db_api, 'stack_changes_save', save)
+
+        stack = parser.Stack(self.ctx, 'create_batch_failed_test',
+                             parser.Template(tmpl))
+        stack.store()
+        stack.create()
+        self.assertEqual(stack.state, stack.CREATE_COMPLETE)
+        self.assertEqual(stack.write_buffer, None)
+
+        states = [Resource.CREATE_IN_PROGRESS, Resource.CREATE_COMPLETE]
+        loaded = parser.Stack.load(self.ctx, stack_id=stack.id)
+        for name in ('AResource', 'BResource'):
+            self.assertEqual(loaded[name].state, loaded[name].CREATE_COMPLETE)
+
+            events = [e.name for e in db_api.event_get_all_by_stack(
+                self.ctx, stack.id, resource_name=name)]
+            self.assertEqual(events, states)
+        return saves
+
+    def test_create_writes_batch_retried(self):
+        saves = self._create_batch_failing(lambda saves: len(saves) == 1)
+        self.assertEqual(saves, [6, 6])
+
+    def test_create_writes_batch_failed(self):
+        saves = self._create_batch_failing(lambda saves: saves[-1] > 1)
+        # The batch kept failing, so each change was written on its own
+        self.assertEqual(saves, [6, 6] + [1] * 6 + [0])
+
+    def test_delete_failure_continues(self):
+        tmpl = {'Resources': {
+                'AResource': {'Type': 'GenericResourceType'},
+                'BResource': {'Type': 'GenericResourceType',
+                              'DependsOn': 'AResource'},
+                'CResource': {'Type': 'GenericResourceType'}}}
+
+        stack = parser.Stack(self.ctx, 'delete_failure_test',
+                             parser.Template(tmpl))
+        stack.store()
+        stack.create()
+        self.assertEqual(stack.state, stack.CREATE_COMPLETE)
+
+        self.m.StubOutWithMock(stack['BResource'], 'delete')
+        stack['BResource'].delete().AndReturn('oops')
+        self.m.ReplayAll()
+
+        stack.delete()
+
+        self.assertEqual(stack.state, stack.DELETE_FAILED)
+        self.assertEqual(stack.state_description,
+                         'Failed to delete GenericResource "BResource"')
+        self.assertEqual(stack['AResource'].state,
+                         stack['AResource'].DELETE_COMPLETE)
+        self.assertEqual(stack['AResource'].id, None)
+        self.assertEqual(stack['CResource'].state,
+                         stack['CResource'].DELETE_COMPLETE)
+        self.m.VerifyAll()
@@ -0,0 +1,91 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import eventlet
+import mox
+import unittest
+from nose.plugins.attrib import attr
+
+from heat.engine import poller
+
+
+class FakeObject(object):
+    def __init__(self, obj_id, status):
+        self.id = obj_id
+        self.status = status
+
+
+@attr(tag=['unit', 'poller'])
+@attr(speed='fast')
+class StatusPollerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.m = mox.Mox()
+        self.m.StubOutWithMock(eventlet, 'sleep')
+        self.manager = self.m.CreateMockAnything()
+
+    def tearDown(self):
+        self.m.UnsetStubs()
+
+    def test_backoff(self):
+        building = [FakeObject('a', 'BUILD')]
+        eventlet.sleep(1).AndReturn(None)
+        self.manager.list().AndReturn(building)
+        eventlet.sleep(2).AndReturn(None)
+        self.manager.list().AndReturn(building)
+        eventlet.sleep(4).AndReturn(None)
+        self.manager.list().AndReturn([FakeObject('a', 'ACTIVE')])
+        self.m.ReplayAll()
+
+        p = poller.StatusPoller(self.manager.list)
+        self.assertEqual(p.wait('a', 'BUILD'), 'ACTIVE')
+        self.assertEqual(len(p), 0)
+
+        self.m.VerifyAll()
+
+    def test_shared_poll(self):
+        eventlet.sleep(1).AndReturn(None)
+        self.manager.list().AndReturn([FakeObject('a', 'ACTIVE'),
+                                       FakeObject('b', 'ERROR')])
+        self.m.ReplayAll()
+
+        p = poller.StatusPoller(self.manager.list)
+        waits = [eventlet.spawn(p.wait, obj_id, 'BUILD')
+                 for obj_id in ('a', 'b', 'c')]
+        self.assertEqual([w.wait() for w in waits], ['ACTIVE', 'ERROR', None])
+
+        self.m.VerifyAll()
+
+    def test_poll_error(self):
+        eventlet.sleep(1).AndReturn(None)
+        self.manager.list().AndRaise(ValueError('boom'))
+        self.m.ReplayAll()
+
+        p = poller.StatusPoller(self.manager.list)
+        self.assertRaises(ValueError, p.wait, 'a', 'BUILD')
+        self.assertEqual(len(p), 0)
+
+        self.m.VerifyAll()
+
+    def test_registry(self):
+        eventlet.sleep(1).AndReturn(None)
+        self.manager.list().AndReturn([])
+        self.m.ReplayAll()
+
+        self.assertEqual(poller.wait('servers', None, self.manager,
+                                     FakeObject('a', 'ACTIVE')), None)
+        self.assertFalse(('servers', None) in poller._pollers)
+
+        self.m.VerifyAll()
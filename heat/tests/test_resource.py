@@ -18,8 +18,10 @@ from nose.plugins.attrib import attr
 import mox
 
 from heat.common import context
+from heat.db import api as db_api
 from heat.engine import parser
 from heat.engine import resource
+from heat.engine import rowcache
 from heat.openstack.common import uuidutils
 
 
@@ -145,3 +147,30 @@ class MetadataTest(unittest.TestCase):
         test_data = {'Test': 'Newly-written data'}
         self.res.metadata = test_data
         self.assertEqual(self.res.metadata, test_data)
+
+    def test_read_cached(self):
+        resource_get = db_api.resource_get
+        fetched = []
+
+        def fetch(context, resource_id):
+            fetched.append(resource_id)
+            return resource_get(context, resource_id)
+
+        self.m.stubs.Set(db_api, 'resource_get', fetch)
+        res = resource.GenericResource('metadata_resource',
+                                       self.res.t, self.stack)
+
+        with rowcache.scope():
+            self.assertEqual(res.metadata, {'Test': 'Initial metadata'})
+            self.assertNotEqual(res.created_time, None)
+            self.assertEqual(res.metadata, {'Test': 'Initial metadata'})
+            self.assertEqual(len(fetched), 1)
+
+            test_data = {'Test': 'Newly-written data'}
+            res.metadata = test_data
+            self.assertEqual(res.metadata, test_data)
+            self.assertEqual(res.metadata, test_data)
+            self.assertEqual(len(fetched), 3)
+
+        self.assertEqual(res.metadata, test_data)
+        self.assertEqual(len(fetched), 4)
@@ -88,6 +88,12 @@ class EngineRpcAPITestCase(unittest.TestCase):
         for arg, expected_arg in zip(self.fake_args, expected_args):
             self.assertEqual(arg, expected_arg)
 
+    def test_list_stacks(self):
+        self._test_engine_api('list_stacks', 'call')
+
+    def test_list_stacks_page(self):
+        self._test_engine_api('list_stacks', 'call', limit=10, marker='6')
+
     def test_show_stack(self):
         self._test_engine_api('show_stack', 'call', stack_identity='wordpress')
 
@@ -124,6 +130,12 @@ class EngineRpcAPITestCase(unittest.TestCase):
         self._test_engine_api('list_events', 'call',
                               stack_identity=self.identity)
 
+    def test_list_events_filtered(self):
+        self._test_engine_api('list_events', 'call',
+                              stack_identity=self.identity,
+                              limit=10, marker='5',
+                              resource_name='LogicalResourceId')
+
     def test_describe_stack_resource(self):
         self._test_engine_api('describe_stack_resource', 'call',
                               stack_identity=self.identity,
@@ -153,6 +165,11 @@ class EngineRpcAPITestCase(unittest.TestCase):
                               watch_name='watch1',
                               stats_data={})
 
+    def test_create_watch_data_batch(self):
+        self._test_engine_api('create_watch_data_batch', 'call',
+                              watch_data=[{'watch_name': 'watch1',
+                                           'stats_data': {}}])
+
     def test_show_watch(self):
         self._test_engine_api('show_watch', 'call',
                               watch_name='watch1')
@@ -161,6 +178,14 @@ class EngineRpcAPITestCase(unittest.TestCase):
         self._test_engine_api('show_watch_metric', 'call',
                               namespace=None, metric_name=None)
 
+    def test_list_watch_metrics(self):
+        self._test_engine_api('list_watch_metrics', 'call',
+                              namespace=None, metric_name=None)
+        self._test_engine_api('list_watch_metrics', 'call',
+                              namespace='system/linux',
+                              metric_name='ServiceFailure',
+                              limit=10, marker=5)
+
     def test_set_watch_state(self):
         self._test_engine_api('set_watch_state', 'call',
                               watch_name='watch1', state="xyz")
@@ -0,0 +1,130 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import eventlet
+import unittest
+from nose.plugins.attrib import attr
+
+from heat.engine import dependencies
+from heat.engine import scheduler
+
+
+class RecordingTask(object):
+    '''A task that records the order of starts and completions.'''
+
+    def __init__(self, failures={}):
+        self.failures = failures
+        self.started = []
+        self.finished = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __call__(self, key):
+        self.started.append(key)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        eventlet.sleep(0)
+        self.in_flight -= 1
+        self.finished.append(key)
+        return self.failures.get(key)
+
+
+@attr(tag=['unit', 'scheduler'])
+@attr(speed='fast')
+class DependencyTaskGroupTest(unittest.TestCase):
+
+    def _deps(self):
+        return dependencies.Dependencies([('mid1', 'first'),
+                                          ('mid2', 'first'),
+                                          ('mid3', 'first'),
+                                          ('last', 'mid1'),
+                                          ('last', 'mid2'),
+                                          ('last', 'mid3')])
+
+    def test_order(self):
+        task = RecordingTask()
+        failures = scheduler.DependencyTaskGroup(self._deps(), task)()
+
+        self.assertEqual(failures, [])
+        self.assertEqual(task.finished[0], 'first')
+        self.assertEqual(task.finished[-1], 'last')
+        self.assertEqual(task.started[-1], 'last')
+        self.assertEqual(len(task.finished), 5)
+
+    def test_reverse_order(self):
+        task = RecordingTask()
+        failures = scheduler.DependencyTaskGroup(self._deps(), task,
+                                                 reverse=True)()
+
+        self.assertEqual(failures, [])
+        self.assertEqual(task.finished[0], 'last')
+        self.assertEqual(task.finished[-1], 'first')
+        self.assertEqual(task.started[-1], 'first')
+
+    def test_concurrent(self):
+        task = RecordingTask()
+        scheduler.DependencyTaskGroup(self._deps(), task)()
+        self.assertEqual(task.max_in_flight, 3)
+
+    def test_max_concurrent(self):
+        task = RecordingTask()
+        scheduler.DependencyTaskGroup(self._deps(), task,
+                                      max_concurrent=2)()
+        self.assertEqual(task.max_in_flight, 2)
+        self.assertEqual(len(task.finished), 5)
+
+    def test_stop_on_failure(self):
+        task = RecordingTask({'mid2': 'broken'})
+        group = scheduler.DependencyTaskGroup(self._deps(), task)
+        failures = group()
+
+        self.assertEqual(failures, [('mid2', 'broken')])
+        self.assertEqual(group.pending, ['last'])
+        self.assertFalse('last' in task.started)
+
+    def test_continue_on_failure(self):
+        task = RecordingTask({'mid2': 'broken'})
+        group = scheduler.DependencyTaskGroup(self._deps(), task,
+                                              stop_on_failure=False)
+        failures = group()
+
+        self.assertEqual(failures, [('mid2', 'broken')])
+        self.assertEqual(group.pending, [])
+        self.assertEqual(task.finished[-1], 'last')
+
+    def test_exception(self):
+        def task(key):
+            if key == 'first':
+                raise ValueError('oops')
+
+        group = scheduler.DependencyTaskGroup(self._deps(), task)
+        self.assertEqual(group(), [('first', 'oops')])
+        self.assertEqual(len(group.pending), 4)
+
+    def test_timeout_cancels(self):
+        def task(key):
+            eventlet.sleep(10)
+
+        group = scheduler.DependencyTaskGroup(self._deps(), task)
+        with eventlet.Timeout(0.01) as tmo:
+            try:
+                group()
+            except eventlet.Timeout as t:
+                self.assertTrue(t is tmo)
+            else:
+                self.fail('Expected timeout')
+
+        self.assertEqual(group.cancelled, ['first'])
+        self.assertEqual(group.running, {})
@@ -0,0 +1,90 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import mox
+import unittest
+from nose.plugins.attrib import attr
+
+from heat.engine import clients
+from heat.engine import parser
+from heat.engine.resources import security_group
+from heat.openstack.common import uuidutils
+
+
+sg_template = {
+    'Resources': {
+        'the_sg': {
+            'Type': 'AWS::EC2::SecurityGroup',
+            'Properties': {'GroupDescription': 'HTTP access'}
+        }
+    }
+}
+
+
+class FakeGroup(object):
+    def __init__(self, group_id, name):
+        self.id = group_id
+        self.name = name
+
+
+@attr(tag=['unit', 'resource', 'securitygroup'])
+@attr(speed='fast')
+class SecurityGroupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.m = mox.Mox()
+        self.nova = self.m.CreateMockAnything()
+        self.nova.security_groups = self.m.CreateMockAnything()
+        clients.catalog_cache.clear()
+
+    def tearDown(self):
+        self.m.UnsetStubs()
+        clients.catalog_cache.clear()
+
+    def create_security_group(self):
+        stack = parser.Stack(None, 'sg_test_stack',
+                             parser.Template(sg_template),
+                             stack_id=uuidutils.generate_uuid())
+        sg = security_group.SecurityGroup('the_sg',
+                                          sg_template['Resources']['the_sg'],
+                                          stack)
+        self.m.StubOutWithMock(sg, 'nova')
+        sg.nova().MultipleTimes().AndReturn(self.nova)
+        return sg
+
+    def test_create_cached_group_deleted(self):
+        sg = self.create_security_group()
+        groups = self.nova.security_groups
+        groups.list().AndReturn([FakeGroup('1', 'the_sg')])
+        groups.get('1').AndRaise(clients.novaclient.exceptions.NotFound(404))
+        groups.list().AndReturn([])
+        groups.create(sg.physical_resource_name(),
+                      'HTTP access').AndReturn(FakeGroup('2', 'the_sg'))
+        self.m.ReplayAll()
+
+        self.assertEqual(sg.create(), None)
+        self.assertEqual(sg.resource_id, '2')
+        self.m.VerifyAll()
+
+    def test_create_cached_group_exists(self):
+        sg = self.create_security_group()
+        groups = self.nova.security_groups
+        groups.list().AndReturn([FakeGroup('1', 'the_sg')])
+        groups.get('1').AndReturn(FakeGroup('1', 'the_sg'))
+        self.m.ReplayAll()
+
+        self.assertEqual(sg.create(), None)
+        self.assertEqual(sg.resource_id, '1')
+        self.m.VerifyAll()
@@ -0,0 +1,82 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import datetime
+import unittest
+from nose.plugins.attrib import attr
+
+from heat.engine import statistics
+
+
+@attr(tag=['unit', 'statistics'])
+@attr(speed='fast')
+class StatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime.datetime(2013, 1, 1, 12, 0, 0)
+
+    def _series(self, samples):
+        return statistics.Series((self.now - datetime.timedelta(seconds=age),
+                                  value) for value, age in samples)
+
+    def test_series_sorted(self):
+        series = self._series([(3, 10), (None, 15), (1, 30), ('2', 20)])
+        self.assertEqual(len(series), 3)
+        self.assertEqual(list(series.values), [1.0, 2.0, 3.0])
+
+    def test_series_add_expire(self):
+        series = self._series([(1, 30), (3, 10)])
+        series.add(self.now - datetime.timedelta(seconds=20), 2)
+        series.add(self.now, None)
+        self.assertEqual(list(series.values), [1.0, 2.0, 3.0])
+
+        series.expire(self.now - datetime.timedelta(seconds=20))
+        self.assertEqual(list(series.values), [2.0, 3.0])
+
+    def test_periods(self):
+        series = self._series([(1, 250), (2, 150), (3, 120),
+                               (4, 50), (5, 0), (6, -10)])
+        periods = series.periods(self.now, 100, 3)
+
+        self.assertEqual([list(p.values) for p in periods],
+                         [[1.0], [2.0, 3.0], [4.0, 5.0, 6.0]])
+        self.assertEqual([p.get(statistics.SUM) for p in periods],
+                         [1.0, 5.0, 15.0])
+
+    def test_period_statistics(self):
+        period = statistics.PeriodStatistics(range(100, 0, -1))
+
+        self.assertEqual(period.get('SampleCount'), 100)
+        self.assertEqual(period.get('Sum'), 5050)
+        self.assertEqual(period.get('Average'), 50.5)
+        self.assertEqual(period.get('Minimum'), 1)
+        self.assertEqual(period.get('Maximum'), 100)
+        self.assertEqual(period.get('p50'), 50)
+        self.assertEqual(period.get('p90'), 90)
+        self.assertEqual(period.get('p99'), 99)
+        self.assertEqual(period.get('p99.5'), 100)
+
+    def test_period_statistics_empty(self):
+        period = statistics.PeriodStatistics([])
+
+        self.assertEqual(period.get('SampleCount'), 0)
+        self.assertEqual(period.get('Sum'), 0)
+        for statistic in ('Average', 'Minimum', 'Maximum', 'p90'):
+            self.assertEqual(period.get(statistic), None)
+
+    def test_unknown_statistic(self):
+        period = statistics.PeriodStatistics([1.0])
+        self.assertRaises(ValueError, period.get, 'Median')
+        self.assertRaises(ValueError, period.get, 'p101')
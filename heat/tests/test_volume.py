@@ -38,6 +38,7 @@ class VolumeTest(unittest.TestCase):
         self.m.StubOutWithMock(vol.VolumeAttachment, 'nova')
         self.m.StubOutWithMock(self.fc.volumes, 'create')
         self.m.StubOutWithMock(self.fc.volumes, 'get')
+        self.m.StubOutWithMock(self.fc.volumes, 'list')
         self.m.StubOutWithMock(self.fc.volumes, 'delete')
         self.m.StubOutWithMock(self.fc.volumes, 'create_server_volume')
         self.m.StubOutWithMock(self.fc.volumes, 'delete_server_volume')
@@ -94,10 +95,11 @@ class VolumeTest(unittest.TestCase):
         self.fc.volumes.create(
             u'1', display_description='%s.DataVolume' % stack_name,
             display_name='%s.DataVolume' % stack_name).AndReturn(fv)
+        eventlet.sleep(1).AndReturn(None)
+        self.fc.volumes.list().AndReturn([FakeVolume('available')])
 
         # delete script
         self.fc.volumes.get('vol-123').AndReturn(fv)
-        eventlet.sleep(1).AndReturn(None)
 
         self.fc.volumes.get('vol-123').AndReturn(fv)
         self.fc.volumes.delete('vol-123').AndReturn(None)
@@ -124,12 +126,13 @@ class VolumeTest(unittest.TestCase):
         stack_name = 'test_volume_create_error_stack'
 
         # create script
-        vol.Volume.nova('volume').AndReturn(self.fc)
+        vol.Volume.nova('volume').MultipleTimes().AndReturn(self.fc)
         self.fc.volumes.create(
             u'1', display_description='%s.DataVolume' % stack_name,
             display_name='%s.DataVolume' % stack_name).AndReturn(fv)
 
         eventlet.sleep(1).AndReturn(None)
+        self.fc.volumes.list().AndReturn([FakeVolume('error')])
 
         self.m.ReplayAll()
 
@@ -153,17 +156,20 @@ class VolumeTest(unittest.TestCase):
         self.fc.volumes.create(
             u'1', display_description='%s.DataVolume' % stack_name,
             display_name='%s.DataVolume' % stack_name).AndReturn(fv)
+        eventlet.sleep(1).AndReturn(None)
+        self.fc.volumes.list().AndReturn([FakeVolume('available')])
 
         # create script
         vol.VolumeAttachment.nova().MultipleTimes().AndReturn(self.fc)
         vol.VolumeAttachment.nova('volume').MultipleTimes().AndReturn(self.fc)
-        eventlet.sleep(1).MultipleTimes().AndReturn(None)
         self.fc.volumes.create_server_volume(
             device=u'/dev/vdc',
             server_id=u'WikiDatabase',
             volume_id=u'vol-123').AndReturn(fva)
 
         self.fc.volumes.get('vol-123').AndReturn(fva)
+        eventlet.sleep(1).AndReturn(None)
+        self.fc.volumes.list().AndReturn([FakeVolume('error')])
 
         self.m.ReplayAll()
 
@@ -189,23 +195,29 @@ class VolumeTest(unittest.TestCase):
         self.fc.volumes.create(
             u'1', display_description='%s.DataVolume' % stack_name,
             display_name='%s.DataVolume' % stack_name).AndReturn(fv)
+        eventlet.sleep(1).AndReturn(None)
+        self.fc.volumes.list().AndReturn([FakeVolume('available')])
 
         # create script
         vol.VolumeAttachment.nova().MultipleTimes().AndReturn(self.fc)
         vol.VolumeAttachment.nova('volume').MultipleTimes().AndReturn(self.fc)
-        eventlet.sleep(1).MultipleTimes().AndReturn(None)
         self.fc.volumes.create_server_volume(
             device=u'/dev/vdc',
             server_id=u'WikiDatabase',
             volume_id=u'vol-123').AndReturn(fva)
 
         self.fc.volumes.get('vol-123').AndReturn(fva)
+        eventlet.sleep(1).AndReturn(None)
+        self.fc.volumes.list().AndReturn([FakeVolume('in-use')])
 
         # delete script
         fva = FakeVolume('in-use', 'available')
         self.fc.volumes.delete_server_volume('WikiDatabase',
                                              'vol-123').AndReturn(None)
         self.fc.volumes.get('vol-123').AndReturn(fva)
+        eventlet.sleep(1).AndReturn(None)
+        self.fc.volumes.delete_server_volume('WikiDatabase',
+                                             'vol-123').AndReturn(None)
 
         self.m.ReplayAll()
 
@@ -227,7 +239,7 @@ class FakeVolume:
     status = 'attaching'
     id = 'vol-123'
 
-    def __init__(self, initial_status, final_status):
+    def __init__(self, initial_status, final_status=None):
         self.status = initial_status
         self.final_status = final_status
 
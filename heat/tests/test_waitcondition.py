@@ -13,6 +13,7 @@
 #    under the License.
 
 
+import datetime
 import mox
 import uuid
 import time
@@ -29,6 +30,7 @@ from heat.engine import parser
 from heat.engine.resources import wait_condition as wc
 from heat.common import context
 from heat.openstack.common import cfg
+from heat.openstack.common import timeutils
 
 test_template_waitcondition = '''
 {
@@ -81,7 +83,7 @@ class WaitConditionTest(unittest.TestCase):
                                'get_status')
         self.m.StubOutWithMock(wc.WaitCondition,
                                '_create_timeout')
-        self.m.StubOutWithMock(eventlet, 'sleep')
+        self.m.StubOutWithMock(wc.SignalListener, 'wait')
 
         cfg.CONF.set_default('heat_waitcondition_server_url',
                              'http://127.0.0.1:8000/v1/waitcondition')
@@ -117,9 +119,9 @@ class WaitConditionTest(unittest.TestCase):
         self.stack = self.create_stack()
         wc.WaitCondition._create_timeout().AndReturn(eventlet.Timeout(5))
         wc.WaitConditionHandle.get_status().AndReturn([])
-        eventlet.sleep(1).AndReturn(None)
+        wc.SignalListener.wait(5).AndReturn(None)
         wc.WaitConditionHandle.get_status().AndReturn([])
-        eventlet.sleep(1).AndReturn(None)
+        wc.SignalListener.wait(5).AndReturn(None)
         wc.WaitConditionHandle.get_status().AndReturn(['SUCCESS'])
 
         self.m.ReplayAll()
@@ -138,9 +140,9 @@ class WaitConditionTest(unittest.TestCase):
         self.stack = self.create_stack()
         wc.WaitCondition._create_timeout().AndReturn(eventlet.Timeout(5))
         wc.WaitConditionHandle.get_status().AndReturn([])
-        eventlet.sleep(1).AndReturn(None)
+        wc.SignalListener.wait(5).AndReturn(None)
         wc.WaitConditionHandle.get_status().AndReturn([])
-        eventlet.sleep(1).AndReturn(None)
+        wc.SignalListener.wait(5).AndReturn(None)
         wc.WaitConditionHandle.get_status().AndReturn(['FAILURE'])
 
         self.m.ReplayAll()
@@ -159,11 +161,11 @@ class WaitConditionTest(unittest.TestCase):
         self.stack = self.create_stack(template=test_template_wc_count)
         wc.WaitCondition._create_timeout().AndReturn(eventlet.Timeout(5))
         wc.WaitConditionHandle.get_status().AndReturn([])
-        eventlet.sleep(1).AndReturn(None)
+        wc.SignalListener.wait(5).AndReturn(None)
         wc.WaitConditionHandle.get_status().AndReturn(['SUCCESS'])
-        eventlet.sleep(1).AndReturn(None)
+        wc.SignalListener.wait(5).AndReturn(None)
         wc.WaitConditionHandle.get_status().AndReturn(['SUCCESS', 'SUCCESS'])
-        eventlet.sleep(1).AndReturn(None)
+        wc.SignalListener.wait(5).AndReturn(None)
         wc.WaitConditionHandle.get_status().AndReturn(['SUCCESS', 'SUCCESS',
                                                        'SUCCESS'])
 
@@ -183,9 +185,9 @@ class WaitConditionTest(unittest.TestCase):
         self.stack = self.create_stack(template=test_template_wc_count)
         wc.WaitCondition._create_timeout().AndReturn(eventlet.Timeout(5))
         wc.WaitConditionHandle.get_status().AndReturn([])
-        eventlet.sleep(1).AndReturn(None)
+        wc.SignalListener.wait(5).AndReturn(None)
         wc.WaitConditionHandle.get_status().AndReturn(['SUCCESS'])
-        eventlet.sleep(1).AndReturn(None)
+        wc.SignalListener.wait(5).AndReturn(None)
         wc.WaitConditionHandle.get_status().AndReturn(['SUCCESS', 'FAILURE'])
 
         self.m.ReplayAll()
@@ -205,9 +207,9 @@ class WaitConditionTest(unittest.TestCase):
         tmo = eventlet.Timeout(6)
         wc.WaitCondition._create_timeout().AndReturn(tmo)
         wc.WaitConditionHandle.get_status().AndReturn([])
-        eventlet.sleep(1).AndReturn(None)
+        wc.SignalListener.wait(5).AndReturn(None)
         wc.WaitConditionHandle.get_status().AndReturn([])
-        eventlet.sleep(1).AndRaise(tmo)
+        wc.SignalListener.wait(5).AndRaise(tmo)
 
         self.m.ReplayAll()
 
@@ -265,6 +267,9 @@ class WaitConditionHandleTest(unittest.TestCase):
         self.stack.delete()
         self.m.VerifyAll()
         self.m.UnsetStubs()
+        wc.WaitConditionHandle._signed_urls.clear()
+        timeutils.clear_time_override()
+        cfg.CONF.clear_override('heat_waitcondition_url_lifetime')
 
     def create_stack(self, stack_name='test_stack2', params={}):
         temp = template_format.parse(test_template_waitcondition)
@@ -305,6 +310,9 @@ class WaitConditionHandleTest(unittest.TestCase):
         time.gmtime().MultipleTimes().AndReturn(t)
         self.m.ReplayAll()
 
+        # Discard the URL signed while creating the stack
+        wc.WaitConditionHandle._signed_urls.clear()
+
         resource = self.stack.resources['WaitHandle']
         self.assertEqual(resource.state, 'CREATE_COMPLETE')
 
@@ -324,6 +332,23 @@ class WaitConditionHandleTest(unittest.TestCase):
 
         self.assertEqual(resource.UPDATE_REPLACE, resource.handle_update())
 
+    def test_handle_url_cached(self):
+        timeutils.set_time_override(datetime.datetime(2013, 1, 1))
+        cfg.CONF.set_override('heat_waitcondition_url_lifetime', 60)
+        wc.WaitConditionHandle._signed_urls.clear()
+        resource = self.stack.resources['WaitHandle']
+
+        self.m.StubOutWithMock(resource, '_sign_url')
+        resource._sign_url(self.fc.creds, mox.IgnoreArg()).AndReturn('url1')
+        resource._sign_url(self.fc.creds, mox.IgnoreArg()).AndReturn('url2')
+        self.m.ReplayAll()
+
+        self.assertEqual(resource.FnGetRefId(), u'url1')
+        timeutils.advance_time_seconds(59)
+        self.assertEqual(resource.FnGetRefId(), u'url1')
+        timeutils.advance_time_seconds(1)
+        self.assertEqual(resource.FnGetRefId(), u'url2')
+
     def test_metadata_update(self):
         resource = self.stack.resources['WaitHandle']
         self.assertEqual(resource.state, 'CREATE_COMPLETE')
@@ -336,6 +361,27 @@ class WaitConditionHandleTest(unittest.TestCase):
                                     u'Status': u'SUCCESS'}}
         self.assertEqual(resource.metadata, handle_metadata)
 
+    def test_metadata_update_notifies(self):
+        resource = self.stack.resources['WaitHandle']
+        test_metadata = {'Data': 'foo', 'Reason': 'bar',
+                         'Status': 'SUCCESS', 'UniqueId': '123'}
+
+        with wc.SignalListener(resource.id) as listener:
+            waiter = eventlet.spawn(listener.wait, 60)
+            eventlet.sleep(0)
+            self.assertFalse(waiter.dead)
+
+            resource.metadata_update(test_metadata)
+            with eventlet.Timeout(1):
+                waiter.wait()
+
+            # a signal received before waiting is not missed
+            resource.metadata_update(test_metadata)
+            with eventlet.Timeout(1):
+                listener.wait(60)
+
+        self.assertFalse(resource.id in wc.SignalListener._listeners)
+
     def test_metadata_update_invalid(self):
         resource = self.stack.resources['WaitHandle']
         self.assertEqual(resource.state, 'CREATE_COMPLETE')
@@ -380,11 +426,6 @@ class WaitConditionHandleTest(unittest.TestCase):
         self.m.StubOutWithMock(wc.WaitConditionHandle, 'keystone')
         wc.WaitConditionHandle.keystone().MultipleTimes().AndReturn(self.fc)
 
-        id = identifier.ResourceIdentifier('test_tenant', self.stack.name,
-                                           self.stack.id, '', 'WaitHandle')
-        self.m.StubOutWithMock(wc.WaitConditionHandle, 'identifier')
-        wc.WaitConditionHandle.identifier().MultipleTimes().AndReturn(id)
-
         self.m.ReplayAll()
 
         self.assertEqual(resource.get_status(), [])
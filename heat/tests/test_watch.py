@@ -276,6 +276,91 @@ class WatchRuleTest(unittest.TestCase):
         new_state = watcher.get_alarm_state()
         self.assertEqual(new_state, 'ALARM')
 
+    def test_percentile(self):
+        rule = {'EvaluationPeriods': '1',
+                'MetricName': 'test_metric',
+                'Period': '300',
+                'Statistic': 'p90',
+                'ComparisonOperator': 'GreaterThanThreshold',
+                'Threshold': '100'}
+
+        now = timeutils.utcnow()
+        last = now - datetime.timedelta(seconds=320)
+        data = [WatchData(v, now - datetime.timedelta(seconds=10 * i))
+                for i, v in enumerate([500] + [10] * 9)]
+
+        # only one sample in ten is high -> NORMAL
+        watcher = watchrule.WatchRule(context=self.ctx,
+                                      watch_name="testwatch",
+                                      rule=rule,
+                                      watch_data=data,
+                                      stack_id=self.stack_id,
+                                      last_evaluated=last)
+        watcher.now = now
+        new_state = watcher.get_alarm_state()
+        self.assertEqual(new_state, 'NORMAL')
+
+        data.append(WatchData(200, now - datetime.timedelta(seconds=200)))
+        watcher = watchrule.WatchRule(context=self.ctx,
+                                      watch_name="testwatch",
+                                      rule=rule,
+                                      watch_data=data,
+                                      stack_id=self.stack_id,
+                                      last_evaluated=last)
+        watcher.now = now
+        new_state = watcher.get_alarm_state()
+        self.assertEqual(new_state, 'ALARM')
+
+    def test_evaluation_periods(self):
+        rule = {'EvaluationPeriods': '3',
+                'MetricName': 'test_metric',
+                'Period': '100',
+                'Statistic': 'Maximum',
+                'ComparisonOperator': 'GreaterThanThreshold',
+                'Threshold': '50'}
+
+        now = timeutils.utcnow()
+        last = now - datetime.timedelta(seconds=120)
+        data = [WatchData(77, now - datetime.timedelta(seconds=50)),
+                WatchData(10, now - datetime.timedelta(seconds=150)),
+                WatchData(60, now - datetime.timedelta(seconds=250))]
+
+        # breach in only two of the three periods -> NORMAL
+        watcher = watchrule.WatchRule(context=self.ctx,
+                                      watch_name="testwatch",
+                                      rule=rule,
+                                      watch_data=data,
+                                      stack_id=self.stack_id,
+                                      last_evaluated=last)
+        watcher.now = now
+        new_state = watcher.get_alarm_state()
+        self.assertEqual(new_state, 'NORMAL')
+
+        # breach in all three periods -> ALARM
+        data.append(WatchData(99, now - datetime.timedelta(seconds=120)))
+        watcher = watchrule.WatchRule(context=self.ctx,
+                                      watch_name="testwatch",
+                                      rule=rule,
+                                      watch_data=data,
+                                      stack_id=self.stack_id,
+                                      last_evaluated=last)
+        watcher.now = now
+        new_state = watcher.get_alarm_state()
+        self.assertEqual(new_state, 'ALARM')
+
+        # no data in one of the periods -> NORMAL
+        data.pop(1)
+        data.pop(-1)
+        watcher = watchrule.WatchRule(context=self.ctx,
+                                      watch_name="testwatch",
+                                      rule=rule,
+                                      watch_data=data,
+                                      stack_id=self.stack_id,
+                                      last_evaluated=last)
+        watcher.now = now
+        new_state = watcher.get_alarm_state()
+        self.assertEqual(new_state, 'NORMAL')
+
     def test_load(self):
         # Insert two dummy watch rules into the DB
         values = {'stack_id': self.stack_id,
@@ -538,3 +623,179 @@ class WatchRuleTest(unittest.TestCase):
         actions = watcher.evaluate()
         self.assertEqual(watcher.state, 'NODATA')
         self.assertEqual(actions, ['DummyAction'])
+
+    def test_statistics_db(self):
+        rule = {'EvaluationPeriods': '1',
+                'MetricName': 'test_metric',
+                'Period': '300',
+                'Statistic': 'Average',
+                'ComparisonOperator': 'GreaterThanThreshold',
+                'Threshold': '100'}
+        watcher = watchrule.WatchRule(context=self.ctx,
+                                      watch_name='statstest',
+                                      rule=rule,
+                                      stack_id=self.stack_id)
+        watcher.store()
+
+        now = timeutils.utcnow()
+        for value, age in ((117, 100), (23, 150), (500, 400)):
+            data = WatchData(value, now - datetime.timedelta(seconds=age))
+            db_api.watch_data_create(self.ctx, {
+                'watch_rule_id': watcher.id,
+                'data': data.data,
+                'metric_name': 'test_metric',
+                'value': value,
+                'created_at': data.created_at})
+
+        watcher = watchrule.WatchRule.load(self.ctx, 'statstest')
+        self.assertEqual(watcher.watch_data, None)
+        watcher.now = now
+        self.assertEqual(watcher.get_statistics(), (2, 140.0, 23.0, 117.0))
+        self.assertEqual(watcher.get_alarm_state(), 'NORMAL')
+
+        watcher.create_watch_data({'test_metric': {'Value': '200',
+                                                   'Unit': 'Count'}})
+        self.assertEqual(watcher.get_statistics()[0], 3)
+        self.assertEqual(watcher.get_alarm_state(), 'ALARM')
+
+        samples = db_api.watch_data_get_all_by_watch_rule_id(
+            self.ctx, watcher.id, now - datetime.timedelta(seconds=300))
+        self.assertEqual([s.value for s in samples], [23.0, 117.0, 200.0])
+
+        # Cleanup
+        db_api.watch_rule_delete(self.ctx, 'statstest')
+
+    def test_scheduler(self):
+        stack = parser.Stack(self.ctx, 'watch_scheduler_test',
+                             parser.Template({}))
+        stack.store()
+
+        rule = {'EvaluationPeriods': '1',
+                'MetricName': 'test_metric',
+                'Period': '300',
+                'Statistic': 'Maximum',
+                'ComparisonOperator': 'GreaterThanOrEqualToThreshold',
+                'Threshold': '30'}
+        now = timeutils.utcnow()
+        due = db_api.watch_rule_create(self.ctx, {
+            'stack_id': stack.id, 'name': 'SchedulerDue', 'state': 'NORMAL',
+            'rule': rule,
+            'last_evaluated': now - datetime.timedelta(seconds=400)})
+        later = db_api.watch_rule_create(self.ctx, {
+            'stack_id': stack.id, 'name': 'SchedulerLater',
+            'state': 'NORMAL', 'rule': rule,
+            'last_evaluated': now - datetime.timedelta(seconds=100)})
+
+        self.m.StubOutWithMock(timeutils, 'utcnow')
+        timeutils.utcnow().MultipleTimes().AndReturn(now)
+        self.m.ReplayAll()
+
+        actions = []
+        scheduler = watchrule.WatchRuleScheduler(
+            lambda stack_id, action: actions.append((stack_id, action)))
+        scheduler.run(self.ctx)
+
+        self.assertTrue(due.id in scheduler)
+        self.assertTrue(later.id in scheduler)
+        self.assertEqual(db_api.watch_rule_get(self.ctx, due.id).state,
+                         'NODATA')
+        self.assertEqual(db_api.watch_rule_get(self.ctx, later.id).state,
+                         'NORMAL')
+        self.assertEqual([a for a in actions if a[0] == stack.id], [])
+
+        # Deleted rules are dropped from the schedule
+        db_api.watch_rule_delete(self.ctx, 'SchedulerLater')
+        scheduler.schedule(later.id, now)
+        scheduler.run(self.ctx)
+        self.assertFalse(later.id in scheduler)
+        self.assertTrue(due.id in scheduler)
+
+        # Cleanup
+        db_api.watch_rule_delete(self.ctx, 'SchedulerDue')
+
+    def test_scheduler_stack_missing(self):
+        rule = {'EvaluationPeriods': '1',
+                'MetricName': 'test_metric',
+                'Period': '300',
+                'Statistic': 'Maximum',
+                'ComparisonOperator': 'GreaterThanOrEqualToThreshold',
+                'Threshold': '30'}
+        now = timeutils.utcnow()
+        due = db_api.watch_rule_create(self.ctx, {
+            'stack_id': self.stack_id, 'name': 'SchedulerNoStack',
+            'state': 'NORMAL', 'rule': rule,
+            'last_evaluated': now - datetime.timedelta(seconds=400)})
+
+        self.m.StubOutWithMock(timeutils, 'utcnow')
+        timeutils.utcnow().MultipleTimes().AndReturn(now)
+        self.m.ReplayAll()
+
+        stack_get = watchrule.db_api.stack_get
+
+        def missing_stack(context, stack_id, admin=False):
+            if stack_id == self.stack_id:
+                return None
+            return stack_get(context, stack_id, admin)
+
+        self.m.stubs.Set(watchrule.db_api, 'stack_get', missing_stack)
+
+        scheduler = watchrule.WatchRuleScheduler(lambda s, a: None)
+        scheduler.run(self.ctx)
+        self.m.VerifyAll()
+
+        # The rule is evaluated again a Period later
+        self.assertTrue(due.id in scheduler)
+        self.assertFalse(due.id in scheduler._pop_due(now))
+        self.assertTrue(due.id in scheduler._pop_due(
+            now + datetime.timedelta(seconds=300)))
+
+        # Cleanup
+        db_api.watch_rule_delete(self.ctx, 'SchedulerNoStack')
+
+    def test_scheduler_notify_reload(self):
+        rule = {'EvaluationPeriods': '1',
+                'MetricName': 'test_metric',
+                'Period': '300',
+                'Statistic': 'Maximum',
+                'ComparisonOperator': 'GreaterThanOrEqualToThreshold',
+                'Threshold': '30'}
+        watcher = watchrule.WatchRule(context=self.ctx,
+                                      watch_name='SchedulerNotify',
+                                      rule=rule,
+                                      stack_id=self.stack_id)
+        watcher.store()
+
+        def add_sample(value, notify=True):
+            wd = watcher.create_watch_data({'test_metric': {'Value': value,
+                                                            'Unit': 'Count'}})
+            if notify:
+                scheduler.notify(watcher, [wd])
+            return len(scheduler._series[watcher.id][1])
+
+        stack_context = context.get_admin_context()
+        self.m.StubOutWithMock(watchrule.WatchRuleScheduler,
+                               '_stack_context')
+        watchrule.WatchRuleScheduler._stack_context(
+            mox.IgnoreArg(),
+            self.stack_id).MultipleTimes().AndReturn(stack_context)
+        self.m.ReplayAll()
+
+        now = timeutils.utcnow()
+        timeutils.set_time_override(now)
+        try:
+            scheduler = watchrule.WatchRuleScheduler(lambda s, a: None)
+            self.assertEqual(add_sample(10), 1)
+            timeutils.advance_time_seconds(100)
+
+            # A sample stored by another engine is not seen until the
+            # samples are reloaded a Period after they were last loaded
+            self.assertEqual(add_sample(20, notify=False), 1)
+            self.assertEqual(add_sample(30), 2)
+            timeutils.advance_time_seconds(200)
+            self.assertEqual(add_sample(40), 4)
+        finally:
+            timeutils.clear_time_override()
+        self.m.VerifyAll()
+
+        # Cleanup
+        db_api.watch_rule_delete(self.ctx, 'SchedulerNotify')